@@ -0,0 +1,171 @@
+"""Benchmark the CLAMS processing stages on synthetic data.
+
+Each scale is a number of cages, a recording length and a number of extra columns. For every scale a synthetic data
+set is generated with a fixed seed, and the cleaning, trimming, binning and recombining stages are run one after the
+other, recording the time, throughput in raw rows per second and peak traced memory of each stage. Recombining also
+writes the reformatted tables. The whole in-memory pipeline (run_pipeline) is then timed with each number of worker
+processes, to compare the serial run with the parallel one.
+
+Example:
+    python benchmark.py --cages 4 16 64 --hours 72 --interval-minutes 1 --output benchmark_results.csv
+    python benchmark.py --cages 16 --workers 1 8
+"""
+import argparse
+import contextlib
+import functools
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from clams_processing import (clean_all_clams_data, process_directory, recombine_columns, run_pipeline,
+                              trim_all_clams_data)
+from synthetic_clams import generate_clams_dataset
+
+# Output directories of the stages, removed before every run
+STAGE_DIRECTORIES = ["Cleaned_CLAMS_data", "Trimmed_CLAMS_data", "Binned_CLAMS_data", "Combined_CLAMS_data"]
+
+
+def benchmark_stages(directory_path, trim_hours=2, keep_hours=48, bin_hours=3, start_dark=False, trace_memory=False,
+                     pipeline_workers=()):
+    """Run all processing stages on the CLAMS data files in the provided directory and time each stage, then time the
+    whole pipeline with each number of worker processes.
+
+    Parameters:
+    directory_path (string): directory containing raw .csv files and "config/experiment_config.csv"
+    trim_hours (int): number of hours to trim from the beginning of the cleaned data
+    keep_hours (int): number of hours to keep in the trimmed data
+    bin_hours (int): number of hours to bin the data
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    trace_memory (bool): also record the peak memory allocated in each stage, which slows the stages down; only the
+    memory of this process is traced, not that of the worker processes of a parallel pipeline
+    pipeline_workers (list): numbers of worker processes to run the whole pipeline with, e.g. [1, 8]
+
+    Returns:
+    Dictionary of (seconds, peak memory in bytes or None) by stage function name, and by "run_pipeline (workers=N)"
+    for the pipeline runs.
+    """
+    experiment_config_file = os.path.join(directory_path, "config", "experiment_config.csv")
+    stages = [
+        (clean_all_clams_data.__name__, functools.partial(clean_all_clams_data, directory_path)),
+        (trim_all_clams_data.__name__,
+         functools.partial(trim_all_clams_data, directory_path, trim_hours, keep_hours, start_dark)),
+        (process_directory.__name__, functools.partial(process_directory, directory_path, bin_hours)),
+        (recombine_columns.__name__, functools.partial(recombine_columns, directory_path, experiment_config_file)),
+    ]
+    # The pipeline saves the same intermediate files, so each run starts from the raw files again
+    stages += [(f"run_pipeline (workers={workers})",
+                functools.partial(run_pipeline, directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                  workers=workers))
+               for workers in pipeline_workers]
+
+    results = {}
+    for stage_name, stage in stages:
+        if stage_name == clean_all_clams_data.__name__ or stage_name.startswith(run_pipeline.__name__):
+            for stage_directory in STAGE_DIRECTORIES:
+                shutil.rmtree(os.path.join(directory_path, stage_directory), ignore_errors=True)
+
+        if trace_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+
+        # The stages report each file they process, which would only clutter the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            stage()
+
+        seconds = time.perf_counter() - start_time
+        peak_memory = None
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[stage_name] = (seconds, peak_memory)
+
+    return results
+
+
+def run_benchmarks(cage_counts, hours_list, interval_minutes=13, extra_column_counts=(0,), repeats=3, bin_hours=3,
+                   work_directory=None, seed=0, pipeline_workers=(1,)):
+    """Benchmark every combination of scales and return one row per scale and stage.
+
+    The time of a stage is the fastest of the repeats; the peak memory is measured in one extra run with memory
+    tracing, so tracing does not slow down the timed runs.
+
+    Parameters:
+    cage_counts (list): numbers of cages
+    hours_list (list): recording lengths in hours; each must be longer than the trimmed and kept hours (50)
+    interval_minutes (float): time between samples in minutes
+    extra_column_counts (list): numbers of extra columns
+    repeats (int): number of timed runs of each scale
+    bin_hours (int): number of hours to bin the data
+    work_directory (string): directory to generate the data sets in, or None for a temporary directory
+    seed (int): seed of the synthetic data
+    pipeline_workers (list): numbers of worker processes to time the whole pipeline with
+
+    Returns:
+    DataFrame with the scale, stage, seconds, rows per second and peak memory in MB.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory() if work_directory is None else contextlib.nullcontext(work_directory) as root:
+        for cages in cage_counts:
+            for hours in hours_list:
+                for extra_columns in extra_column_counts:
+                    data_directory = os.path.join(root, f"cages{cages}_hours{hours}_columns{extra_columns}")
+                    shutil.rmtree(data_directory, ignore_errors=True)
+                    raw_rows = generate_clams_dataset(data_directory, cages=cages, hours=hours,
+                                                      interval_minutes=interval_minutes, extra_columns=extra_columns,
+                                                      seed=seed)
+
+                    timed_runs = [benchmark_stages(data_directory, bin_hours=bin_hours,
+                                                   pipeline_workers=pipeline_workers) for _ in range(repeats)]
+                    traced_run = benchmark_stages(data_directory, bin_hours=bin_hours, trace_memory=True,
+                                                  pipeline_workers=pipeline_workers)
+
+                    for stage, (_, peak_memory) in traced_run.items():
+                        seconds = min(run[stage][0] for run in timed_runs) if timed_runs else float("nan")
+                        rows.append({"cages": cages, "hours": hours, "extra columns": extra_columns,
+                                     "raw rows": raw_rows, "stage": stage, "seconds": round(seconds, 4),
+                                     "rows/s": round(raw_rows / seconds) if seconds > 0 else float("nan"),
+                                     "peak memory (MB)": round(peak_memory / 2 ** 20, 1)})
+                    print(f"Benchmarked {cages} cages, {hours} hours, {extra_columns} extra columns "
+                          f"({raw_rows} rows)")
+
+    return pd.DataFrame(rows)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the CLAMS processing stages on synthetic data.")
+    parser.add_argument("--cages", type=int, nargs="+", default=[4, 16], help="numbers of cages (default: 4 16)")
+    parser.add_argument("--hours", type=float, nargs="+", default=[72],
+                        help="recording lengths in hours, longer than 50 (default: 72)")
+    parser.add_argument("--interval-minutes", type=float, default=1,
+                        help="time between samples in minutes (default: 1)")
+    parser.add_argument("--extra-columns", type=int, nargs="+", default=[0],
+                        help="numbers of extra columns (default: 0)")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs of each scale (default: 3)")
+    parser.add_argument("--bin-hours", type=int, default=3, help="size of the bins in hours (default: 3)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data (default: 0)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1],
+                        help="numbers of worker processes to time the whole pipeline with (default: 1 and the number "
+                             "of CPUs)")
+    parser.add_argument("--work-directory", help="directory to keep the generated data in (default: a temporary one)")
+    parser.add_argument("--output", help="save the results to this .csv file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    results = run_benchmarks(args.cages, args.hours, interval_minutes=args.interval_minutes,
+                             extra_column_counts=args.extra_columns, repeats=args.repeats, bin_hours=args.bin_hours,
+                             work_directory=args.work_directory, seed=args.seed,
+                             pipeline_workers=sorted(set(args.workers)))
+    print(results.to_string(index=False))
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""Process many experiment directories in one batch on a shared pool of worker processes.
+
+The experiments are listed in a manifest .csv file with one row per experiment and the columns:
+
+    DIRECTORY      directory containing the CLAMS data files, relative to the manifest or absolute
+    TRIM HOURS     number of hours to trim from the beginning of the data
+    KEEP HOURS     number of hours to keep after trimming
+    BIN HOURS      size of the bins in hours, or several sizes separated by spaces, e.g. "1 3 12"
+    START CYCLE    optional, "light" (default) or "dark"
+    CONFIG FILE    optional config file with ID and GROUP LABEL columns
+
+The subjects of all experiments are queued on one pool, so the pool stays busy while single experiments wait for
+their last subjects. The number of subjects processed at once is limited by the number of workers and, optionally,
+by an estimate of their combined memory use. Once all subjects of an experiment are processed, it is combined,
+logged and finalized in its own timestamp_* directory exactly like a run from the GUI or cli.py, and a report of all
+experiments is saved next to the manifest. Experiments interrupted in an earlier batch resume where they stopped.
+
+Example:
+    python clams_batch.py experiments.csv --workers 8 --max-memory-mb 4096
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from clams_processing import (bin_sizes_of, clams_subject_arguments, combine_clams_subject_results,
+                              finalize_run_directory, format_run_summary, load_completed_subject,
+                              prepare_experiment_config, process_clams_file_from_arguments, record_completed_subject,
+                              resolve_run_directory, run_manifest_parameters, start_run_manifest,
+                              validate_processing_parameters, write_run_log)
+from instrumentation import peak_memory_usage
+from version import VERSION
+
+# Columns of the manifest file; the others are optional
+MANIFEST_COLUMNS = ["DIRECTORY", "TRIM HOURS", "KEEP HOURS", "BIN HOURS"]
+OPTIONAL_MANIFEST_COLUMNS = ["START CYCLE", "CONFIG FILE"]
+
+# Rough peak memory of processing a subject per byte of its raw file, used to keep within the memory limit
+SUBJECT_MEMORY_PER_RAW_BYTE = 8
+
+
+def read_batch_manifest(manifest_file):
+    """Read the experiments of a batch from a manifest .csv file.
+
+    Returns:
+    List of dictionaries with the "directory", "trim_hours", "keep_hours", "bin_hours", "start_dark" and
+    "config_file" of each experiment. Relative paths are resolved against the directory of the manifest file.
+    """
+    manifest = pd.read_csv(manifest_file, dtype=str, keep_default_na=False, skipinitialspace=True)
+    manifest.columns = manifest.columns.str.strip().str.upper()
+    missing_columns = [column for column in MANIFEST_COLUMNS if column not in manifest.columns]
+    if missing_columns:
+        raise ValueError(f"The manifest file is missing the columns: {', '.join(missing_columns)}")
+    for column in OPTIONAL_MANIFEST_COLUMNS:
+        if column not in manifest.columns:
+            manifest[column] = ""
+
+    manifest_directory = os.path.dirname(os.path.abspath(manifest_file))
+    experiments = []
+    for row_number, row in enumerate(manifest.itertuples(index=False), start=2):
+        row = dict(zip(manifest.columns, (value.strip() for value in row)))
+        start_cycle = row["START CYCLE"].lower() or "light"
+        if start_cycle not in ("light", "dark"):
+            raise ValueError(f"Line {row_number} of the manifest file: start cycle must be light or dark")
+        try:
+            bin_sizes = [int(size) for size in re.split(r"[\s,;]+", row["BIN HOURS"]) if size]
+            experiment = {"directory": os.path.join(manifest_directory, row["DIRECTORY"]),
+                          "trim_hours": int(row["TRIM HOURS"]),
+                          "keep_hours": int(row["KEEP HOURS"]),
+                          "bin_hours": bin_sizes[0] if len(bin_sizes) == 1 else bin_sizes,
+                          "start_dark": start_cycle == "dark",
+                          "config_file": os.path.join(manifest_directory, row["CONFIG FILE"]) if row["CONFIG FILE"]
+                          else None}
+        except (IndexError, ValueError):
+            raise ValueError(f"Line {row_number} of the manifest file: trim, keep and bin hours must be whole numbers")
+        experiments.append(experiment)
+
+    # Outputs are moved out of the directory after each experiment, so every directory can only be listed once
+    directories = [os.path.normcase(os.path.realpath(experiment["directory"])) for experiment in experiments]
+    if len(set(directories)) < len(directories):
+        raise ValueError("The manifest file lists a directory more than once")
+    return experiments
+
+
+def estimate_subject_memory(file_path):
+    """Return a rough estimate of the peak memory of processing a raw CLAMS data file, in bytes."""
+    return os.path.getsize(file_path) * SUBJECT_MEMORY_PER_RAW_BYTE
+
+
+class BatchExperiment:
+    """Progress of one experiment of a batch."""
+
+    def __init__(self, number, settings):
+        self.number = number
+        self.settings = settings
+        self.directory = settings["directory"]
+        bin_hours = settings["bin_hours"]
+        self.bin_hours = bin_sizes_of(bin_hours) if isinstance(bin_hours, list) else bin_hours
+        self.status = "pending"
+        self.error = ""
+        self.subject_arguments = []
+        self.subject_results = {}
+        self.experiment_config_file = None
+        self.run_directory = None
+        self.run_manifest = None
+        self.output_directory = ""
+        self.start_time = None
+        self.seconds = 0.0
+
+    def fail(self, error):
+        self.status = "failed"
+        self.error = str(error)
+        self.seconds = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+
+    def report_row(self):
+        return {"DIRECTORY": self.directory, "STATUS": self.status, "SUBJECTS": len(self.subject_arguments),
+                "SECONDS": round(self.seconds, 3), "OUTPUT DIRECTORY": self.output_directory, "ERROR": self.error}
+
+
+def run_batch(experiments, workers=os.cpu_count() or 1, max_memory_mb=None, save_intermediates=True, use_cache=False,
+              output_format="csv", trim_chunk_rows=None, move_outputs=True, input_values=None):
+    """Process the experiments of a batch on a shared pool of worker processes.
+
+    An experiment that fails, e.g. because of invalid parameters or a file that cannot be read, is reported and the
+    other experiments continue.
+
+    Parameters:
+    experiments (list): experiments as returned by read_batch_manifest
+    workers (int): number of worker processes, and the maximum number of subjects processed at once
+    max_memory_mb (float): only start another subject while the estimated memory of the subjects being processed
+    stays below this many MB; a subject is always started when no other subject is being processed
+    save_intermediates (bool): also save the cleaned, trimmed and binned files
+    use_cache (bool): reuse cached results from previous runs
+    output_format (string): table format of the intermediate and combined files
+    trim_chunk_rows (int): read the raw files in chunks of this many rows when intermediates are not saved
+    move_outputs (bool): save the outputs of each experiment to a timestamp_* directory instead of the experiment
+    directory itself
+    input_values (dict): settings of the batch added to the run log of every experiment
+
+    Returns:
+    List of BatchExperiment in manifest order.
+    """
+    batch = [BatchExperiment(number, settings) for number, settings in enumerate(experiments, start=1)]
+    memory_limit = None if max_memory_mb is None else max_memory_mb * 2 ** 20
+
+    def report(experiment, message):
+        print(f"[{experiment.number}/{len(batch)}] {os.path.basename(os.path.normpath(experiment.directory))}: "
+              f"{message}")
+
+    def finish(experiment):
+        try:
+            # A combined export of several chambers gives a result per subject for the same raw file
+            subject_results = []
+            result_arguments = []
+            for index, arguments in enumerate(experiment.subject_arguments):
+                subject_results.extend(experiment.subject_results[index])
+                result_arguments.extend([arguments] * len(experiment.subject_results[index]))
+            results = combine_clams_subject_results(experiment.run_directory, experiment.bin_hours,
+                                                    experiment.experiment_config_file, result_arguments,
+                                                    subject_results, output_format, None, experiment.start_time)
+            log_values = {"Directory Path": experiment.directory,
+                          "Trim Hours": experiment.settings["trim_hours"],
+                          "Start Cycle": "Start Dark" if experiment.settings["start_dark"] else "Start Light",
+                          "Keep Hours": experiment.settings["keep_hours"],
+                          "Bin Hours": experiment.settings["bin_hours"],
+                          "Config File": experiment.settings["config_file"] or "",
+                          **(input_values or {})}
+            write_run_log(experiment.directory, VERSION, log_values, format_run_summary(results) + "\n",
+                          metrics=results["metrics"])
+            finalize_run_directory(experiment.directory, experiment.run_directory)
+            if move_outputs:
+                experiment.output_directory = experiment.run_directory
+        except (ImportError, OSError, ValueError, KeyError) as e:
+            experiment.fail(e)
+            report(experiment, f"failed: {e}")
+            return
+        experiment.status = "done"
+        experiment.seconds = time.perf_counter() - experiment.start_time
+        report(experiment, f"done in {experiment.seconds:.1f} s" +
+               (f", outputs in {experiment.output_directory}" if experiment.output_directory else ""))
+
+    # Queue the subjects of all valid experiments in manifest order
+    queue = deque()
+    for experiment in batch:
+        experiment.start_time = time.perf_counter()
+        settings = experiment.settings
+        try:
+            validate_processing_parameters(experiment.directory, settings["trim_hours"], settings["keep_hours"],
+                                           settings["bin_hours"])
+            experiment.experiment_config_file = prepare_experiment_config(experiment.directory,
+                                                                          settings["config_file"])
+            experiment.run_directory = experiment.directory
+            resumed = False
+            if move_outputs:
+                experiment.run_directory, resumed = resolve_run_directory(
+                    experiment.directory, settings["trim_hours"], settings["keep_hours"], experiment.bin_hours,
+                    settings["start_dark"], output_format)
+            experiment.subject_arguments = clams_subject_arguments(
+                experiment.directory, settings["trim_hours"], settings["keep_hours"], experiment.bin_hours,
+                settings["start_dark"], save_intermediates, use_cache, output_format, None, trim_chunk_rows,
+                experiment.run_directory)
+            experiment.run_manifest = start_run_manifest(
+                experiment.run_directory, run_manifest_parameters(settings["trim_hours"], settings["keep_hours"],
+                                                                  experiment.bin_hours, settings["start_dark"],
+                                                                  output_format))
+        except (OSError, ValueError) as e:
+            experiment.fail(e)
+            report(experiment, f"failed: {e}")
+            continue
+
+        # Reuse the subjects an interrupted batch completed
+        for index, arguments in enumerate(experiment.subject_arguments):
+            completed_result = load_completed_subject(experiment.run_manifest, arguments)
+            if completed_result is not None:
+                experiment.subject_results[index] = [completed_result]
+            else:
+                queue.append((experiment, index))
+        report(experiment, f"queued {len(experiment.subject_arguments) - len(experiment.subject_results)} CLAMS data "
+                           f"files" + (f", resuming {experiment.run_directory}" if resumed else ""))
+
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Experiments without data files left to process are finished right away
+        for experiment in batch:
+            if experiment.status == "pending" and len(experiment.subject_results) == len(experiment.subject_arguments):
+                finish(experiment)
+
+        while queue or running:
+            # Start subjects while there are free workers and memory
+            while queue and len(running) < workers:
+                experiment, index = queue[0]
+                if experiment.status == "failed":
+                    queue.popleft()
+                    continue
+                arguments = experiment.subject_arguments[index]
+                memory = estimate_subject_memory(arguments[0])
+                if (memory_limit is not None and running
+                        and sum(memory for _, _, memory in running.values()) + memory > memory_limit):
+                    break
+                queue.popleft()
+                if experiment.status == "pending":
+                    experiment.status = "running"
+                    experiment.start_time = time.perf_counter()
+                    report(experiment, "started")
+                running[executor.submit(process_clams_file_from_arguments, arguments)] = (experiment, index, memory)
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                experiment, index, _ = running.pop(future)
+                if experiment.status == "failed":
+                    continue
+                try:
+                    experiment.subject_results[index] = future.result()
+                    # The manifest lists a subject per raw file, so combined exports are processed again when resuming
+                    if len(experiment.subject_results[index]) == 1:
+                        record_completed_subject(experiment.run_directory, experiment.run_manifest,
+                                                 experiment.subject_arguments[index],
+                                                 experiment.subject_results[index][0])
+                except Exception as e:
+                    experiment.fail(f"{os.path.basename(experiment.subject_arguments[index][0])}: {e}")
+                    report(experiment, f"failed: {experiment.error}")
+                    continue
+                if len(experiment.subject_results) == len(experiment.subject_arguments):
+                    finish(experiment)
+
+    return batch
+
+
+def write_batch_report(report_file, batch):
+    """Save the status of every experiment of a batch to a .csv file."""
+    pd.DataFrame([experiment.report_row() for experiment in batch]).to_csv(report_file, index=False)
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description=f"CLAMS Wrangler {VERSION}: process the experiment directories "
+                                                 f"listed in a manifest file on a shared pool of worker processes.")
+    parser.add_argument("manifest", help=".csv file with DIRECTORY, TRIM HOURS, KEEP HOURS and BIN HOURS columns and "
+                                         "optional START CYCLE and CONFIG FILE columns")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes shared by all experiments (default: number of CPUs)")
+    parser.add_argument("--max-memory-mb", type=float,
+                        help="limit the estimated memory of the subjects processed at once to this many MB")
+    parser.add_argument("--format", choices=["csv", "parquet", "feather"], default="csv",
+                        help="file format of the intermediate and combined files (default: csv)")
+    parser.add_argument("--cache", action="store_true", help="reuse cached results from previous runs")
+    parser.add_argument("--no-intermediates", action="store_true",
+                        help="don't save the cleaned, trimmed and binned files")
+    parser.add_argument("--chunk-rows", type=int,
+                        help="with --no-intermediates, read each data file in chunks of this many rows")
+    parser.add_argument("--no-timestamp", action="store_true",
+                        help="leave the outputs in each directory instead of moving them to a timestamp_* folder")
+    parser.add_argument("--report", help="save the batch report to this .csv file (default: "
+                                         "batch_report_<date>_<time>.csv next to the manifest)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    try:
+        experiments = read_batch_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    start_time = time.perf_counter()
+    input_values = {
+        "Batch Manifest": os.path.abspath(args.manifest),
+        "Save Intermediate Files": not args.no_intermediates,
+        "Reuse Cached Results": args.cache,
+        "Output Format": args.format,
+        "Workers": args.workers,
+        "Chunk Rows": args.chunk_rows or "",
+    }
+    batch = run_batch(experiments, workers=args.workers, max_memory_mb=args.max_memory_mb,
+                      save_intermediates=not args.no_intermediates, use_cache=args.cache, output_format=args.format,
+                      trim_chunk_rows=args.chunk_rows, move_outputs=not args.no_timestamp, input_values=input_values)
+
+    report_file = args.report or os.path.join(os.path.dirname(os.path.abspath(args.manifest)),
+                                              f"batch_report_{time.strftime('%Y-%m-%d_%H-%M-%S')}.csv")
+    write_batch_report(report_file, batch)
+
+    failed = [experiment for experiment in batch if experiment.status != "done"]
+    peak_memory = peak_memory_usage()
+    print(f"\nProcessed {len(batch) - len(failed)} of {len(batch)} experiments in "
+          f"{time.perf_counter() - start_time:.1f} s" +
+          (f", peak memory of this process {peak_memory / 2 ** 20:.0f} MB" if peak_memory else ""))
+    print(f"Report saved to {report_file}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""Hold the combined CLAMS data as a dense NumPy array of subjects by bins by variables.
+
+The combined data has one row per subject and bin, with the ID and GROUP LABEL repeated on every row. A ClamsCube
+stores the output variables once, in a float array shaped (subject, bin, variable), with the ID and GROUP LABEL of each
+subject and the HOUR and 24 HOUR of each bin as labels along its axes, and the type of each variable in the source data
+so that integer variables are written back as integers. Subjects, bins and variables are selected by
+slicing the array, and the mean and SEM of each group in each bin are computed for all bins and variables at once.
+The cube can be written back out as the same combined (long) and reformatted (wide) files as the combined data.
+
+Example:
+    cube = clams_cube_from_binned_data(binned_data, config_df)
+    summary = cube.select(variables=["VO2", "RER"], days=[2, 3]).group_summary()
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from clams_processing import OUTPUT_VARIABLES, binned_file_labels, write_combined_data, write_table
+
+
+class ClamsCube:
+    """Output variables of all subjects as a (subject, bin, variable) array with labelled axes.
+
+    Bins are aligned across subjects by their HOUR. A subject without a bin has NaN values and a DAY of 0 there.
+
+    Parameters:
+    values (numpy array): float array of shape (subjects, bins, variables)
+    ids (numpy array): ID of each subject, as in the combined data
+    groups (numpy array): GROUP LABEL of each subject, as in the combined data
+    days (numpy array): int array of shape (subjects, bins) with the DAY of each bin of each subject, 0 where the
+    subject has no such bin
+    hours (numpy array): HOUR of each bin, in increasing order
+    hours_24 (numpy array): 24 HOUR of each bin
+    variables (list): name of each variable
+    dtypes (list): type of each variable in the source data, or None for float variables; integer variables are
+    exported as integers where none of their values is missing
+    """
+
+    def __init__(self, values, ids, groups, days, hours, hours_24, variables, dtypes=None):
+        self.values = values
+        self.ids = ids
+        self.groups = groups
+        self.days = days
+        self.hours = hours
+        self.hours_24 = hours_24
+        self.variables = list(variables)
+        self.dtypes = list(dtypes) if dtypes is not None else [np.dtype(np.float64)] * len(self.variables)
+
+    @property
+    def present(self):
+        """Boolean array of shape (subjects, bins) marking the bins each subject has."""
+        return self.days > 0
+
+    def variable(self, variable):
+        """Return the (subject, bin) array of one variable, as a view of the cube."""
+        return self.values[:, :, self.variables.index(variable)]
+
+    def select(self, ids=None, groups=None, variables=None, hours=None, days=None):
+        """Return a cube of the selected subjects, bins and variables; arguments left as None select everything.
+
+        Parameters:
+        ids (list): IDs of the subjects to keep
+        groups (list): GROUP LABEL values of the subjects to keep
+        variables (list): variables to keep, in the given order
+        hours (list): HOUR values of the bins to keep
+        days (list): DAY values of the bins to keep; a bin is kept if any subject has it on one of the days
+
+        Returns:
+        New ClamsCube; its arrays are copies when subjects or bins are dropped.
+        """
+        subjects = np.ones(len(self.ids), dtype=bool)
+        if ids is not None:
+            subjects &= np.isin(self.ids, ids)
+        if groups is not None:
+            subjects &= np.isin(self.groups, groups)
+
+        bins = np.ones(len(self.hours), dtype=bool)
+        if hours is not None:
+            bins &= np.isin(self.hours, hours)
+        if days is not None:
+            bins &= np.isin(self.days, days).any(axis=0)
+
+        variable_positions = [self.variables.index(variable) for variable in (variables or self.variables)]
+        return ClamsCube(self.values[np.ix_(subjects, bins, variable_positions)], self.ids[subjects],
+                         self.groups[subjects], self.days[np.ix_(subjects, bins)], self.hours[bins],
+                         self.hours_24[bins], [self.variables[position] for position in variable_positions],
+                         [self.dtypes[position] for position in variable_positions])
+
+    def group_statistics(self):
+        """Compute the mean, SEM and number of subjects of each group in each bin for every variable.
+
+        Missing values are left out. The SEM is the sample standard deviation divided by the square root of the
+        number of values, and NaN with fewer than 2 values.
+
+        Returns:
+        Tuple of the array of GROUP LABEL values, in order of appearance, and arrays of shape (groups, bins,
+        variables) of the means, SEMs and counts.
+        """
+        group_labels, group_codes = group_labels_and_codes(self.groups)
+        shape = (len(group_labels),) + self.values.shape[1:]
+        means = np.full(shape, np.nan)
+        sems = np.full(shape, np.nan)
+        counts = np.zeros(shape, dtype=np.int64)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for code in range(len(group_labels)):
+                group_values = self.values[group_codes == code]
+                counts[code] = np.count_nonzero(~np.isnan(group_values), axis=0)
+                totals = np.nansum(group_values, axis=0)
+                means[code] = np.where(counts[code] > 0, totals / counts[code], np.nan)
+                squared_deviations = np.nansum((group_values - means[code]) ** 2, axis=0)
+                sems[code] = np.where(counts[code] > 1,
+                                      np.sqrt(squared_deviations / (counts[code] - 1)) / np.sqrt(counts[code]),
+                                      np.nan)
+        return group_labels, means, sems, counts
+
+    def group_summary(self):
+        """Return the mean, SEM and number of subjects of each group in each bin as a DataFrame.
+
+        Returns:
+        DataFrame with one row per group and bin, the GROUP LABEL, DAY, HOUR and 24 HOUR columns and "<variable>
+        MEAN", "<variable> SEM" and "<variable> N" columns. DAY is the latest DAY any subject has the bin on.
+        """
+        group_labels, means, sems, counts = self.group_statistics()
+        group_count, bin_count = len(group_labels), len(self.hours)
+        summary = pd.DataFrame({"GROUP LABEL": np.repeat(group_labels, bin_count),
+                                "DAY": np.tile(self.days.max(axis=0, initial=0), group_count),
+                                "HOUR": np.tile(self.hours, group_count),
+                                "24 HOUR": np.tile(self.hours_24, group_count)})
+        for position, variable in enumerate(self.variables):
+            summary[f"{variable} MEAN"] = means[:, :, position].ravel()
+            summary[f"{variable} SEM"] = sems[:, :, position].ravel()
+            summary[f"{variable} N"] = counts[:, :, position].ravel()
+        return summary
+
+    def to_long(self):
+        """Return the cube in the layout of the combined data, one row per subject and bin it has.
+
+        Returns:
+        DataFrame with the ID, GROUP LABEL, DAY, HOUR and 24 HOUR columns followed by the variables.
+        """
+        subject_positions, bin_positions = np.nonzero(self.present)
+        long = pd.DataFrame({"ID": self.ids[subject_positions], "GROUP LABEL": self.groups[subject_positions],
+                             "DAY": self.days[subject_positions, bin_positions],
+                             "HOUR": self.hours[bin_positions], "24 HOUR": self.hours_24[bin_positions]})
+        values = self.values[subject_positions, bin_positions]
+        for position, variable in enumerate(self.variables):
+            long[variable] = source_typed(values[:, position], self.dtypes[position])
+        return long
+
+    def to_wide(self):
+        """Return the reformatted table of each variable, as reformat_combined_data does for the combined data.
+
+        Each table has one row per ID and DAY, sorted by ID and DAY, and a "<variable>_<24 HOUR>" column per 24 HOUR
+        bin; days and bins without any value of the variable are left out. Missing GROUP LABEL values are replaced
+        with "NO_LABEL". As in reformat_combined_data, an integer variable stays integer unless a subject is missing
+        one of the 24 HOUR bins on one of its days.
+
+        Returns:
+        Dictionary of the reformatted DataFrames by variable.
+        """
+        subject_positions, bin_positions = np.nonzero(self.present)
+        numeric_ids = pd.to_numeric(pd.Series(self.ids, dtype=object)).to_numpy()
+
+        # One row per subject and DAY, sorted by ID and DAY, and one column per 24 HOUR bin
+        row_keys = pd.DataFrame({"subject": subject_positions,
+                                 "DAY": self.days[subject_positions, bin_positions]}).drop_duplicates()
+        row_keys = row_keys.iloc[np.lexsort((row_keys["DAY"].to_numpy(),
+                                             numeric_ids[row_keys["subject"].to_numpy()]))]
+        row_index = pd.MultiIndex.from_frame(row_keys)
+        row_positions = row_index.get_indexer(pd.MultiIndex.from_arrays([subject_positions,
+                                                                         self.days[subject_positions,
+                                                                                   bin_positions]]))
+        columns_24_hour, column_positions = np.unique(self.hours_24[bin_positions], return_inverse=True)
+
+        # Place the values of all variables at once, keeping the first value of a repeated ID, DAY and 24 HOUR
+        values = self.values[subject_positions, bin_positions]
+        wide = np.full((len(row_keys), len(columns_24_hour), len(self.variables)), np.nan)
+        for position in range(len(self.variables)):
+            has_value = ~np.isnan(values[:, position])
+            rows, columns = row_positions[has_value][::-1], column_positions[has_value][::-1]
+            wide[rows, columns, position] = values[has_value, position][::-1]
+
+        row_subjects = row_keys["subject"].to_numpy()
+        group_labels = pd.Series(self.groups[row_subjects], dtype=object).replace("", np.nan).fillna("NO_LABEL")
+        index_columns = {"ID": numeric_ids[row_subjects], "GROUP LABEL": group_labels.to_numpy(),
+                         "DAY": row_keys["DAY"].to_numpy()}
+
+        pivot_tables = {}
+        for position, variable in enumerate(self.variables):
+            # Drop the days and 24 HOUR bins without any value of this variable
+            variable_values = wide[:, :, position]
+            kept_rows = ~np.isnan(variable_values).all(axis=1)
+            kept_columns = ~np.isnan(variable_values[kept_rows]).all(axis=0)
+            pivot_table = pd.DataFrame({name: column[kept_rows] for name, column in index_columns.items()})
+            dtype = self.dtypes[position] if not np.isnan(variable_values).any() else np.dtype(np.float64)
+            for hour, column in zip(columns_24_hour[kept_columns], variable_values[kept_rows][:, kept_columns].T):
+                pivot_table[f"{variable}_{hour}"] = source_typed(column, dtype)
+            pivot_tables[variable] = pivot_table
+        return pivot_tables
+
+    def write_long_csvs(self, combined_directory, output_format="csv"):
+        """Save one combined file per variable in the given table format, as write_combined_data does."""
+        os.makedirs(combined_directory, exist_ok=True)
+        write_combined_data(self.to_long(), combined_directory, output_format, self.variables)
+
+    def write_wide_csvs(self, reformatted_directory):
+        """Save the reformatted table of each variable as a "reformatted_<variable>.csv" file."""
+        os.makedirs(reformatted_directory, exist_ok=True)
+        for variable, pivot_table in self.to_wide().items():
+            write_table(pivot_table, os.path.join(reformatted_directory, f"reformatted_{variable}.csv"))
+
+
+def source_typed(values, dtype):
+    """Return float values cast back to the integer type of their source variable when none of them is missing."""
+    if dtype.kind in "iu" and not np.isnan(values).any():
+        return values.astype(dtype)
+    return values
+
+
+def group_labels_and_codes(groups):
+    """Return the distinct GROUP LABEL values, in order of appearance, and the position of each subject's label."""
+    codes, labels = pd.factorize(pd.Series(groups, dtype=object), use_na_sentinel=False)
+    return np.asarray(labels, dtype=object), codes
+
+
+def clams_cube_from_rows(ids, groups, days, hours, hours_24, values, variables, dtypes=None):
+    """Build a cube from the rows of combined data, given as arrays aligned by row, see ClamsCube for dtypes.
+
+    Rows of the same ID are one subject, and the first row of a repeated ID and HOUR is kept.
+    """
+    subject_codes, subject_ids = pd.factorize(pd.Series(ids, dtype=object))
+    bin_hours, bin_codes = np.unique(hours, return_inverse=True)
+
+    # The GROUP LABEL of each subject is that of its first row
+    _, subject_first_rows = np.unique(subject_codes, return_index=True)
+    subject_groups = np.asarray(groups, dtype=object)[subject_first_rows]
+
+    # Keep the first row of each subject and bin
+    _, first_rows = np.unique(subject_codes * len(bin_hours) + bin_codes, return_index=True)
+    subject_codes, bin_codes = subject_codes[first_rows], bin_codes[first_rows]
+
+    cube_values = np.full((len(subject_ids), len(bin_hours), len(variables)), np.nan)
+    cube_values[subject_codes, bin_codes] = values[first_rows]
+    cube_days = np.zeros((len(subject_ids), len(bin_hours)), dtype=np.int64)
+    cube_days[subject_codes, bin_codes] = days[first_rows]
+    cube_hours_24 = np.zeros(len(bin_hours), dtype=np.int64)
+    cube_hours_24[bin_codes] = hours_24[first_rows]
+    return ClamsCube(cube_values, np.asarray(subject_ids, dtype=object), subject_groups, cube_days, bin_hours,
+                     cube_hours_24, variables, dtypes)
+
+
+def variable_dtype(source_dtypes):
+    """Return the NumPy type a variable has once its source columns are combined, float for any other kind of column."""
+    if source_dtypes and all(isinstance(dtype, np.dtype) for dtype in source_dtypes):
+        return np.result_type(*source_dtypes)
+    return np.dtype(np.float64)
+
+
+def clams_cube_from_combined_data(combined_data, variables=OUTPUT_VARIABLES):
+    """Build a cube from combined data with ID, GROUP LABEL, DAY, HOUR and 24 HOUR columns."""
+    return clams_cube_from_rows(combined_data['ID'].to_numpy(dtype=object),
+                                combined_data['GROUP LABEL'].to_numpy(dtype=object),
+                                combined_data['DAY'].to_numpy(dtype=np.int64),
+                                combined_data['HOUR'].to_numpy(), combined_data['24 HOUR'].to_numpy(dtype=np.int64),
+                                combined_data[variables].to_numpy(dtype=np.float64), variables,
+                                [variable_dtype([combined_data[variable].dtype]) for variable in variables])
+
+
+def clams_cube_from_binned_data(binned_data, config_df, variables=OUTPUT_VARIABLES):
+    """Build a cube straight from the binned data of all subjects, without building the combined data first.
+
+    Parameters:
+    binned_data (list): pairs of (binned file name, binned DataFrame); the ID is taken from the file name
+    config_df (DataFrame): experiment configuration with ID and GROUP LABEL columns
+    variables (list): variables to hold in the cube
+    """
+    file_ids, file_group_labels = binned_file_labels(binned_data, config_df)
+    file_lengths = [len(df) for _, df in binned_data]
+
+    def concatenated(column, dtype):
+        return np.concatenate([df[column].to_numpy(dtype=dtype) for _, df in binned_data]) if binned_data else \
+            np.array([], dtype=dtype)
+
+    values = np.concatenate([df[variables].to_numpy(dtype=np.float64) for _, df in binned_data]) if binned_data \
+        else np.empty((0, len(variables)))
+    return clams_cube_from_rows(np.repeat(np.array(file_ids, dtype=object), file_lengths),
+                                np.repeat(np.array(file_group_labels, dtype=object), file_lengths),
+                                concatenated('DAY', np.int64), concatenated('HOUR', np.int64),
+                                concatenated('24 HOUR', np.int64), values, variables,
+                                [variable_dtype([df[variable].dtype for _, df in binned_data])
+                                 for variable in variables])
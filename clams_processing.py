@@ -1,72 +1,666 @@
 import glob
+import hashlib
+import json
+import math
 import os
+import pickle
 import re
-from datetime import timedelta
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
 
+from instrumentation import (StageProfiler, add_metric, file_size, new_stage_metrics, peak_memory_usage,
+                             summarize_stage_metrics, write_metrics_summary)
+from results_store import RESULTS_STORE_FILE, write_results_store
 
-def clean_all_clams_data(directory_path):
-    """Reformat all CLAMS data files (.csv) in the provided directory by dropping unnecessary rows.
+# Variables saved to the "Combined_CLAMS_data" directory
+OUTPUT_VARIABLES = ['ACCCO2', 'ACCO2', 'FEED1 ACC', 'FEED1', 'RER', 'AMB', 'AMB ACC', 'VCO2', 'VO2', 'WHEEL ACC', 'WHEEL']
+
+# Columns identifying each row of the combined data
+COMBINED_INDEX_COLUMNS = ['ID', 'GROUP LABEL', 'DAY', 'HOUR', '24 HOUR']
+
+# Columns to retain the last value in the bin
+BIN_LAST_COLUMNS = ["INTERVAL", "CHAN", "DATE/TIME", "ACCO2", "ACCCO2", "FEED1 ACC", "WHEEL ACC", "AMB ACC"]
+
+# Columns to sum within the bin
+BIN_SUM_COLUMNS = ["WHEEL", "FEED1", "AMB"]
+
+# Accumulative columns, re-zeroed at the start of the trimmed data
+ACCUMULATIVE_COLUMNS = ['ACCO2', 'ACCCO2', 'FEED1 ACC', 'WHEEL ACC']
+
+# Columns of the binned files, in order
+BINNED_COLUMNS = ["CHAN", "INTERVAL_start", "INTERVAL_end", "DATE/TIME_start", "DATE/TIME_end", "DURATION",
+                  "VO2", "ACCO2", "VCO2", "ACCCO2", "RER", "HEAT", "FLOW", "PRESSURE", "FEED1", "FEED1 ACC",
+                  "AMB", "AMB ACC", "WHEEL", "WHEEL ACC", "ENCLOSURE TEMP", "ENCLOSURE SETPOINT", "LED LIGHTNESS",
+                  "DAY", "HOUR", "24 HOUR"]
+
+# Format of the "DATE/TIME" column of raw CLAMS exports
+CLAMS_DATE_TIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+# Compact types of the CLAMS data columns. Counters, codes and light levels are small integers and the chamber number
+# is made categorical after reading. The gas and status columns that are dropped before binning are float32; the
+# measurements that are averaged into the binned files stay float64, as float32 cannot hold values in the thousands to
+# the 4 decimals the outputs are rounded to. Columns that are not listed keep their inferred type.
+CLAMS_COLUMN_TYPES = {"INTERVAL": "int32", "CHAN": "int16", "O2IN": "float32", "O2OUT": "float32", "DO2": "float32",
+                      "CO2IN": "float32", "CO2OUT": "float32", "DCO2": "float32", "STATUS1": "int32", "XTOT": "int32",
+                      "XAMB": "int32", "YTOT": "int32", "YAMB": "int32", "WHEEL": "int32", "LED LIGHTNESS": "int16",
+                      "LED HUE": "int16", "LED SATURATION": "int16"}
+
+# Columns of the cleaned data that trimming and binning use; the other columns are only carried into the cleaned and
+# trimmed files
+BINNING_INPUT_COLUMNS = ["INTERVAL", "CHAN", "DATE/TIME", "VO2", "ACCO2", "VCO2", "ACCCO2", "RER", "HEAT", "FLOW",
+                         "PRESSURE", "FEED1", "FEED1 ACC", "XAMB", "YAMB", "WHEEL", "WHEEL ACC", "ENCLOSURE TEMP",
+                         "ENCLOSURE SETPOINT", "LED LIGHTNESS"]
+
+# File extensions of the supported table formats. Parquet and Feather keep column types such as datetimes and can
+# read a subset of columns without parsing the rest; both need the pyarrow package.
+TABLE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# Version of the cached stage results, increased whenever a stage changes its output
+CACHE_VERSION = 2
+
+# Column of resampled data marking the grid times without a sample
+MISSING_SAMPLE_COLUMN = "MISSING"
+
+# Number of rows read at a time when splitting a combined export of several chambers
+SPLIT_CHUNK_ROWS = 100000
+
+# Manifest of the subjects a run has completed, kept in the "config" directory of the run directory
+RUN_MANIFEST_FILE = "completed_files.json"
+
+
+class ProcessingCancelled(Exception):
+    """Raised when processing is cancelled between files."""
+
+
+class ClamsSchemaError(ValueError):
+    """Raised when a chunk of CLAMS data does not fit the declared CLAMS_COLUMN_TYPES."""
+
+
+def list_raw_clams_files(directory_path):
+    """Return the sorted paths of all CLAMS data files (.csv) in the provided directory, regardless of extension case."""
+    csv_pattern = re.compile(r"\.csv$", re.IGNORECASE)
+    all_files = glob.iglob(os.path.join(directory_path, "*"))
+    return sorted(file_path for file_path in all_files if csv_pattern.search(file_path))
+
+
+def with_table_extension(file_name, output_format):
+    """Replace the extension of a file name with the extension of the given table format."""
+    return os.path.splitext(file_name)[0] + TABLE_FORMATS[output_format]
+
+
+def list_table_files(directory_path):
+    """Return the sorted names of all files in a supported table format in the provided directory."""
+    return sorted(f for f in os.listdir(directory_path) if os.path.isfile(os.path.join(directory_path, f)) and
+                  os.path.splitext(f)[1].lower() in TABLE_FORMATS.values())
+
+
+@contextmanager
+def atomic_output_path(file_path):
+    """Give a temporary path to write a file to, which replaces the file once it has been written completely.
+
+    The temporary file is in the same directory, so replacing the file is a single rename, and its name does not end
+    in a table extension, so no stage ever reads a partly written file. It is removed if writing fails.
+    """
+    temporary_path = f"{file_path}.{os.getpid()}.partial"
+    try:
+        yield temporary_path
+        os.replace(temporary_path, file_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def write_table(df, file_path, **kwargs):
+    """Save a DataFrame without its index in the table format given by the file extension.
+
+    The file is replaced in a single step once it has been written completely. Extra arguments are passed to
+    DataFrame.to_csv.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    with atomic_output_path(file_path) as temporary_path:
+        if ext == TABLE_FORMATS["parquet"]:
+            df.to_parquet(temporary_path, index=False)
+        elif ext == TABLE_FORMATS["feather"]:
+            df.reset_index(drop=True).to_feather(temporary_path)
+        else:
+            df.to_csv(temporary_path, index=False, **kwargs)
+
+
+def read_table(file_path, columns=None):
+    """Read a table saved by write_table, optionally reading only the listed columns."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == TABLE_FORMATS["parquet"]:
+        return pd.read_parquet(file_path, columns=columns)
+    elif ext == TABLE_FORMATS["feather"]:
+        return pd.read_feather(file_path, columns=columns)
+    return read_clams_csv(file_path, columns=columns)
+
+
+def read_clams_csv(file, columns=None, **kwargs):
+    """Read CLAMS data from a .csv file path or open file with the compact CLAMS_COLUMN_TYPES.
 
     Parameters:
-    directory_path (string): directory containing .csv files to clean
+    file (string or file): .csv file to read; an open file is read from its current position
+    columns (list): only read these columns, or None to read all columns
+    kwargs: passed on to pd.read_csv
 
     Returns:
-    Nothing. Prints new filenames saved to "Cleaned_CLAMS_data" directory.
+    DataFrame of the data. Files with values that do not fit the declared types, e.g. an integer column with missing
+    values, are read with inferred types instead.
     """
+    usecols = None if columns is None else set(columns).__contains__
+    start_position = None if isinstance(file, str) else file.tell()
+    try:
+        df = pd.read_csv(file, dtype=CLAMS_COLUMN_TYPES, usecols=usecols, **kwargs)
+    except (ValueError, OverflowError):
+        if start_position is not None:
+            file.seek(start_position)
+        df = pd.read_csv(file, usecols=usecols, **kwargs)
 
-    def clean_file(file_path, output_directory):
-        """Helper function to clean individual file."""
-        # Read the file as plain text to extract metadata
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
+    if 'CHAN' in df.columns:
+        df['CHAN'] = df['CHAN'].astype('category')
+    return df
 
-        # Extract the "Subject ID" value
-        for line in lines:
-            if 'Subject ID' in line:
-                subject_id = line.split(',')[1].strip()
-                break
 
-        # Read the data chunk of the CSV file
-        df = pd.read_csv(file_path, skiprows=range(0, 22))
+def iter_clams_csv_chunks(file, chunk_rows, columns=None, **kwargs):
+    """Read CLAMS data from a .csv file path or open file in chunks with the compact CLAMS_COLUMN_TYPES.
 
-        # Drop additional 2 formatting rows
-        df.drop([0, 1], inplace=True)
+    Parameters:
+    file (string or file): .csv file to read; an open file is read from its current position
+    chunk_rows (int): number of rows in each chunk
+    columns (list): only read these columns, or None to read all columns
+    kwargs: passed on to pd.read_csv
 
-        # Construct the new file name
-        file_name = os.path.basename(file_path)
-        base_name, ext = os.path.splitext(file_name)
-        ext = ext.lower()
-        new_file_name = f"{base_name}_ID{subject_id}{ext}"
+    Returns:
+    Generator of DataFrames, stopping to read the file when it is closed. Raises ClamsSchemaError when a chunk does not
+    fit the declared types, as the chunks read so far cannot be read again with inferred types.
+    """
+    usecols = None if columns is None else set(columns).__contains__
+    try:
+        with pd.read_csv(file, dtype=CLAMS_COLUMN_TYPES, usecols=usecols, chunksize=chunk_rows, **kwargs) as reader:
+            yield from reader
+    except (ValueError, OverflowError) as e:
+        raise ClamsSchemaError(str(e)) from e
+
+
+def parse_clams_timestamps(values, errors='raise'):
+    """Convert "DATE/TIME" values to datetimes.
+
+    Values in the format of the raw CLAMS exports are parsed with that format; other values, such as the ISO
+    timestamps of saved trimmed files, fall back to format inference with the given errors handling.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    try:
+        return pd.to_datetime(values, format=CLAMS_DATE_TIME_FORMAT)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values, errors=errors)
+
+
+def read_raw_clams_file(file_path, columns=None):
+    """Read a raw CLAMS data file in a single pass.
+
+    The metadata block is read line by line until the data header (the line starting with INTERVAL) is found, and
+    the data section is then parsed from the same open file, skipping the 2 formatting rows below the header.
+
+    Parameters:
+    file_path (string): path to the raw .csv file
+    columns (list): only read these data columns, or None to read all columns
+
+    Returns:
+    Tuple of a dictionary of the metadata fields (e.g. "Subject ID", "Subject Mass") and the data as a DataFrame.
+    """
+    with open(file_path, 'r') as f:
+        metadata = read_raw_clams_metadata(f)
+
+        # Parse the data section starting from the header line
+        df = read_clams_csv(f, columns=columns, skiprows=[1, 2])
+
+    return metadata, df
+
+
+def read_raw_clams_metadata(f, all_values=False):
+    """Read the metadata block of an open raw CLAMS data file, opened in text or binary mode.
+
+    Parameters:
+    f (file): raw CLAMS data file, open at its start
+    all_values (bool): keep every value of each metadata line as a list, for combined exports that list a value per
+    chamber, instead of only the first value
 
-        # Save the cleaned data to the new directory
-        output_path = os.path.join(output_directory, new_file_name)
-        df.to_csv(output_path, index=False)
-        print(f"Cleaning {file_name}")
+    Returns:
+    Dictionary of the metadata fields. The file is left at the start of the data header line.
+    """
+    metadata = {}
+    while True:
+        header_position = f.tell()
+        line = f.readline()
+        if not line:
+            raise ValueError(f"No data header found in {os.path.basename(getattr(f, 'name', 'the file'))}")
+        if isinstance(line, bytes):
+            line = line.decode(errors='replace')
+
+        fields = [field.strip() for field in line.split(',')]
+        if fields[0] == 'INTERVAL':
+            break
+
+        # Store "name,value" metadata lines
+        if fields[0] and len(fields) > 1:
+            metadata[fields[0]] = [field for field in fields[1:] if field] if all_values else fields[1]
+
+    f.seek(header_position)
+    return metadata
+
+
+def cleaned_file_name(file_path, metadata):
+    """Return the name of the cleaned file of a raw CLAMS data file, which carries the subject ID."""
+    # Extract the "Subject ID" value
+    subject_id = metadata.get('Subject ID')
+    if subject_id is None:
+        raise ValueError(f"No Subject ID found in {os.path.basename(file_path)}")
+
+    # Construct the new file name
+    file_name = os.path.basename(file_path)
+    base_name, ext = os.path.splitext(file_name)
+    ext = ext.lower()
+    return f"{base_name}_ID{subject_id}{ext}"
+
+
+def clean_clams_file(file_path, columns=None, parse_timestamps=False):
+    """Read a raw CLAMS data file and drop the metadata and formatting rows.
+
+    Parameters:
+    file_path (string): path to the raw .csv file
+    columns (list): only keep these data columns, or None to keep all columns
+    parse_timestamps (bool): convert "DATE/TIME" to datetime, which takes far less memory than the text; leave it
+    unset when the cleaned data is saved as .csv files, so they keep the timestamps of the raw file
+
+    Returns:
+    Tuple of the cleaned DataFrame and the cleaned file name, which carries the subject ID.
+    """
+    metadata, df = read_raw_clams_file(file_path, columns)
+    if parse_timestamps:
+        df['DATE/TIME'] = parse_clams_timestamps(df['DATE/TIME'], errors='coerce')
+
+    return df, cleaned_file_name(file_path, metadata)
+
+
+def chamber_subject_ids(metadata):
+    """Map the chambers of a raw CLAMS data file to their subject IDs.
+
+    A combined export lists a subject ID per chamber on its "Subject ID" line, for the chambers on its "Chamber" line
+    in the same order, or for chambers 1, 2, ... when there is no "Chamber" line.
+
+    Parameters:
+    metadata (dict): metadata read by read_raw_clams_metadata with all_values set
+
+    Returns:
+    Dictionary of the subject IDs by chamber number.
+    """
+    subject_ids = metadata.get('Subject ID', [])
+    chambers = metadata.get('Chamber') or [str(chamber) for chamber in range(1, len(subject_ids) + 1)]
+    if len(chambers) != len(subject_ids):
+        raise ValueError(f"The metadata lists {len(chambers)} chambers but {len(subject_ids)} subject IDs")
+    return {int(float(chamber)): subject_id for chamber, subject_id in zip(chambers, subject_ids)}
+
+
+def is_clams_export(file_path):
+    """Return True if a raw CLAMS data file is a combined export holding the data of several chambers."""
+    with open(file_path, 'r') as f:
+        return len(read_raw_clams_metadata(f, all_values=True).get('Subject ID', [])) > 1
+
+
+def route_chamber_chunks(chunks, subject_ids, file_path):
+    """Collect the rows of each chamber from chunks of a combined export, see split_clams_export.
+
+    Returns:
+    Dictionary of the lists of DataFrames of each chamber in subject_ids, in recording order.
+    """
+    chamber_chunks = {chamber: [] for chamber in subject_ids}
+    for chunk in chunks:
+        for chamber, rows in chunk.groupby(chunk['CHAN'].to_numpy(), sort=False):
+            if chamber not in chamber_chunks:
+                raise ValueError(f"Chamber {chamber} of {os.path.basename(file_path)} has no Subject ID")
+            chamber_chunks[chamber].append(rows)
+    return chamber_chunks
+
+
+def split_clams_export(file_path, columns=None, parse_timestamps=False, chunk_rows=SPLIT_CHUNK_ROWS):
+    """Split a combined export of several chambers into the cleaned data of each subject in a single pass.
+
+    The data section is read in chunks, and the rows of each chunk are routed to their subject by their CHAN value,
+    so the file is read once however many chambers it holds, and is never held whole as text.
 
+    Parameters:
+    file_path (string): path to the combined export
+    columns (list): only keep these data columns, or None to keep all columns; CHAN is always read
+    parse_timestamps (bool): convert "DATE/TIME" to datetime, as in clean_clams_file
+    chunk_rows (int): number of rows read at a time
+
+    Returns:
+    List of tuples of the cleaned DataFrame and the cleaned file name of each chamber, in chamber order. The file names
+    carry the chamber number and the subject ID, e.g. "export_chamber3_ID103.csv".
+    """
+    if columns is not None and 'CHAN' not in columns:
+        columns = ['CHAN'] + list(columns)
+
+    with open(file_path, 'r') as f:
+        subject_ids = chamber_subject_ids(read_raw_clams_metadata(f, all_values=True))
+        header_position = f.tell()
+        try:
+            chamber_chunks = route_chamber_chunks(iter_clams_csv_chunks(f, chunk_rows, columns, skiprows=[1, 2]),
+                                                  subject_ids, file_path)
+        except ClamsSchemaError:
+            # Read the chunks again with inferred types instead
+            f.seek(header_position)
+            usecols = None if columns is None else set(columns).__contains__
+            with pd.read_csv(f, usecols=usecols, skiprows=[1, 2], chunksize=chunk_rows) as reader:
+                chamber_chunks = route_chamber_chunks(reader, subject_ids, file_path)
+
+    base_name, ext = os.path.splitext(os.path.basename(file_path))
+    subjects = []
+    for chamber, subject_id in sorted(subject_ids.items()):
+        if not chamber_chunks[chamber]:
+            continue
+        df = pd.concat(chamber_chunks[chamber], ignore_index=True)
+        df['CHAN'] = df['CHAN'].astype('category')
+        if parse_timestamps:
+            df['DATE/TIME'] = parse_clams_timestamps(df['DATE/TIME'], errors='coerce')
+        subjects.append((df, f"{base_name}_chamber{chamber}_ID{subject_id}{ext.lower()}"))
+    return subjects
+
+
+def clean_all_clams_data(directory_path, output_format="csv"):
+    """Reformat all CLAMS data files (.csv) in the provided directory by dropping unnecessary rows.
+
+    Parameters:
+    directory_path (string): directory containing .csv files to clean
+    output_format (string): table format of the cleaned files, one of TABLE_FORMATS
+
+    Returns:
+    Nothing. Prints new filenames saved to "Cleaned_CLAMS_data" directory.
+    """
     # Create the output directory if it doesn't exist
     output_directory = os.path.join(directory_path, "Cleaned_CLAMS_data")
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
         # Process all CSV files in the directory, regardless of extension case
-        csv_pattern = re.compile(r"\.csv$", re.IGNORECASE)
-        all_files = glob.iglob(os.path.join(directory_path, "*"))
-        csv_files = [file_path for file_path in all_files if csv_pattern.search(file_path)]
+        for file_path in list_raw_clams_files(directory_path):
+            # Combined exports are split into a cleaned file per chamber
+            # Columnar formats keep the timestamps as datetimes, so trimming does not parse them again
+            parse_timestamps = output_format != "csv"
+            if is_clams_export(file_path):
+                cleaned_files = split_clams_export(file_path, parse_timestamps=parse_timestamps)
+            else:
+                cleaned_files = [clean_clams_file(file_path, parse_timestamps=parse_timestamps)]
+
+            # Save the cleaned data to the new directory
+            for df, new_file_name in cleaned_files:
+                output_path = os.path.join(output_directory, with_table_extension(new_file_name, output_format))
+                write_table(df, output_path)
+            print(f"Cleaning {os.path.basename(file_path)}")
+
 
-        for file_path in csv_files:
-            clean_file(file_path, output_directory)
+def build_light_phase_index(led_values):
+    """Index the light phases of a recording.
 
+    Parameters:
+    led_values (Series): "LED LIGHTNESS" value of each sample
+
+    Returns:
+    DataFrame with one row per light phase: the POSITION of its first sample, its LED LIGHTNESS and whether it is
+    DARK. The first phase starts at position 0 and every following phase starts where "LED LIGHTNESS" changes.
+    """
+    values = led_values.to_numpy()
+    positions = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))[:len(values)]
+    return pd.DataFrame({'POSITION': positions, 'LED LIGHTNESS': values[positions], 'DARK': values[positions] == 0})
+
+
+def find_light_phase_start(light_phase_index, position, start_dark):
+    """Find the first light change after a position that starts the light cycle specified by the user.
+
+    Parameters:
+    light_phase_index (DataFrame): light phases built by build_light_phase_index
+    position (int): position of the sample to search from
+    start_dark (bool): look for the start of a dark cycle instead of a light cycle
+
+    Returns:
+    Position of the first sample of the matching light phase.
+    """
+    phase_positions = light_phase_index['POSITION'].to_numpy()
 
-def trim_all_clams_data(directory_path, trim_hours, keep_hours, start_dark):
+    # Find the next change in the "LED LIGHTNESS" value
+    phase = np.searchsorted(phase_positions, position, side='right')
+
+    # Move to the next light change if the 1st light change does not match the cycle specified by the user
+    if phase < len(phase_positions) and light_phase_index['DARK'].iloc[phase] != start_dark:
+        phase += 1
+
+    if phase >= len(phase_positions):
+        raise ValueError("No light cycle change matching the selected start cycle found after trimming")
+
+    return phase_positions[phase]
+
+
+def zero_accumulative_columns(df, baseline):
+    """Subtract the value each accumulative column had before the kept data, in place.
+
+    Each column is subtracted on its own, so integer columns such as WHEEL ACC stay integers.
+
+    Parameters:
+    df (DataFrame): trimmed CLAMS data
+    baseline (dict): value of each accumulative column at the sample before the kept data
+    """
+    for column, value in baseline.items():
+        df[column] = (df[column] - value).round(2)
+
+
+def find_trim_start(timestamps, led_values, trim_hours, start_dark):
+    """Find the position of the first sample of the trimmed data.
+
+    Parameters:
+    timestamps (Series): datetime values of each sample, in recording order
+    led_values (Series): "LED LIGHTNESS" value of each sample
+    trim_hours (int): number of hours to trim from the beginning
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+
+    Returns:
+    Position of the first sample of the first light phase matching start_dark that starts after trim_hours.
+    """
+    # Calculate the starting timestamp after trimming
+    trimmed_positions = np.flatnonzero(timestamps >= timestamps.iloc[0] + timedelta(hours=trim_hours))
+    if len(trimmed_positions) == 0:
+        raise ValueError(f"Trim hours ({trim_hours}) exceeds the length of the recording")
+
+    # Start at the first light change after trimming that matches the cycle specified by the user
+    light_phase_index = build_light_phase_index(led_values)
+    return find_light_phase_start(light_phase_index, trimmed_positions[0], start_dark)
+
+
+def trim_clams_dataframe(df, trim_hours, keep_hours, start_dark):
+    """Trim cleaned CLAMS data to the requested light cycle and re-zero the accumulative columns.
+
+    Parameters:
+    df (DataFrame): cleaned CLAMS data for a single subject
+    trim_hours (int): number of hours to trim from the beginning
+    keep_hours (int): number of hours to keep in the resulting data
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+
+    Returns:
+    Trimmed DataFrame with "DATE/TIME" converted to datetime. The input DataFrame is not modified.
+    """
+    # Convert the 'DATE/TIME' column to datetime format
+    timestamps = parse_clams_timestamps(df['DATE/TIME'], errors='coerce')
+    start_index = find_trim_start(timestamps, df['LED LIGHTNESS'], trim_hours, start_dark)
+
+    # Calculate the ending timestamp
+    end_time = timestamps.iloc[start_index] + timedelta(hours=keep_hours)
+
+    # Filter the dataframe from calculated start_index to end_time
+    keep_rows = (timestamps.iloc[start_index:] <= end_time).to_numpy()
+    df_result = df.iloc[start_index:][keep_rows].copy()
+    df_result['DATE/TIME'] = timestamps.iloc[start_index:][keep_rows]
+
+    # Zero columns that contain accumulative variables to appropriately account for variable trimming times
+    zero_accumulative_columns(df_result, {col: df[col].iloc[start_index - 1] for col in ACCUMULATIVE_COLUMNS})
+
+    return df_result.reset_index(drop=True)
+
+
+def trim_clams_chunks(chunks, trim_hours, keep_hours, start_dark):
+    """Trim cleaned CLAMS data that is read in chunks, holding only the kept rows in memory.
+
+    The trim start and the matching light change are found as the chunks arrive, and the accumulative columns are
+    re-zeroed with the values of the sample before the kept data, as in trim_clams_dataframe. Reading stops at the
+    first chunk with a timestamp after the end of the kept data, so the result matches trim_clams_dataframe for
+    recordings whose timestamps only increase.
+
+    Parameters:
+    chunks (iterable): consecutive DataFrames of cleaned CLAMS data for a single subject
+    trim_hours (int): number of hours to trim from the beginning
+    keep_hours (int): number of hours to keep in the resulting data
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+
+    Returns:
+    Trimmed DataFrame with "DATE/TIME" converted to datetime.
+    """
+    trim_start_time = trim_position = start_position = end_time = baseline = None
+    previous_led = previous_accumulators = None
+    light_changes_after_trim = 0
+    kept_chunks = []
+
+    offset = 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        timestamps = parse_clams_timestamps(chunk['DATE/TIME'], errors='coerce')
+        keep_from = 0
+
+        if start_position is None:
+            # Calculate the starting timestamp after trimming from the first sample
+            if trim_start_time is None:
+                trim_start_time = timestamps.iloc[0] + timedelta(hours=trim_hours)
+            if trim_position is None:
+                trimmed_positions = np.flatnonzero(timestamps >= trim_start_time)
+                if len(trimmed_positions):
+                    trim_position = offset + trimmed_positions[0]
+
+            if trim_position is not None:
+                # Find the light changes after trimming, including a change at the first sample of this chunk
+                led_values = chunk['LED LIGHTNESS'].to_numpy()
+                previous_values = np.concatenate(([led_values[0] if previous_led is None else previous_led],
+                                                  led_values[:-1]))
+                light_changes = np.flatnonzero(led_values != previous_values)
+                for position in light_changes[offset + light_changes > trim_position]:
+                    # Move to the next light change if the 1st one does not match the cycle specified by the user
+                    light_changes_after_trim += 1
+                    if (led_values[position] == 0) == start_dark or light_changes_after_trim == 2:
+                        start_position = offset + position
+                        keep_from = position
+                        break
+
+            if start_position is not None:
+                baseline = ({col: chunk[col].iloc[keep_from - 1] for col in ACCUMULATIVE_COLUMNS} if keep_from > 0
+                            else previous_accumulators)
+                end_time = timestamps.iloc[keep_from] + timedelta(hours=keep_hours)
+            else:
+                previous_led = chunk['LED LIGHTNESS'].iloc[-1]
+                previous_accumulators = {col: chunk[col].iloc[-1] for col in ACCUMULATIVE_COLUMNS}
+                offset += len(chunk)
+                continue
+
+        # Keep the samples up to the ending timestamp
+        window_timestamps = timestamps.iloc[keep_from:]
+        keep_rows = (window_timestamps <= end_time).to_numpy()
+        kept_chunk = chunk.iloc[keep_from:][keep_rows].copy()
+        kept_chunk['DATE/TIME'] = window_timestamps[keep_rows]
+        kept_chunks.append(kept_chunk)
+        if (window_timestamps > end_time).any():
+            break
+        offset += len(chunk)
+
+    if trim_position is None:
+        raise ValueError(f"Trim hours ({trim_hours}) exceeds the length of the recording")
+    if start_position is None:
+        raise ValueError("No light cycle change matching the selected start cycle found after trimming")
+
+    df_result = pd.concat(kept_chunks)
+    if 'CHAN' in df_result.columns:
+        df_result['CHAN'] = df_result['CHAN'].astype('category')
+
+    # Zero columns that contain accumulative variables to appropriately account for variable trimming times
+    zero_accumulative_columns(df_result, baseline)
+
+    return df_result.reset_index(drop=True)
+
+
+def trim_clams_file(file_path, trim_hours, keep_hours, start_dark, chunk_rows=None):
+    """Read and trim a cleaned CLAMS data file.
+
+    Parameters:
+    file_path (string): path to the cleaned file
+    trim_hours (int): number of hours to trim from the beginning
+    keep_hours (int): number of hours to keep in the resulting data
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    chunk_rows (int): stream .csv files in chunks of this many rows with trim_clams_chunks, or None to read the whole
+    file
+
+    Returns:
+    Trimmed DataFrame with "DATE/TIME" converted to datetime.
+    """
+    if chunk_rows and os.path.splitext(file_path)[1].lower() == TABLE_FORMATS["csv"]:
+        try:
+            return trim_clams_chunks(iter_clams_csv_chunks(file_path, chunk_rows), trim_hours, keep_hours, start_dark)
+        except ClamsSchemaError:
+            # Read the whole file with inferred types instead
+            pass
+    return trim_clams_dataframe(read_table(file_path), trim_hours, keep_hours, start_dark)
+
+
+def trim_raw_clams_file(file_path, trim_hours, keep_hours, start_dark, chunk_rows, columns=None):
+    """Clean and trim a raw CLAMS data file in chunks, without holding the whole recording in memory.
+
+    Parameters:
+    file_path (string): path to the raw .csv file
+    trim_hours (int): number of hours to trim from the beginning
+    keep_hours (int): number of hours to keep in the resulting data
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    chunk_rows (int): number of rows read at a time
+    columns (list): only keep these data columns, or None to keep all columns
+
+    Returns:
+    Tuple of the trimmed DataFrame and the cleaned file name.
+    """
+    with open(file_path, 'r') as f:
+        metadata = read_raw_clams_metadata(f)
+        new_file_name = cleaned_file_name(file_path, metadata)
+        try:
+            chunks = iter_clams_csv_chunks(f, chunk_rows, columns=columns, skiprows=[1, 2])
+            return trim_clams_chunks(chunks, trim_hours, keep_hours, start_dark), new_file_name
+        except ClamsSchemaError:
+            pass
+
+    # Read the whole file with inferred types instead
+    cleaned_df, _ = clean_clams_file(file_path, columns, parse_timestamps=True)
+    return trim_clams_dataframe(cleaned_df, trim_hours, keep_hours, start_dark), new_file_name
+
+
+def trim_all_clams_data(directory_path, trim_hours, keep_hours, start_dark, output_format="csv", chunk_rows=None):
     """Trims all cleaned CLAMS data files in the specified directory.
 
     Parameters:
     directory_path (string): path to the directory containing cleaned .csv files
     trim_hours (int): number of hours to trim from the beginning
     keep_hours (int): number of hours to keep in the resulting file
+    output_format (string): table format of the trimmed files, one of TABLE_FORMATS
+    chunk_rows (int): stream the cleaned .csv files in chunks of this many rows, stopping at the end of the kept data,
+    or None to read each file whole
 
     Returns:
     Nothing. Saves the trimmed data to new CSV files in the "Trimmed_CLAMS_data" directory.
@@ -81,121 +675,282 @@ def trim_all_clams_data(directory_path, trim_hours, keep_hours, start_dark):
     cleaned_directory = os.path.join(directory_path, "Cleaned_CLAMS_data")
 
     # List all files in the directory
-    files = [f for f in os.listdir(cleaned_directory) if
-             os.path.isfile(os.path.join(cleaned_directory, f)) and f.endswith('.csv')]
+    files = list_table_files(cleaned_directory)
 
     for file in files:
         file_path = os.path.join(cleaned_directory, file)
 
-        # Read the cleaned CSV file
-        df = pd.read_csv(file_path)
+        # Read the cleaned file and trim it
+        df_result = trim_clams_file(file_path, trim_hours, keep_hours, start_dark, chunk_rows)
 
-        # Convert the 'DATE/TIME' column to datetime format
-        df['DATE/TIME'] = pd.to_datetime(df['DATE/TIME'], errors='coerce')
+        # Save the resulting data to a new file in the "Trimmed_CLAMS_data" directory
+        file_name = os.path.basename(file_path)
+        base_name = os.path.splitext(file)[0]
+        ext = TABLE_FORMATS[output_format]
+        new_file_name = os.path.join(trimmed_directory, f"{base_name}_trimmed{ext}")
+        write_table(df_result, new_file_name)
+        print(f"Trimming {file_name}")
 
-        # Calculate the starting timestamp after trimming
-        start_index = df[df['DATE/TIME'] >= df['DATE/TIME'].iloc[0] + timedelta(hours=trim_hours)].index[0]
 
-        # Note the value in the "LED LIGHTNESS" column after trimming
-        initial_led_value = df['LED LIGHTNESS'].iloc[start_index]
+def sampling_interval(times):
+    """Return the typical time between samples in nanoseconds, the median difference of the timestamps.
 
-        # Find the index of the next change in the "LED LIGHTNESS" value
-        while df['LED LIGHTNESS'].iloc[start_index] == initial_led_value:
-            start_index += 1
+    Parameters:
+    times (numpy array): int64 nanosecond timestamps, in recording order
+    """
+    if len(times) < 2:
+        raise ValueError("At least 2 samples are needed to find the sampling interval!")
+    return max(int(np.median(np.diff(times))), 1)
 
-        # Determine if the 1st light change does not match the cycle specified by the user and adjust start_index to the next light change if necessary
-        if (start_dark and df['LED LIGHTNESS'].iloc[start_index] != 0) or (not start_dark and df['LED LIGHTNESS'].iloc[start_index] == 0):
-            initial_led_value = df['LED LIGHTNESS'].iloc[start_index]
-            while df['LED LIGHTNESS'].iloc[start_index] == initial_led_value:
-                start_index += 1
 
-        # Zero columns that contain accumulative variables to appropriately account for variable trimming times
-        columns_to_zero = ['ACCO2', 'ACCCO2', 'FEED1 ACC', 'WHEEL ACC']
-        for col in columns_to_zero:
-                df[col] = (df[col] - df[col].iloc[start_index - 1]).round(2)
+def grid_interval(times):
+    """Return the time between the samples of resampled data in nanoseconds, as a float.
 
-        # Calculate the ending timestamp
-        end_time = df['DATE/TIME'].iloc[start_index] + timedelta(hours=keep_hours)
+    Parameters:
+    times (numpy array): int64 nanosecond timestamps of the grid, which are rounded to whole seconds
+    """
+    if len(times) < 2:
+        raise ValueError("At least 2 samples are needed to find the sampling interval!")
+    return (times[-1] - times[0]) / (len(times) - 1)
 
-        # Filter the dataframe from calculated start_index to end_time
-        df_result = df[(df.index >= start_index) & (df['DATE/TIME'] <= end_time)]
 
-        # Save the resulting data to a new CSV file in the "Trimmed_CLAMS_data" directory
-        file_name = os.path.basename(file_path)
-        base_name, ext = os.path.splitext(file)
-        ext = ext.lower()
-        new_file_name = os.path.join(trimmed_directory, f"{base_name}_trimmed{ext}")
-        df_result.to_csv(new_file_name, index=False)
-        print(f"Trimming {file_name}")
+def resample_clams_dataframe(df, interval_seconds=None):
+    """Snap trimmed CLAMS data of a single subject onto a regular grid of sample times.
+
+    Each sample is placed on the grid by rounding the time since the sample before it to a whole number of sampling
+    intervals, so a sampling interval that is slightly off does not add up over a long recording; a sample less than
+    half an interval after the one before it lands on the same grid position and is dropped. The grid starts at the
+    first sample and steps by the average interval between the grid positions of the first and last sample, with the
+    grid times rounded to whole seconds like the CLAMS exports. Grid positions without a sample become rows with
+    missing values and MISSING_SAMPLE_COLUMN set; they keep the CHAN and LED LIGHTNESS of the sample before them.
 
+    Parameters:
+    df (DataFrame): trimmed CLAMS data
+    interval_seconds (float): expected time between samples, or None for the median time between samples
 
-def bin_clams_data(file_path, bin_hours):
-    df = pd.read_csv(file_path)
+    Returns:
+    Resampled DataFrame with "DATE/TIME" on the grid and a boolean MISSING_SAMPLE_COLUMN. The input DataFrame is not
+    modified.
+    """
+    times_series = parse_clams_timestamps(df['DATE/TIME'])
+    times = times_series.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if interval_seconds is None:
+        interval = sampling_interval(times)
+    else:
+        interval = pd.Timedelta(seconds=interval_seconds).value
+
+    # Grid position of each sample, keeping the first sample of each position
+    steps = np.rint(np.diff(times) / interval).astype(np.int64)
+    grid_positions = np.concatenate([[0], np.cumsum(steps)])
+    grid_positions, kept_rows = np.unique(grid_positions, return_index=True)
+    grid_length = grid_positions[-1] + 1
+    if grid_length > 1:
+        interval = (times[kept_rows[-1]] - times[0]) / (grid_length - 1)
+
+    # Integer columns become nullable integers, so the samples that are present keep their values and types
+    kept_df = df.iloc[kept_rows]
+    kept_df = kept_df.astype({column: str(dtype).capitalize() for column, dtype in kept_df.dtypes.items()
+                              if isinstance(dtype, np.dtype) and dtype.kind == 'i'})
+    resampled = kept_df.set_axis(grid_positions).reindex(np.arange(grid_length))
+    grid_times = pd.to_datetime(times[0] + np.rint(interval * np.arange(grid_length)).astype(np.int64))
+    resampled['DATE/TIME'] = grid_times.round('s')
+    missing = np.ones(grid_length, dtype=bool)
+    missing[grid_positions] = False
+    resampled[MISSING_SAMPLE_COLUMN] = missing
+    for column in ['CHAN', 'LED LIGHTNESS']:
+        if column in resampled.columns:
+            resampled[column] = resampled[column].ffill()
+            if pd.api.types.is_integer_dtype(df[column].dtype):
+                resampled[column] = resampled[column].astype(df[column].dtype)
+    return resampled.reset_index(drop=True)
+
+
+def find_sample_gaps(resampled_df):
+    """List the runs of missing samples in resampled CLAMS data.
 
-    # Convert 'DATE/TIME' column to datetime format
-    df['DATE/TIME'] = pd.to_datetime(df['DATE/TIME'])
+    Returns:
+    DataFrame with one row per gap: the "GAP START" and "GAP END" grid times of its first and last missing sample, the
+    number of "MISSING SAMPLES", the "GAP MINUTES" they span and the "HOURS FROM START" of the data to the gap.
+    """
+    missing = resampled_df[MISSING_SAMPLE_COLUMN].to_numpy(dtype=bool)
+    times = parse_clams_timestamps(resampled_df['DATE/TIME']).reset_index(drop=True)
+    edges = np.diff(np.concatenate([[0], missing.astype(np.int8), [0]]))
+    gap_starts, gap_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    interval = grid_interval(times.to_numpy(dtype='datetime64[ns]').astype(np.int64)) if len(times) > 1 else 0
+
+    return pd.DataFrame({
+        "GAP START": times.iloc[gap_starts].to_numpy(),
+        "GAP END": times.iloc[gap_ends - 1].to_numpy(),
+        "MISSING SAMPLES": gap_ends - gap_starts,
+        "GAP MINUTES": (gap_ends - gap_starts) * interval / pd.Timedelta(minutes=1).value,
+        "HOURS FROM START": ((times.iloc[gap_starts] - times.iloc[0]).dt.total_seconds() / 3600).to_numpy(),
+    })
+
+
+def describe_sample_gaps(gaps, max_listed=5):
+    """Summarize the gaps found by find_sample_gaps in a line of text, listing the longest ones."""
+    if gaps.empty:
+        return "no gaps"
+    longest_gaps = gaps.sort_values("GAP MINUTES", ascending=False, kind="stable").head(max_listed)
+    listed_gaps = ", ".join(f"{gap['GAP MINUTES']:g} min at hour {gap['HOURS FROM START']:.2f}"
+                            for _, gap in longest_gaps.iterrows())
+    more_gaps = f" and {len(gaps) - max_listed} more" if len(gaps) > max_listed else ""
+    return (f"{len(gaps)} gaps, {gaps['MISSING SAMPLES'].sum()} missing samples "
+            f"({gaps['GAP MINUTES'].sum():g} min): {listed_gaps}{more_gaps}")
+
+
+def assign_bin_labels(timestamps, led_values, bin_hours, open_bins=None):
+    """Assign bin labels to each sample, counting bins separately for each "LED LIGHTNESS" value.
+
+    A new bin starts at the first sample that is at least bin_hours after the start of the current bin. Bin boundaries
+    are located with a binary search over the timestamps, so the cost scales with the number of bins, not samples.
+    As a label only depends on the samples before it, samples appended to a recording can be labelled on their own by
+    passing the open_bins of the samples labelled before them.
 
+    Parameters:
+    timestamps (Series): datetime values of each sample, in recording order
+    led_values (Series): "LED LIGHTNESS" value of each sample
+    bin_hours (int): size of each bin in hours
+    open_bins (dict): label and start time (in ns) of the last bin of each "LED LIGHTNESS" value so far, which the
+    samples continue; it is updated with the last bins of the samples
+
+    Returns:
+    numpy array of integer bin labels aligned with the input rows.
+    """
+    times = timestamps.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    leds = led_values.to_numpy()
+    bin_width = pd.Timedelta(hours=bin_hours).value
+    labels = np.zeros(len(times), dtype=np.int64)
+
+    for led_value in pd.unique(leds):
+        positions = np.flatnonzero(leds == led_value)
+        subset_times = times[positions]
+        subset_labels = np.empty(len(positions), dtype=np.int64)
+
+        bin_label = 0
+        bin_start = 0
+        if open_bins is not None and led_value in open_bins:
+            # Fill the open bin first
+            bin_label, open_bin_start_time = open_bins[led_value]
+            bin_start = np.searchsorted(subset_times, open_bin_start_time + bin_width, side='left')
+            subset_labels[:bin_start] = bin_label
+            bin_label += 1
+        while bin_start < len(positions):
+            next_start = np.searchsorted(subset_times, subset_times[bin_start] + bin_width, side='left')
+            subset_labels[bin_start:next_start] = bin_label
+            if open_bins is not None:
+                open_bins[led_value] = (bin_label, subset_times[bin_start])
+            bin_label += 1
+            bin_start = next_start
+
+        labels[positions] = subset_labels
+
+    return labels
+
+
+def prepare_for_binning(df):
+    """Drop the columns that are not binned and add the AMB and AMB ACC columns. The input DataFrame is not modified."""
     # Drop unnecessary columns
     columns_to_drop = ["STATUS1", "O2IN", "O2OUT", "DO2", "CO2IN", "CO2OUT", "DCO2", "XTOT", "YTOT", "LED HUE",
                        "LED SATURATION", "BIN"]
     df = df.drop(columns=columns_to_drop, errors='ignore')
 
+    # Convert 'DATE/TIME' column to datetime format
+    df['DATE/TIME'] = parse_clams_timestamps(df['DATE/TIME'])
+
     # Add AMB & AMB ACC columns to the original dataframe
     df['AMB'] = df['XAMB'] + df['YAMB']
     df['AMB ACC'] = df['AMB'].cumsum()
+    return df
 
-    # Create a new column for bin labels
-    df['BIN'] = np.nan
 
-    # For each unique "LED LIGHTNESS" value, assign bin labels
-    for led_value in df['LED LIGHTNESS'].unique():
-        subset = df[df['LED LIGHTNESS'] == led_value].copy()
-        start_time = subset['DATE/TIME'].iloc[0]
-        bin_label = 0
-        bin_labels = []
+def aggregate_bins(df, sample_counts=False):
+    """Aggregate labelled samples to one row per "LED LIGHTNESS" value and "BIN" label.
+
+    Parameters:
+    df (DataFrame): prepared CLAMS data with a BIN column
+    sample_counts (bool): also count the samples behind each averaged column, in "<column> SAMPLES" columns, so the
+    bins can later be merged by coarsen_bins
 
-        for timestamp in subset['DATE/TIME']:
-            if (timestamp - start_time) >= timedelta(hours=bin_hours):
-                bin_label += 1
-                start_time = timestamp
-            bin_labels.append(bin_label)
+    Returns:
+    DataFrame of aggregated bins, before the duration, DAY and HOUR columns are added.
+    """
+    # Columns to average (excluding the ones we're taking the last value or summing)
+    avg_columns = df.columns.difference(BIN_LAST_COLUMNS + BIN_SUM_COLUMNS + ['BIN', 'LED LIGHTNESS'])
 
-        df.loc[subset.index, 'BIN'] = bin_labels
+    # Group by "LED LIGHTNESS" and "BIN" and calculate the mean, sum, last value and bin boundaries in a single pass
+    aggregations = {**{col: (col, 'last') for col in BIN_LAST_COLUMNS},
+                    **{col: (col, 'mean') for col in avg_columns},
+                    **{col: (col, 'sum') for col in BIN_SUM_COLUMNS},
+                    'DATE/TIME_start': ('DATE/TIME', 'first'),
+                    'DATE/TIME_end': ('DATE/TIME', 'last'),
+                    'INTERVAL_start': ('INTERVAL', 'first'),
+                    'INTERVAL_end': ('INTERVAL', 'last')}
+    if sample_counts:
+        aggregations.update({f"{col} SAMPLES": (col, 'count') for col in avg_columns})
+    return df.groupby(['LED LIGHTNESS', 'BIN']).agg(**aggregations).reset_index()
 
-    # Columns to retain the last value in the bin
-    last_val_columns = ["INTERVAL", "CHAN", "DATE/TIME", "ACCO2", "ACCCO2", "FEED1 ACC", "WHEEL ACC", "AMB ACC"]
 
-    # Columns to sum within the bin
-    sum_columns = ["WHEEL", "FEED1", "AMB"]
+def coarsen_bins(aggregated, factor):
+    """Merge every factor consecutive bins of each light phase into one bin.
 
-    # Columns to average (excluding the ones we're taking the last value or summing)
-    avg_columns = df.columns.difference(last_val_columns + sum_columns + ['BIN', 'LED LIGHTNESS'])
+    Bins are only merged within a light phase, as a phase can hold fewer than factor times its share of bins when
+    samples are unevenly spaced; the last bin of a phase then merges the bins that are left. Sums are added, means are
+    weighted by their sample counts and last values carry over from the last merged bin.
+
+    Parameters:
+    aggregated (DataFrame): bins aggregated by aggregate_bins with sample_counts set, or by coarsen_bins
+    factor (int): number of bins to merge
+
+    Returns:
+    DataFrame of the merged bins, with sample counts.
+    """
+    count_columns = [col for col in aggregated.columns if col.endswith(" SAMPLES")]
+    avg_columns = [col.removesuffix(" SAMPLES") for col in count_columns]
+
+    # Number the light phases in recording order and the bins within each phase
+    aggregated = aggregated.sort_values('INTERVAL_start', kind='stable')
+    leds = aggregated['LED LIGHTNESS']
+    phases = (leds != leds.shift()).cumsum()
+    phase_bins = aggregated.groupby(phases.to_numpy()).cumcount() // factor
+
+    # Turn means back into sums so they can be added
+    weighted_sums = aggregated[avg_columns] * aggregated[count_columns].to_numpy()
+    merged = aggregated.assign(PHASE=phases.to_numpy(), BIN=phase_bins.to_numpy(),
+                               **{col: weighted_sums[col] for col in avg_columns})
 
-    # Group by "LED LIGHTNESS" and "BIN" and calculate the mean, sum, or last value as appropriate
-    df_binned = df.groupby(['LED LIGHTNESS', 'BIN']).agg({**{col: 'last' for col in last_val_columns},
-                                                          **{col: 'mean' for col in avg_columns},
-                                                          **{col: 'sum' for col in sum_columns}}).reset_index()
+    aggregations = {**{col: (col, 'last') for col in BIN_LAST_COLUMNS},
+                    **{col: (col, 'sum') for col in avg_columns + count_columns + BIN_SUM_COLUMNS},
+                    'DATE/TIME_start': ('DATE/TIME_start', 'first'),
+                    'DATE/TIME_end': ('DATE/TIME_end', 'last'),
+                    'INTERVAL_start': ('INTERVAL_start', 'first'),
+                    'INTERVAL_end': ('INTERVAL_end', 'last')}
+    coarse = merged.groupby(['LED LIGHTNESS', 'PHASE', 'BIN']).agg(**aggregations).reset_index()
+    coarse[avg_columns] = coarse[avg_columns] / coarse[count_columns].to_numpy()
 
-    # Add start and end time columns
-    start_times = df.groupby(['LED LIGHTNESS', 'BIN'])['DATE/TIME'].first().reset_index(name='DATE/TIME_start')
-    end_times = df.groupby(['LED LIGHTNESS', 'BIN'])['DATE/TIME'].last().reset_index(name='DATE/TIME_end')
-    df_binned = pd.merge(df_binned, start_times, on=['LED LIGHTNESS', 'BIN'])
-    df_binned = pd.merge(df_binned, end_times, on=['LED LIGHTNESS', 'BIN'])
+    # Count the merged bins of each light level in recording order, as assign_bin_labels does
+    coarse = coarse.sort_values('INTERVAL_start', kind='stable').drop(columns='PHASE')
+    coarse['BIN'] = coarse.groupby('LED LIGHTNESS').cumcount()
+    return coarse.reset_index(drop=True)
 
-    # Add start and end interval columns
-    start_intervals = df.groupby(['LED LIGHTNESS', 'BIN'])['INTERVAL'].first().reset_index(name='INTERVAL_start')
-    end_intervals = df.groupby(['LED LIGHTNESS', 'BIN'])['INTERVAL'].last().reset_index(name='INTERVAL_end')
-    df_binned = pd.merge(df_binned, start_intervals, on=['LED LIGHTNESS', 'BIN'])
-    df_binned = pd.merge(df_binned, end_intervals, on=['LED LIGHTNESS', 'BIN'])
 
+def finalize_bins(aggregated, bin_hours, order_column='INTERVAL_start'):
+    """Add the duration, DAY, HOUR and 24 HOUR columns to aggregated bins and order the columns.
+
+    The bins are put in recording order by order_column, and HOUR counts them in that order.
+
+    Returns:
+    Binned DataFrame in the layout of the "_Nhour_bins.csv" files. The input DataFrame is not modified.
+    """
     # Calculate the duration of each bin in hours
-    df_binned['DURATION'] = (df_binned['DATE/TIME_end'] - df_binned['DATE/TIME_start']).dt.total_seconds() / 3600
+    df_binned = aggregated.assign(
+        DURATION=(aggregated['DATE/TIME_end'] - aggregated['DATE/TIME_start']).dt.total_seconds() / 3600)
 
     # Drop rows with a duration of 0
     df_binned = df_binned[df_binned['DURATION'] != 0]
 
     # Drop existing BIN column & sort based on INTERVAL_start
-    df_binned = df_binned.sort_values(by='INTERVAL_start')
+    df_binned = df_binned.sort_values(by=order_column)
 
     # Add a DAY column
     df_binned['DAY'] = (df_binned['BIN'] // (12 / bin_hours) + 1).astype(int)
@@ -212,38 +967,343 @@ def bin_clams_data(file_path, bin_hours):
     df_binned['24 HOUR'] = (df_binned['24 HOUR'] + 1) * bin_hours
 
     # Reorder columns based on your request
-    desired_order = ["CHAN", "INTERVAL_start", "INTERVAL_end", "DATE/TIME_start", "DATE/TIME_end", "DURATION",
-                     "VO2", "ACCO2", "VCO2", "ACCCO2", "RER", "HEAT", "FLOW", "PRESSURE", "FEED1", "FEED1 ACC",
-                     "AMB", "AMB ACC", "WHEEL", "WHEEL ACC", "ENCLOSURE TEMP", "ENCLOSURE SETPOINT", "LED LIGHTNESS", "DAY", "HOUR", "24 HOUR"]
-    df_binned = df_binned[desired_order]
+    df_binned = df_binned[BINNED_COLUMNS]
 
     # Round all variables to 4 decimal places
-    df_binned = df_binned.round(4)
+    return df_binned.round(4)
+
+
+def bin_clams_dataframe(df, bin_hours):
+    """Bin trimmed CLAMS data for a single subject.
+
+    Parameters:
+    df (DataFrame): trimmed CLAMS data
+    bin_hours (int): size of each bin in hours
+
+    Returns:
+    Binned DataFrame in the layout of the "_Nhour_bins.csv" files. The input DataFrame is not modified.
+    """
+    df = prepare_for_binning(df)
+
+    # Assign bin labels separately within each "LED LIGHTNESS" value
+    df['BIN'] = assign_bin_labels(df['DATE/TIME'], df['LED LIGHTNESS'], bin_hours)
+
+    return finalize_bins(aggregate_bins(df), bin_hours)
+
 
-    # Save the binned data to a new CSV file
-    output_path = file_path.replace("Trimmed_CLAMS_data", "Binned_CLAMS_data").replace(".csv", f"_{bin_hours}hour_bins.csv")
+def bin_clams_dataframe_multiresolution(df, bin_sizes):
+    """Bin trimmed CLAMS data for a single subject at several bin sizes with a single pass over the samples.
+
+    The samples are binned once at the greatest common divisor of the bin sizes. Every larger size is built by
+    merging whole bins of the largest size already computed that divides it within each light phase, so its bin
+    boundaries follow the finest bins and can differ slightly from binning at that size directly when samples are
+    unevenly spaced.
+
+    Parameters:
+    df (DataFrame): trimmed CLAMS data
+    bin_sizes (list): sizes of the bins in hours
+
+    Returns:
+    Dictionary of binned DataFrames by bin size. The input DataFrame is not modified.
+    """
+    base_hours = math.gcd(*bin_sizes)
+    df = prepare_for_binning(df)
+    df['BIN'] = assign_bin_labels(df['DATE/TIME'], df['LED LIGHTNESS'], base_hours)
+    return finalize_bin_sizes(aggregate_bins(df, sample_counts=True), base_hours, bin_sizes)
+
+
+def finalize_bin_sizes(aggregated, base_hours, bin_sizes):
+    """Build the binned data of every bin size from bins aggregated at the greatest common divisor of the sizes.
+
+    Parameters:
+    aggregated (DataFrame): bins of base_hours aggregated by aggregate_bins with sample_counts set
+    base_hours (int): greatest common divisor of the bin sizes
+    bin_sizes (list): sizes of the bins in hours
+
+    Returns:
+    Dictionary of binned DataFrames by bin size, see bin_clams_dataframe_multiresolution.
+    """
+    aggregated_bins = {base_hours: aggregated}
+    binned = {}
+    for bin_hours in sorted(set(bin_sizes)):
+        if bin_hours not in aggregated_bins:
+            source_hours = max(hours for hours in aggregated_bins if bin_hours % hours == 0)
+            aggregated_bins[bin_hours] = coarsen_bins(aggregated_bins[source_hours], bin_hours // source_hours)
+        binned[bin_hours] = finalize_bins(aggregated_bins[bin_hours], bin_hours)
+
+    return binned
+
+
+def bin_resampled_dataframe(df, bin_hours):
+    """Bin resampled CLAMS data for a single subject by counting grid samples instead of searching timestamps.
+
+    Bins start again at every light change, as in bin_clams_dataframe, so a bin never mixes light levels. Within a
+    light phase, bin numbers follow from the grid position of each sample: a bin holds the grid samples from bin_hours
+    times its number after the start of the phase, so bin boundaries fall at the same grid positions whatever samples
+    are missing. Grid positions without a sample keep the light level of the sample before them, so a gap across a
+    light change moves the change to the first sample after the gap. The samples that are present are aggregated as in
+    bin_clams_dataframe, so evenly spaced data without gaps gives the same bins. Bins whose samples are all missing are
+    kept with missing values, so a gap within a light phase does not change the HOUR of any later bin; their
+    DATE/TIME_start is the grid time the bin starts at.
+
+    Parameters:
+    df (DataFrame): data resampled by resample_clams_dataframe
+    bin_hours (int): size of each bin in hours
+
+    Returns:
+    Binned DataFrame in the layout of the "_Nhour_bins.csv" files. The input DataFrame is not modified.
+    """
+    present = ~df[MISSING_SAMPLE_COLUMN].to_numpy(dtype=bool)
+    times = parse_clams_timestamps(df['DATE/TIME']).to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    interval = grid_interval(times)
+
+    # Split the grid into light phases and number the bins of each phase from its grid positions
+    leds = df['LED LIGHTNESS'].to_numpy()
+    row_numbers = np.arange(len(times))
+    run_starts = np.flatnonzero(np.concatenate([[True], leds[1:] != leds[:-1]]))
+    run_ids = np.repeat(np.arange(len(run_starts)), np.diff(np.append(run_starts, len(times))))
+    run_bins = np.rint((row_numbers - run_starts[run_ids]) * interval).astype(np.int64) \
+        // pd.Timedelta(hours=bin_hours).value
+
+    # Number the bins of all phases in order
+    run_bin_counts = np.maximum.reduceat(run_bins, run_starts) + 1
+    bins = np.concatenate([[0], np.cumsum(run_bin_counts)[:-1]])[run_ids] + run_bins
+    bin_count = int(bins[-1]) + 1
+    bin_first_rows = np.searchsorted(bins, np.arange(bin_count))
+
+    # Aggregate the samples that are present, with the integer types they had before resampling; data read back from a
+    # .csv file has lost them to the missing values, so the declared integer columns are restored
+    samples = df[present].drop(columns=MISSING_SAMPLE_COLUMN)
+    samples = samples.astype({column: str(dtype).lower() for column, dtype in samples.dtypes.items()
+                              if isinstance(dtype, pd.api.extensions.ExtensionDtype)
+                              and pd.api.types.is_integer_dtype(dtype)})
+    samples = samples.astype({column: dtype for column, dtype in CLAMS_COLUMN_TYPES.items()
+                              if column in samples.columns and pd.api.types.is_float_dtype(samples[column].dtype)
+                              and dtype.startswith("int")})
+    samples = prepare_for_binning(samples)
+    samples['BIN'] = bins[present]
+    aggregated = aggregate_bins(samples).set_index('BIN').reindex(np.arange(bin_count))
+
+    # Empty bins keep the light level and grid time of their first position
+    aggregated['LED LIGHTNESS'] = leds[bin_first_rows]
+    empty_bins = aggregated['DATE/TIME_start'].isna().to_numpy()
+    aggregated.loc[empty_bins, 'DATE/TIME_start'] = pd.to_datetime(times[bin_first_rows[empty_bins]])
+
+    # Count the bins of each light level in order, as assign_bin_labels does
+    aggregated['BIN'] = aggregated.groupby('LED LIGHTNESS').cumcount()
+    return finalize_bins(aggregated.reset_index(drop=True), bin_hours, order_column='DATE/TIME_start')
+
+
+def sliding_window_edges(times, window, step):
+    """Locate the samples of overlapping windows of a fixed length started at a fixed step.
+
+    Windows start every step from the first sample and include the samples from their start up to, but not including,
+    their end. Only windows the recording covers completely are returned, taking the recording to end one median
+    sample interval after its last sample. The window edges are found with a binary search over the timestamps.
+
+    Parameters:
+    times (numpy array): int64 nanosecond timestamps of each sample, in recording order
+    window (int): length of each window in nanoseconds
+    step (int): time between the starts of consecutive windows in nanoseconds
+
+    Returns:
+    Tuple of numpy arrays of the start time of each window, the position of its first sample and the position after
+    its last sample.
+    """
+    if len(times) == 0:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    sample_interval = int(np.median(np.diff(times))) if len(times) > 1 else 0
+    window_count = max((times[-1] + sample_interval - times[0] - window) // step + 1, 0)
+    window_starts = times[0] + step * np.arange(window_count, dtype=np.int64)
+    first_positions = np.searchsorted(times, window_starts, side='left')
+    end_positions = np.searchsorted(times, window_starts + window, side='left')
+    return window_starts, first_positions, end_positions
+
+
+def bin_clams_dataframe_sliding(df, window_minutes, step_minutes):
+    """Bin trimmed CLAMS data for a single subject into overlapping windows, e.g. 60 minute windows every 10 minutes.
+
+    The sums and means of each window are differences of cumulative sums at its edges, so the cost grows with the
+    number of samples and windows but not with how much the windows overlap. Like the tumbling bins of
+    bin_clams_dataframe, sums skip missing values, means average the values that are present and last values are taken
+    from the last sample of the window. Windows without samples or with a duration of 0 are left out.
+
+    Parameters:
+    df (DataFrame): trimmed CLAMS data
+    window_minutes (int): length of each window in minutes
+    step_minutes (int): time between the starts of consecutive windows in minutes
+
+    Returns:
+    DataFrame in the layout of the binned files. Like the tumbling bins, each window is placed by its end: HOUR is the
+    end of the window in hours since the start of the data, DAY the day the window ends in, counting a window that ends
+    at midnight to the day before, and 24 HOUR the end of the window in hours since the start of that day, so it is
+    above 0 and at most 24. LED LIGHTNESS is that of the last sample. The input DataFrame is not modified.
+    """
+    if window_minutes <= 0 or step_minutes <= 0:
+        raise ValueError("Window and step minutes must be positive!")
+
+    df = prepare_for_binning(df).reset_index(drop=True)
+    times = df['DATE/TIME'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    window_starts, first_positions, end_positions = sliding_window_edges(
+        times, pd.Timedelta(minutes=window_minutes).value, pd.Timedelta(minutes=step_minutes).value)
+
+    # Leave out windows without samples
+    has_samples = end_positions > first_positions
+    window_starts = window_starts[has_samples]
+    first_positions = first_positions[has_samples]
+    end_positions = end_positions[has_samples]
+    last_positions = end_positions - 1
+
+    def window_sums(values):
+        # Sum of each window as the difference of the cumulative sums at its edges
+        cumulative_sums = np.concatenate([np.zeros(1, dtype=values.dtype), np.cumsum(values)])
+        return cumulative_sums[end_positions] - cumulative_sums[first_positions]
+
+    # Take the last value of each window
+    windowed = df[BIN_LAST_COLUMNS + ['LED LIGHTNESS']].iloc[last_positions].reset_index(drop=True)
+
+    # Sum the summed columns, skipping missing values; integer counts are summed exactly
+    for column in BIN_SUM_COLUMNS:
+        values = df[column].to_numpy()
+        if np.issubdtype(values.dtype, np.integer):
+            windowed[column] = window_sums(values.astype(np.int64))
+        else:
+            windowed[column] = window_sums(np.nan_to_num(values.astype(np.float64)))
+
+    # Average the remaining columns over the values that are present
+    avg_columns = df.columns.difference(BIN_LAST_COLUMNS + BIN_SUM_COLUMNS + ['LED LIGHTNESS'])
+    for column in avg_columns:
+        values = df[column].to_numpy(dtype=np.float64)
+        present = ~np.isnan(values)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            windowed[column] = window_sums(np.where(present, values, 0.0)) / window_sums(present.astype(np.int64))
+
+    # Add the window boundaries and duration in hours
+    windowed['DATE/TIME_start'] = df['DATE/TIME'].iloc[first_positions].to_numpy()
+    windowed['DATE/TIME_end'] = df['DATE/TIME'].iloc[last_positions].to_numpy()
+    windowed['INTERVAL_start'] = df['INTERVAL'].iloc[first_positions].to_numpy()
+    windowed['INTERVAL_end'] = df['INTERVAL'].iloc[last_positions].to_numpy()
+    windowed['DURATION'] = (windowed['DATE/TIME_end'] - windowed['DATE/TIME_start']).dt.total_seconds() / 3600
+
+    # Place each window by its end relative to the start of the data, so windows that cross midnight count to the day
+    # they end in and 24 HOUR never exceeds 24
+    data_start = times[0] if len(times) else 0
+    window_ends = window_starts + pd.Timedelta(minutes=window_minutes).value - data_start
+    windowed['DAY'] = ((window_ends - 1) // pd.Timedelta(hours=24).value).astype(int) + 1
+    windowed['HOUR'] = window_ends / pd.Timedelta(hours=1).value
+    windowed['24 HOUR'] = windowed['HOUR'] - 24 * (windowed['DAY'] - 1)
+
+    # Drop windows with a duration of 0
+    windowed = windowed[windowed['DURATION'] != 0].reset_index(drop=True)
+
+    return windowed[BINNED_COLUMNS].round(4)
+
+
+def sliding_window_file_name(trimmed_file_name, window_minutes, step_minutes):
+    """Return the name of the file of sliding windows binned from a trimmed file."""
+    return trimmed_file_name.replace(".csv", f"_{window_minutes}min_windows_{step_minutes}min_steps.csv")
+
+
+def bin_trimmed_dataframe(trimmed_df, trimmed_file_name, bin_hours):
+    """Bin trimmed CLAMS data at one bin size or at a list of bin sizes.
+
+    Data resampled by resample_clams_dataframe is binned on its grid by bin_resampled_dataframe, one size at a time.
+
+    Returns:
+    Tuple of the binned DataFrame and the binned file name, or with a list of bin sizes, of dictionaries of the binned
+    DataFrames and file names by bin size.
+    """
+    resampled = MISSING_SAMPLE_COLUMN in trimmed_df.columns
+    if not isinstance(bin_hours, list):
+        binned_df = (bin_resampled_dataframe if resampled else bin_clams_dataframe)(trimmed_df, bin_hours)
+        return binned_df, trimmed_file_name.replace(".csv", f"_{bin_hours}hour_bins.csv")
+    if resampled:
+        binned_dfs = {size: bin_resampled_dataframe(trimmed_df, size) for size in bin_hours}
+    else:
+        binned_dfs = bin_clams_dataframe_multiresolution(trimmed_df, bin_hours)
+    return binned_dfs, {size: trimmed_file_name.replace(".csv", f"_{size}hour_bins.csv") for size in binned_dfs}
+
+
+def bin_sizes_of(bin_hours):
+    """Return the bin sizes in hours as a sorted list, for a single bin size or a list of bin sizes."""
+    if isinstance(bin_hours, (list, tuple, set)):
+        return sorted(set(bin_hours))
+    return [bin_hours]
+
+
+def bin_clams_data(file_path, bin_hours, output_format="csv"):
+    """Bin a trimmed CLAMS data file and save one "_Nhour_bins" file per bin size.
+
+    Parameters:
+    file_path (string): path to the trimmed file
+    bin_hours (int or list): size of the bins in hours, or a list of sizes binned in a single pass
+    output_format (string): table format of the binned files, one of TABLE_FORMATS
+    """
+    df = read_table(file_path)
+    bin_sizes = bin_sizes_of(bin_hours)
+    if MISSING_SAMPLE_COLUMN in df.columns:
+        binned = {size: bin_resampled_dataframe(df, size) for size in bin_sizes}
+    elif len(bin_sizes) == 1:
+        binned = {bin_sizes[0]: bin_clams_dataframe(df, bin_sizes[0])}
+    else:
+        binned = bin_clams_dataframe_multiresolution(df, bin_sizes)
 
     # Check if the directory exists, if not, create it
-    output_directory = os.path.dirname(output_path)
+    output_directory = os.path.dirname(file_path).replace("Trimmed_CLAMS_data", "Binned_CLAMS_data")
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    df_binned.to_csv(output_path, index=False)
+    # Save the binned data to a new file per bin size
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    for size, df_binned in binned.items():
+        output_path = os.path.join(output_directory, f"{base_name}_{size}hour_bins{TABLE_FORMATS[output_format]}")
+        write_table(df_binned, output_path)
 
 
-def process_directory(directory_path, bin_hours):
+def process_directory(directory_path, bin_hours, output_format="csv"):
     # Get path to trimmed directory
     trimmed_directory = os.path.join(directory_path, "Trimmed_CLAMS_data")
 
-    # Get a list of all .CSV files in the directory
-    csv_files = [f for f in os.listdir(trimmed_directory) if
-                 f.endswith('.csv') and os.path.isfile(os.path.join(trimmed_directory, f))]
+    # Get a list of all trimmed files in the directory
+    trimmed_files = list_table_files(trimmed_directory)
+
+    # Process each trimmed file
+    for trimmed_file in trimmed_files:
+        file_path = os.path.join(trimmed_directory, trimmed_file)
+        bin_clams_data(file_path, bin_hours, output_format)
+        print(f"Binning {trimmed_file}")
 
-    # Process each .CSV file
-    for csv_file in csv_files:
-        file_path = os.path.join(trimmed_directory, csv_file)
-        bin_clams_data(file_path, bin_hours)
-        print(f"Binning {csv_file}")
+
+def sliding_window_clams_data(file_path, window_minutes, step_minutes, output_format="csv"):
+    """Bin a trimmed CLAMS data file into overlapping windows and save them to the "Windowed_CLAMS_data" directory.
+
+    Parameters:
+    file_path (string): path to the trimmed file
+    window_minutes (int): length of each window in minutes
+    step_minutes (int): time between the starts of consecutive windows in minutes
+    output_format (string): table format of the windowed file, one of TABLE_FORMATS
+    """
+    df = read_table(file_path)
+    if MISSING_SAMPLE_COLUMN in df.columns:
+        # Windows are found from the timestamps, so the grid positions without a sample are not needed
+        df = df[~df[MISSING_SAMPLE_COLUMN].astype(bool)].drop(columns=MISSING_SAMPLE_COLUMN)
+    windowed_df = bin_clams_dataframe_sliding(df, window_minutes, step_minutes)
+
+    output_directory = os.path.dirname(file_path).replace("Trimmed_CLAMS_data", "Windowed_CLAMS_data")
+    os.makedirs(output_directory, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(file_path))[0]
+    output_name = sliding_window_file_name(f"{base_name}.csv", window_minutes, step_minutes)
+    write_table(windowed_df, os.path.join(output_directory, with_table_extension(output_name, output_format)))
+
+
+def process_directory_sliding_windows(directory_path, window_minutes, step_minutes, output_format="csv"):
+    """Bin every trimmed file of a directory into overlapping windows, see bin_clams_dataframe_sliding."""
+    trimmed_directory = os.path.join(directory_path, "Trimmed_CLAMS_data")
+    for trimmed_file in list_table_files(trimmed_directory):
+        sliding_window_clams_data(os.path.join(trimmed_directory, trimmed_file), window_minutes, step_minutes,
+                                  output_format)
+        print(f"Binning {trimmed_file} into {window_minutes} minute windows every {step_minutes} minutes")
 
 
 def extract_id_number(filename):
@@ -255,84 +1315,221 @@ def extract_id_number(filename):
         return None
 
 
-def recombine_columns(directory_path, experiment_config_file):
-    # Define Combined CLAMS data directory
+def binned_file_labels(binned_data, config_df):
+    """Return the lists of the ID and the GROUP LABEL of each binned file.
+
+    The ID is taken from the file name; the GROUP LABEL of an ID listed more than once is its first entry, and "" for
+    an ID that is not listed.
+    """
+    group_labels = config_df.drop_duplicates('ID').set_index('ID')['GROUP LABEL'].to_dict()
+    file_ids = [extract_id_number(filename) for filename, _ in binned_data]
+    return file_ids, [group_labels.get(int(file_id), "") for file_id in file_ids]
+
+
+def combine_binned_dataframes(binned_data, config_df):
+    """Combine the binned data of all subjects and attach the GROUP LABEL of each ID.
+
+    Parameters:
+    binned_data (list): pairs of (binned file name, binned DataFrame); the ID is taken from the file name
+    config_df (DataFrame): experiment configuration with ID and GROUP LABEL columns
+
+    Returns:
+    Combined DataFrame with the ID, GROUP LABEL, DAY, HOUR and 24 HOUR columns followed by the output variables.
+    """
+    # Define columns to include in the output
+    selected_columns = COMBINED_INDEX_COLUMNS + OUTPUT_VARIABLES
+    if not binned_data:
+        return pd.DataFrame(columns=selected_columns)
+
+    # Get the 'ID' number and GROUP LABEL of each file
+    file_ids, file_group_labels = binned_file_labels(binned_data, config_df)
+    file_lengths = [len(df) for _, df in binned_data]
+
+    # Concatenate all subjects at once and add columns 'ID' and 'GROUP LABEL'
+    combined_data = pd.concat([df[['DAY', 'HOUR', '24 HOUR'] + OUTPUT_VARIABLES] for _, df in binned_data],
+                              ignore_index=True)
+    combined_data.insert(0, 'ID', np.repeat(np.array(file_ids, dtype=object), file_lengths))
+    combined_data.insert(1, 'GROUP LABEL', np.repeat(np.array(file_group_labels, dtype=object), file_lengths))
+    combined_data = combined_data.astype({'DAY': int, 'HOUR': int, '24 HOUR': int})
+
+    return combined_data
+
+
+def write_combined_data(combined_data, combined_directory, output_format="csv", variables=OUTPUT_VARIABLES):
+    """Save one file per variable of the combined data, by default every output variable, in the given table format."""
+    if output_format == "csv":
+        for variable in variables:
+            output_filename = os.path.join(combined_directory, f"{variable}.csv")
+            write_table(combined_data, output_filename, columns=COMBINED_INDEX_COLUMNS + [variable])
+        return
+
+    # Columnar formats need a single type per column, so store group labels as text and IDs as the integers the .csv
+    # files hold
+    group_labels = combined_data['GROUP LABEL']
+    combined_data = combined_data.assign(**{'ID': pd.to_numeric(combined_data['ID']),
+                                            'GROUP LABEL': group_labels.mask(group_labels.notna(),
+                                                                             group_labels.astype(str))})
+    for variable in variables:
+        output_filename = os.path.join(combined_directory, f"{variable}{TABLE_FORMATS[output_format]}")
+        write_table(combined_data[COMBINED_INDEX_COLUMNS + [variable]], output_filename)
+
+
+def read_binned_table(file_path):
+    """Read the columns of a binned file that are combined."""
+    return read_table(file_path, columns=['DAY', 'HOUR', '24 HOUR'] + OUTPUT_VARIABLES)
+
+
+def write_combined_results_store(binned_data, combined_data, config_df, combined_directory, metadata):
+    """Save the binned and combined data of all subjects to the results store of the combined directory.
+
+    Parameters:
+    binned_data (list): pairs of (binned file name, binned DataFrame with all binned columns)
+    combined_data (DataFrame): the binned data combined by combine_binned_dataframes
+    config_df (DataFrame): experiment configuration with ID and GROUP LABEL columns
+    combined_directory (string): directory to save the RESULTS_STORE_FILE to
+    metadata (dict): settings of the run saved with the data
+
+    Returns:
+    Path of the results store.
+    """
+    # Concatenate the full binned data of all subjects, with the ID as a number so it sorts and filters as one
+    file_ids, file_group_labels = binned_file_labels(binned_data, config_df)
+    file_lengths = [len(df) for _, df in binned_data]
+    binned_table = pd.concat([df for _, df in binned_data], ignore_index=True) if binned_data else \
+        pd.DataFrame(columns=BINNED_COLUMNS)
+    binned_table.insert(0, 'ID', np.repeat(np.array([int(file_id) for file_id in file_ids], dtype=np.int64),
+                                           file_lengths))
+    binned_table.insert(1, 'GROUP LABEL', np.repeat(np.array(file_group_labels, dtype=object), file_lengths))
+    # Binned files read back from .csv files, e.g. of resumed subjects, hold the times as text
+    for column in ['DATE/TIME_start', 'DATE/TIME_end']:
+        if column in binned_table.columns:
+            binned_table[column] = pd.to_datetime(binned_table[column])
+
+    # The combined rows are in the same order as the binned rows, so the light level of each bin can be added
+    combined_table = combined_data.assign(ID=binned_table['ID'].to_numpy())
+    combined_table.insert(len(COMBINED_INDEX_COLUMNS), 'LED LIGHTNESS', binned_table['LED LIGHTNESS'].to_numpy())
+
+    database_path = os.path.join(combined_directory, RESULTS_STORE_FILE)
+    write_results_store(database_path, {"binned": binned_table, "combined": combined_table},
+                        dict(metadata, subjects=len(binned_data), created=datetime.now().isoformat(timespec="seconds")))
+    return database_path
+
+
+def recombine_columns(directory_path, experiment_config_file, output_format="csv", bin_hours=None, reformat=True,
+                      results_store=False):
+    # Define Combined CLAMS data directory, with a directory per bin size when one is given
     combined_directory = os.path.join(directory_path, "Combined_CLAMS_data")
+    if bin_hours is not None:
+        combined_directory = os.path.join(combined_directory, f"{bin_hours}hour_bins")
     if not os.path.exists(combined_directory):
         os.makedirs(combined_directory)
 
     # Define input directory
     input_directory = os.path.join(directory_path, "Binned_CLAMS_data")
 
-    # Desired output variables
-    output_variables = ['ACCCO2', 'ACCO2', 'FEED1 ACC', 'FEED1', 'RER', 'AMB', 'AMB ACC', 'VCO2', 'VO2', 'WHEEL ACC', 'WHEEL']
-
-    # Define columns to include in the output
-    selected_columns = ['ID', 'GROUP LABEL', 'DAY', 'HOUR', '24 HOUR'] + output_variables
-
     # Read the experiment configuration
     config_df = pd.read_csv(experiment_config_file)
 
-    # Create an empty DataFrame to store the combined data
-    combined_data = pd.DataFrame(columns=selected_columns)
+    # Read the output variables of all binned files in the specified directory, only of the given bin size if any
+    binned_files = list_table_files(input_directory)
+    if bin_hours is not None:
+        binned_files = [filename for filename in binned_files
+                        if os.path.splitext(filename)[0].endswith(f"_{bin_hours}hour_bins")]
+    read_binned_file = read_table if results_store else read_binned_table
+    binned_data = [(filename, read_binned_file(os.path.join(input_directory, filename))) for filename in binned_files]
 
-    # Loop through all files in the specified directory
-    for filename in os.listdir(input_directory):
-        if filename.endswith(".csv"):
-            file_path = os.path.join(input_directory, filename)
-            # Read the current .csv file into a DataFrame
-            df = pd.read_csv(file_path)
+    # Group the combined data by the output variables and save to separate files
+    combined_data = combine_binned_dataframes(binned_data, config_df)
+    write_combined_data(combined_data, combined_directory, output_format)
 
-            # Get the 'ID' number from the file name
-            file_id = extract_id_number(filename)
+    # Save the reformatted tables from the same data, instead of reading the combined files back
+    if reformat:
+        write_reformatted_data(combined_data, os.path.join(combined_directory, "Reformatted_CSVs"))
 
-            # Find the GROUP LABEL for the current ID
-            group_label = config_df[config_df['ID'] == int(file_id)]['GROUP LABEL'].values
-            if len(group_label) > 0:
-                group_label = group_label[0]
-            else:
-                group_label = ""
+    # Save the binned and combined data to a single indexed database for cohort-wide queries
+    if results_store:
+        write_combined_results_store(binned_data, combined_data, config_df, combined_directory,
+                                     {"bin_hours": bin_hours, "output_format": output_format})
 
-            # Add columns 'ID', 'DAY', 'HOUR', '24 HOUR'
-            df['ID'] = file_id
-            df['GROUP LABEL'] = group_label
-            df['DAY'] = df['DAY'].astype(int)
-            df['HOUR'] = df['HOUR'].astype(int)
-            df['24 HOUR'] = df['24 HOUR'].astype(int)
 
-            # Filter and reorder columns
-            df = df[selected_columns]
+def reformat_combined_data(combined_data, variables=OUTPUT_VARIABLES):
+    """Pivot the combined data of several variables to one row per ID, GROUP LABEL and DAY with a column per 24 HOUR bin.
 
-            # Append the data to the combined DataFrame
-            combined_data = pd.concat([combined_data, df], ignore_index=True)
+    All variables are grouped and reshaped in a single operation and then split into one table per variable.
 
-    # Group the combined data by the output variables and save to separate .csv files
-    for variable in output_variables:
-        output_filename = os.path.join(combined_directory, f"{variable}.csv")
-        variable_data = combined_data[['ID', 'GROUP LABEL', 'DAY', 'HOUR', '24 HOUR', variable]]
-        variable_data.to_csv(output_filename, index=False)
+    Parameters:
+    combined_data (DataFrame): combined data with ID, GROUP LABEL, DAY and 24 HOUR columns and a column per variable
+    variables (list): names of the variables to pivot
 
-# Function to reformat a single CSV file
-def reformat_csv(input_csv_path, output_csv_path):
-    df = pd.read_csv(input_csv_path)
+    Returns:
+    Dictionary of pivoted DataFrames by variable.
+    """
+    # Use the same types as data read back from a combined .csv file, and replace missing values in "GROUP LABEL"
+    # with a placeholder value
+    df = combined_data.assign(**{"ID": pd.to_numeric(combined_data["ID"]),
+                                 "GROUP LABEL": combined_data["GROUP LABEL"].replace("", np.nan).fillna("NO_LABEL"),
+                                 **{variable: pd.to_numeric(combined_data[variable]) for variable in variables}})
+
+    # Take the first value of each "ID", "GROUP LABEL", "DAY" and "24 HOUR" and move "24 HOUR" to the columns
+    wide = df.groupby(["ID", "GROUP LABEL", "DAY", "24 HOUR"])[variables].first().unstack("24 HOUR")
+
+    pivot_tables = {}
+    for variable in variables:
+        if variable not in wide.columns.get_level_values(0):
+            # No data at all, e.g. when no files were processed
+            pivot_tables[variable] = pd.DataFrame(columns=["ID", "GROUP LABEL", "DAY"])
+            continue
+
+        # Drop the days and 24 HOUR bins without any value of this variable
+        pivot_table = wide[variable].dropna(how="all").dropna(how="all", axis=1).reset_index()
 
-    # Replace missing values in "GROUP LABEL" with a placeholder value
-    df["GROUP LABEL"].fillna("NO_LABEL", inplace=True)
+        # Flatten the column index and rename columns
+        pivot_table.columns = ["ID", "GROUP LABEL", "DAY"] + [f"{variable}_{hour}" for hour in
+                                                              pivot_table.columns[3:]]
+        pivot_tables[variable] = pivot_table
+    return pivot_tables
 
-    # Extract the name of the last column
-    last_column_name = df.columns[-1]
 
-    # Pivot the table using "ID", "GROUP LABEL", "DAY", and "24 HOUR" as indices
-    pivot_table = df.pivot_table(index=["ID", "GROUP LABEL", "DAY"],
-                                 columns="24 HOUR", values=last_column_name,
-                                 aggfunc="first").reset_index()
+def reformat_dataframe(df, value_column):
+    """Pivot the combined data of one variable to one row per ID, GROUP LABEL and DAY with a column per 24 HOUR bin.
 
-    # Flatten the column index and rename columns
-    pivot_table.columns = ["ID", "GROUP LABEL", "DAY"] + [f"{last_column_name}_{hour}" for hour in
-                                                          pivot_table.columns[3:]]
+    Parameters:
+    df (DataFrame): combined data with ID, GROUP LABEL, DAY, 24 HOUR and value_column columns
+    value_column (string): name of the variable to pivot
+
+    Returns:
+    Pivoted DataFrame.
+    """
+    return reformat_combined_data(df, [value_column])[value_column]
+
+
+def write_reformatted_data(combined_data, reformatted_directory):
+    """Save the pivoted table of each output variable in the combined data as a "reformatted_<variable>.csv" file.
+
+    Returns:
+    Dictionary of the pivoted DataFrames by variable.
+    """
+    os.makedirs(reformatted_directory, exist_ok=True)
+    pivot_tables = reformat_combined_data(combined_data)
+    for variable, pivot_table in pivot_tables.items():
+        write_table(pivot_table, os.path.join(reformatted_directory, f"reformatted_{variable}.csv"))
+        print(f"Reformatting '{variable}.csv' to reformatted_'{variable}.csv'")
+    return pivot_tables
+
+
+# Function to reformat a single CSV file
+def reformat_csv(input_csv_path, output_csv_path):
+    df = read_table(input_csv_path)
+
+    # Find the variable column next to the ID, GROUP LABEL, DAY, HOUR and 24 HOUR columns
+    value_columns = [column for column in df.columns if column not in COMBINED_INDEX_COLUMNS]
+    if len(value_columns) != 1:
+        raise ValueError(f"{os.path.basename(input_csv_path)} must have exactly one column besides "
+                         f"{', '.join(COMBINED_INDEX_COLUMNS)}")
 
     # Save the pivot table to a new CSV file
-    pivot_table.to_csv(output_csv_path, index=False)
+    pivot_table = reformat_dataframe(df, value_columns[0])
+    write_table(pivot_table, output_csv_path)
 
 
 # Function to process all CSV files in a directory
@@ -340,10 +1537,922 @@ def reformat_csvs_in_directory(input_dir):
     output_dir = os.path.join(input_dir, "Reformatted_CSVs")
     os.makedirs(output_dir, exist_ok=True)
 
-    for filename in os.listdir(input_dir):
-        if filename.endswith(".csv"):
-            input_csv_path = os.path.join(input_dir, filename)
-            output_csv_path = os.path.join(output_dir, f"reformatted_{filename}")
-            reformat_csv(input_csv_path, output_csv_path)
-            print(f"Reformatting '{filename}' to reformatted_'{filename}'")
+    # Reformatted files are always saved as .csv files
+    for filename in list_table_files(input_dir):
+        input_csv_path = os.path.join(input_dir, filename)
+        output_filename = with_table_extension(filename, "csv")
+        output_csv_path = os.path.join(output_dir, f"reformatted_{output_filename}")
+        reformat_csv(input_csv_path, output_csv_path)
+        print(f"Reformatting '{filename}' to reformatted_'{output_filename}'")
+
+
+def file_signature(file_path):
+    """Return the size and modification time of a file, which change whenever the file is written to."""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def file_content_hash(file_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def clams_stage_cache_keys(file_path, trim_hours, keep_hours, bin_hours, start_dark, columns=None, resample=False,
+                           parse_timestamps=False):
+    """Build the cache keys of the cleaning, trimming and binning stages of a raw CLAMS data file.
+
+    Each key includes the key of the stage before it, so a changed raw file or parameter invalidates its stage and
+    every stage after it.
+
+    Returns:
+    Dictionary of cache keys for the "Cleaned", "Trimmed" and "Binned" stages; columns is the list of data columns
+    kept by the cleaning stage, or None for all columns, resample is set when the trimmed data is resampled and
+    parse_timestamps when the cleaning stage converts "DATE/TIME" to datetime.
+    """
+    def chain_key(*parts):
+        return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+    # Parsed timestamps are only part of the key when all columns are kept, as reading fewer columns always parses them
+    parse_parts = ["parse_timestamps"] if parse_timestamps and columns is None else []
+    cleaned_key = chain_key(CACHE_VERSION, pd.__version__, "Cleaned", file_content_hash(file_path),
+                            os.path.basename(file_path), columns, *parse_parts)
+    # Resampling is only part of the key when set, so earlier cached results stay valid
+    resample_parts = ["resample"] if resample else []
+    trimmed_key = chain_key("Trimmed", cleaned_key, trim_hours, keep_hours, start_dark, *resample_parts)
+    binned_key = chain_key("Binned", trimmed_key, tuple(bin_hours) if isinstance(bin_hours, list) else bin_hours)
+    return {"Cleaned": cleaned_key, "Trimmed": trimmed_key, "Binned": binned_key}
 
+
+def cache_file_path(cache_directory, key):
+    """Return the path of the cached result stored under key."""
+    return os.path.join(cache_directory, f"{key}.pkl")
+
+
+def cached_result(cache_directory, key, compute):
+    """Return the cached result stored under key, or compute and cache it.
+
+    Parameters:
+    cache_directory (string): directory holding cached results, or None to always compute
+    key (string): cache key of the result
+    compute (function): called without arguments to compute the result on a cache miss
+
+    Returns:
+    The cached or computed result.
+    """
+    if cache_directory is None:
+        return compute()
+
+    cache_path = cache_file_path(cache_directory, key)
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (EOFError, pickle.UnpicklingError):
+            # Recompute results that were not completely written
+            pass
+
+    result = compute()
+
+    # Write to a temporary file first so an interrupted run never leaves a partial result behind
+    with atomic_output_path(cache_path) as temporary_path:
+        with open(temporary_path, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return result
+
+
+def clear_clams_cache(directory_path):
+    """Delete all cached results in the "Cached_CLAMS_data" directory of the provided directory.
+
+    Returns:
+    Number of cached results deleted.
+    """
+    cache_directory = os.path.join(directory_path, "Cached_CLAMS_data")
+    if not os.path.isdir(cache_directory):
+        return 0
+
+    cached_count = len([file for file in os.listdir(cache_directory) if file.endswith(".pkl")])
+    shutil.rmtree(cache_directory, ignore_errors=True)
+    return cached_count
+
+
+def process_clams_subject(file_path, trim_hours, keep_hours, bin_hours, start_dark, intermediate_directories=None,
+                          cache_directory=None, output_format="csv", profile_directory=None, trim_chunk_rows=None,
+                          resample=False, cleaned_data=None):
+    """Clean, trim and bin the raw CLAMS data file of a single subject.
+
+    Progress messages are returned instead of printed so that subjects processed in worker processes are reported in
+    the same order as a serial run. With a cache directory, each stage reuses the cached result for the same raw file
+    contents and parameters, and only the stages after the last cached result are computed.
+
+    Parameters:
+    file_path (string): path to the raw .csv file
+    trim_hours (int): number of hours to trim from the beginning of the cleaned data
+    keep_hours (int): number of hours to keep in the trimmed data
+    bin_hours (int or list): number of hours to bin the data, or a list of bin sizes binned in a single pass
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    intermediate_directories (dict): "Cleaned", "Trimmed" and "Binned" output directories, or None to skip saving
+    cache_directory (string): directory holding cached stage results, or None to disable caching
+    output_format (string): table format of the saved intermediate files, one of TABLE_FORMATS
+    profile_directory (string): directory to save a cProfile dump of each stage to, or None to skip profiling
+    trim_chunk_rows (int): when the cleaned and trimmed files are not saved, clean and trim the raw file in chunks of
+    this many rows, stopping at the end of the kept data; None reads the whole file
+    resample (bool): resample the trimmed data onto a regular grid of sample times with resample_clams_dataframe and
+    bin it on the grid, reporting the gaps in the recording
+    cleaned_data (tuple): cleaned DataFrame and cleaned file name of a subject split from a combined export by
+    split_clams_export, used instead of cleaning file_path; caching is not supported for split subjects
+
+    Returns:
+    Tuple of the binned file name, the binned DataFrame, a list of progress messages and a dictionary of the
+    measurements of each stage (see instrumentation.new_stage_metrics). With a list of bin sizes, the binned file names
+    and DataFrames are dictionaries by bin size.
+    """
+    # Only read the columns used by trimming and binning, with parsed timestamps, unless the cleaned and trimmed files
+    # are saved; cleaned files in a columnar format keep parsed timestamps
+    columns = BINNING_INPUT_COLUMNS if intermediate_directories is None else None
+    parse_timestamps = columns is not None or output_format != "csv"
+
+    stage_keys = dict.fromkeys(("Cleaned", "Trimmed", "Binned"))
+    if cleaned_data is not None:
+        cache_directory = None
+    if cache_directory is not None:
+        stage_keys = clams_stage_cache_keys(file_path, trim_hours, keep_hours, bin_hours, start_dark, columns, resample,
+                                            parse_timestamps)
+
+    # Results of each stage as (DataFrame, file name), computed or loaded at most once
+    stage_results = {}
+    stage_metrics = {stage: new_stage_metrics() for stage in ("Cleaned", "Trimmed", "Binned")}
+    profiler = StageProfiler(profile_directory)
+    file_stem = os.path.splitext(os.path.basename(file_path) if cleaned_data is None else cleaned_data[1])[0]
+
+    def run_stage(stage, compute):
+        if stage not in stage_results:
+            metrics = stage_metrics[stage]
+            cache_path = None if cache_directory is None else cache_file_path(cache_directory, stage_keys[stage])
+            metrics["cached"] = cache_path is not None and os.path.exists(cache_path)
+
+            start_time = time.perf_counter()
+            nested_time = sum(nested_metrics["seconds"] for nested_metrics in stage_metrics.values())
+            with profiler.profile(f"{file_stem}_{stage}"):
+                stage_results[stage] = cached_result(cache_directory, stage_keys[stage], compute)
+
+            # Exclude the time spent in the stages this stage depends on
+            nested_time = sum(nested_metrics["seconds"] for nested_metrics in stage_metrics.values()) - nested_time
+            metrics["seconds"] += time.perf_counter() - start_time - nested_time
+
+            df = stage_results[stage][0]
+            metrics["rows_out"] = sum(map(len, df.values())) if isinstance(df, dict) else len(df)
+            metrics["peak_rss_bytes"] = peak_memory_usage()
+            if cache_path is not None:
+                metrics["bytes_read" if metrics["cached"] else "bytes_written"] += file_size(cache_path)
+        return stage_results[stage]
+
+    def clean_stage():
+        if cleaned_data is not None:
+            stage_metrics["Cleaned"]["rows_in"] = len(cleaned_data[0])
+            return cleaned_data
+        cleaned_df, cleaned_file_name = clean_clams_file(file_path, columns, parse_timestamps)
+        stage_metrics["Cleaned"]["rows_in"] = len(cleaned_df)
+        stage_metrics["Cleaned"]["bytes_read"] += file_size(file_path)
+        return cleaned_df, cleaned_file_name
+
+    def trim_stage():
+        if trim_chunk_rows and intermediate_directories is None and cleaned_data is None:
+            # Stream the raw file without holding the whole cleaned data
+            stage_metrics["Trimmed"]["bytes_read"] += file_size(file_path)
+            trimmed_df, cleaned_file_name = trim_raw_clams_file(file_path, trim_hours, keep_hours, start_dark,
+                                                                trim_chunk_rows, columns)
+        else:
+            cleaned_df, cleaned_file_name = run_stage("Cleaned", clean_stage)
+            stage_metrics["Trimmed"]["rows_in"] = len(cleaned_df)
+            trimmed_df = trim_clams_dataframe(cleaned_df, trim_hours, keep_hours, start_dark)
+        if resample:
+            trimmed_df = resample_clams_dataframe(trimmed_df)
+        return trimmed_df, f"{os.path.splitext(cleaned_file_name)[0]}_trimmed.csv"
+
+    def bin_stage():
+        trimmed_df, trimmed_file_name = run_stage("Trimmed", trim_stage)
+        stage_metrics["Binned"]["rows_in"] = len(trimmed_df)
+        return bin_trimmed_dataframe(trimmed_df, trimmed_file_name, bin_hours)
+
+    binned_df, binned_file_name = run_stage("Binned", bin_stage)
+
+    if intermediate_directories is not None:
+        for stage, compute in (("Cleaned", clean_stage), ("Trimmed", trim_stage), ("Binned", bin_stage)):
+            df, file_name = run_stage(stage, compute)
+            start_time = time.perf_counter()
+            outputs = zip(df.values(), file_name.values()) if isinstance(df, dict) else [(df, file_name)]
+            for output_df, output_file_name in outputs:
+                output_path = os.path.join(intermediate_directories[stage],
+                                           with_table_extension(output_file_name, output_format))
+                write_table(output_df, output_path)
+                stage_metrics[stage]["bytes_written"] += file_size(output_path)
+            stage_metrics[stage]["write_seconds"] += time.perf_counter() - start_time
+
+    binned_file_names = binned_file_name if isinstance(binned_file_name, dict) else {bin_hours: binned_file_name}
+    trimmed_file_name = next(file_name.removesuffix(f"_{size}hour_bins.csv") + ".csv"
+                             for size, file_name in binned_file_names.items())
+    cleaned_file_name = trimmed_file_name.removesuffix("_trimmed.csv") + ".csv"
+    messages = [f"Cleaning {os.path.basename(file_path)}" if cleaned_data is None
+                else f"Splitting {cleaned_file_name} from {os.path.basename(file_path)}",
+                f"Trimming {cleaned_file_name}",
+                f"Binning {trimmed_file_name}"]
+    if resample:
+        gaps = find_sample_gaps(run_stage("Trimmed", trim_stage)[0])
+        messages.insert(2, f"Resampling {trimmed_file_name}: {describe_sample_gaps(gaps)}")
+    return binned_file_name, binned_df, messages, stage_metrics
+
+
+def process_clams_data_in_memory(directory_path, trim_hours, keep_hours, bin_hours, start_dark, experiment_config_file,
+                                 save_intermediates=False, workers=1, use_cache=False, progress_callback=None,
+                                 cancel_event=None, output_format="csv", profile_directory=None,
+                                 trim_chunk_rows=None, output_directory=None, results_store=False, resample=False):
+    """Clean, trim, bin, recombine and reformat all CLAMS data files without re-reading intermediate files.
+
+    Each subject is passed from stage to stage as a DataFrame. The cleaned, trimmed and binned files are only written
+    when save_intermediates is set, using the same directories and file names as the individual stages. Subjects are
+    independent until they are recombined, so they can be spread over a pool of worker processes; results are gathered
+    in file order and the outputs are identical to a serial run. Combined exports of several chambers are split into
+    their subjects in a single pass by process_clams_export.
+
+    Parameters:
+    directory_path (string): directory containing raw .csv files to process
+    trim_hours (int): number of hours to trim from the beginning of the cleaned data
+    keep_hours (int): number of hours to keep in the trimmed data
+    bin_hours (int or list): number of hours to bin the data, or a list of bin sizes binned in a single pass
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    experiment_config_file (string): path to the experiment configuration file
+    save_intermediates (bool): also save the cleaned, trimmed and binned files
+    workers (int): number of worker processes used to process subjects; 1 processes them in this process
+    use_cache (bool): reuse cleaned, trimmed and binned results cached in the "Cached_CLAMS_data" directory
+    progress_callback (function): called as progress_callback(files completed, total files, binned file name) after
+    each subject
+    cancel_event (threading.Event): checked after each subject; raises ProcessingCancelled once it is set
+    output_format (string): table format of the intermediate and combined files, one of TABLE_FORMATS; the
+    reformatted files are always .csv files
+    profile_directory (string): directory to save a cProfile dump of each stage of each file to, or None to skip
+    profiling
+    trim_chunk_rows (int): when save_intermediates is not set, read each raw file in chunks of this many rows and stop
+    at the end of the kept data, so memory use does not grow with the length of the recordings
+    output_directory (string): run directory to save the outputs of all stages to, e.g. from create_run_directory,
+    or None to save them to directory_path. The subjects completed in a run directory are listed in its manifest
+    (see RUN_MANIFEST_FILE), and with save_intermediates, subjects completed by an earlier, interrupted run with the
+    same parameters are loaded from their binned files instead of being processed again
+    results_store (bool): also save the binned and combined data to an indexed SQLite database, RESULTS_STORE_FILE
+    in each combined directory, for cohort-wide queries with results_store.query_results
+    resample (bool): resample the trimmed data of each subject onto a regular grid of sample times and bin it on the
+    grid, see resample_clams_dataframe and bin_resampled_dataframe; the gaps found are reported with the progress
+    messages
+
+    Returns:
+    Dictionary with the "combined_data" DataFrame, the binned file names of the processed "subjects", the "timings"
+    in seconds of each stage, summed over subjects, and of the whole run ("Total"), and the "metrics" of the run: the
+    measurements of each stage summed over files ("stages"), of each stage of each file ("files") and the peak
+    resident memory of this process ("peak_rss_bytes"). Saves the combined and
+    reformatted files to the "Combined_CLAMS_data" directory. With a list of bin sizes, "combined_data" is a
+    dictionary by bin size and the files of each size are saved to its "Combined_CLAMS_data/<N>hour_bins" directory.
+    """
+    start_time = time.perf_counter()
+    if isinstance(bin_hours, (list, tuple, set)):
+        bin_hours = bin_sizes_of(bin_hours)
+
+    subject_arguments = clams_subject_arguments(directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                                save_intermediates, use_cache, output_format, profile_directory,
+                                                trim_chunk_rows, output_directory, resample)
+
+    # Reuse the subjects an interrupted run in the same run directory completed
+    manifest = None
+    completed_results = {}
+    if output_directory is not None:
+        manifest = start_run_manifest(output_directory,
+                                      run_manifest_parameters(trim_hours, keep_hours, bin_hours, start_dark,
+                                                              output_format, resample))
+        for index, arguments in enumerate(subject_arguments):
+            completed_result = load_completed_subject(manifest, arguments)
+            if completed_result is not None:
+                completed_results[index] = completed_result
+    remaining_arguments = [arguments for index, arguments in enumerate(subject_arguments)
+                           if index not in completed_results]
+
+    subject_results = []
+    result_arguments = []
+    with ProcessPoolExecutor(max_workers=workers) if workers > 1 else nullcontext() as executor:
+        map_subjects = map if executor is None else executor.map
+        remaining_results = map_subjects(process_clams_file_from_arguments, remaining_arguments)
+        for index, arguments in enumerate(subject_arguments):
+            file_results = [completed_results[index]] if index in completed_results else next(remaining_results)
+            for subject_result in file_results:
+                print("\n".join(subject_result[2]))
+                subject_results.append(subject_result)
+                result_arguments.append(arguments)
+
+            # The manifest lists a subject per raw file, so combined exports of several chambers are processed again
+            # when resuming
+            if manifest is not None and index not in completed_results and len(file_results) == 1:
+                record_completed_subject(output_directory, manifest, arguments, file_results[0])
+
+            if progress_callback is not None and file_results:
+                progress_callback(index + 1, len(subject_arguments), file_results[-1][0])
+
+            # Stop between files, dropping subjects that have not started yet
+            if cancel_event is not None and cancel_event.is_set():
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+                raise ProcessingCancelled("Processing cancelled")
+
+    results_store_metadata = None
+    if results_store:
+        results_store_metadata = run_manifest_parameters(trim_hours, keep_hours, bin_hours, start_dark, output_format,
+                                                         resample)
+    return combine_clams_subject_results(output_directory or directory_path, bin_hours, experiment_config_file,
+                                         result_arguments, subject_results, output_format, profile_directory,
+                                         start_time, results_store_metadata)
+
+
+def clams_subject_arguments(directory_path, trim_hours, keep_hours, bin_hours, start_dark, save_intermediates=False,
+                            use_cache=False, output_format="csv", profile_directory=None, trim_chunk_rows=None,
+                            output_directory=None, resample=False):
+    """Create the output directories of a run and return the process_clams_subject arguments of each raw file.
+
+    Parameters are as for process_clams_data_in_memory; bin_hours must already be a sorted list of bin sizes when
+    binning at several sizes.
+
+    Returns:
+    List of argument tuples in file order, each starting with the path to the raw file.
+    """
+    intermediate_directories = None
+    if save_intermediates:
+        intermediate_directories = {stage: os.path.join(output_directory or directory_path, f"{stage}_CLAMS_data")
+                                    for stage in ("Cleaned", "Trimmed", "Binned")}
+        for intermediate_directory in intermediate_directories.values():
+            os.makedirs(intermediate_directory, exist_ok=True)
+
+    cache_directory = None
+    if use_cache:
+        cache_directory = os.path.join(directory_path, "Cached_CLAMS_data")
+        os.makedirs(cache_directory, exist_ok=True)
+
+    return [(file_path, trim_hours, keep_hours, bin_hours, start_dark, intermediate_directories, cache_directory,
+             output_format, profile_directory, trim_chunk_rows, resample)
+            for file_path in list_raw_clams_files(directory_path)]
+
+
+def run_manifest_parameters(trim_hours, keep_hours, bin_hours, start_dark, output_format, resample=False):
+    """Return the parameters a run directory is started with; its completed subjects only apply to the same ones."""
+    parameters = {"version": CACHE_VERSION, "trim_hours": trim_hours, "keep_hours": keep_hours,
+                  "bin_hours": bin_sizes_of(bin_hours) if isinstance(bin_hours, (list, tuple, set)) else bin_hours,
+                  "start_dark": start_dark, "output_format": output_format}
+    # Only listed when set, so run directories started before resampling existed can still be resumed
+    if resample:
+        parameters["resample"] = True
+    return parameters
+
+
+def read_run_manifest(run_directory):
+    """Return the manifest of a run directory, or None if it has none or it cannot be read."""
+    try:
+        with open(os.path.join(run_directory, 'config', RUN_MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_run_manifest(run_directory, manifest):
+    """Save the manifest of a run directory, replacing the previous manifest in a single step."""
+    manifest_directory = os.path.join(run_directory, 'config')
+    os.makedirs(manifest_directory, exist_ok=True)
+    with atomic_output_path(os.path.join(manifest_directory, RUN_MANIFEST_FILE)) as temporary_path:
+        with open(temporary_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+
+def start_run_manifest(run_directory, parameters):
+    """Return the manifest of a run starting in a run directory, keeping the subjects completed with the same
+    parameters."""
+    manifest = read_run_manifest(run_directory)
+    if manifest is None or manifest.get("parameters") != parameters:
+        manifest = {"parameters": parameters, "subjects": {}}
+    manifest["finalized"] = False
+    write_run_manifest(run_directory, manifest)
+    return manifest
+
+
+def record_completed_subject(run_directory, manifest, arguments, subject_result):
+    """Add a processed subject to the manifest of its run directory.
+
+    Parameters:
+    run_directory (string): run directory the outputs of the subject were saved to
+    manifest (dict): manifest of the run, as returned by start_run_manifest
+    arguments (tuple): arguments of the subject, as returned by clams_subject_arguments
+    subject_result (tuple): result of process_clams_subject for the subject
+    """
+    file_path, intermediate_directories = arguments[0], arguments[5]
+    binned_file_name = subject_result[0]
+    binned_file_names = binned_file_name if isinstance(binned_file_name, dict) else {arguments[3]: binned_file_name}
+    # Subjects can only be resumed from their binned files
+    binned_files = []
+    if intermediate_directories is not None:
+        binned_files = [os.path.relpath(os.path.join(intermediate_directories["Binned"],
+                                                     with_table_extension(file_name, arguments[7])), run_directory)
+                        for file_name in binned_file_names.values()]
+    manifest["subjects"][os.path.basename(file_path)] = {
+        "signature": list(file_signature(file_path)),
+        "binned_file_names": {str(size): file_name for size, file_name in binned_file_names.items()},
+        "binned_files": binned_files,
+    }
+    write_run_manifest(run_directory, manifest)
+
+
+def restore_binned_types(binned_df):
+    """Return a binned DataFrame read back from a file with the column types binning gives it: the interval numbers
+    and AMB sums in the compact integer type of their source columns, the bin times as datetimes and the chamber
+    number as categorical."""
+    binned_df = binned_df.astype({column: CLAMS_COLUMN_TYPES["INTERVAL"]
+                                  for column in ('INTERVAL_start', 'INTERVAL_end', 'AMB')
+                                  if column in binned_df.columns and binned_df[column].dtype == np.int64})
+    for column in ('DATE/TIME_start', 'DATE/TIME_end'):
+        if column in binned_df.columns and binned_df[column].dtype == object:
+            binned_df[column] = pd.to_datetime(binned_df[column])
+    if 'CHAN' in binned_df.columns:
+        binned_df['CHAN'] = binned_df['CHAN'].astype('category')
+    return binned_df
+
+
+def load_completed_subject(manifest, arguments):
+    """Return the result of a subject completed earlier in a run directory, or None if it must be processed.
+
+    A subject is only reused if its raw file has not changed since and its binned files were saved.
+    """
+    file_path, bin_hours, intermediate_directories, output_format = arguments[0], arguments[3], arguments[5], \
+        arguments[7]
+    entry = manifest["subjects"].get(os.path.basename(file_path))
+    if entry is None or intermediate_directories is None or not entry["binned_files"]:
+        return None
+    try:
+        if entry["signature"] != list(file_signature(file_path)):
+            return None
+    except OSError:
+        return None
+
+    bin_sizes = bin_hours if isinstance(bin_hours, list) else [bin_hours]
+    binned_file_names = {size: entry["binned_file_names"].get(str(size)) for size in bin_sizes}
+    binned_paths = {size: os.path.join(intermediate_directories["Binned"], with_table_extension(file_name,
+                                                                                                output_format))
+                    for size, file_name in binned_file_names.items() if file_name is not None}
+    if len(binned_paths) < len(bin_sizes) or not all(map(os.path.exists, binned_paths.values())):
+        return None
+
+    stage_metrics = {stage: new_stage_metrics() for stage in ("Cleaned", "Trimmed", "Binned")}
+    for metrics in stage_metrics.values():
+        metrics["cached"] = True
+    binned_dfs = {}
+    for size, binned_path in binned_paths.items():
+        binned_dfs[size] = restore_binned_types(read_table(binned_path))
+        stage_metrics["Binned"]["bytes_read"] += file_size(binned_path)
+
+    messages = [f"Already processed {os.path.basename(file_path)}"]
+    if not isinstance(bin_hours, list):
+        return binned_file_names[bin_hours], binned_dfs[bin_hours], messages, stage_metrics
+    return binned_file_names, binned_dfs, messages, stage_metrics
+
+
+def process_clams_subject_from_arguments(arguments):
+    """Process a subject from an argument tuple of clams_subject_arguments, so subjects can be mapped over a pool."""
+    return process_clams_subject(*arguments)
+
+
+def process_clams_export(file_path, trim_hours, keep_hours, bin_hours, start_dark, intermediate_directories=None,
+                         cache_directory=None, output_format="csv", profile_directory=None, trim_chunk_rows=None,
+                         resample=False):
+    """Split a combined export of several chambers in a single pass and trim and bin the data of each subject.
+
+    Parameters are as for process_clams_subject. The export is read in chunks of trim_chunk_rows rows, or of
+    SPLIT_CHUNK_ROWS rows when it is not set; cached results are not used, as the cache is kept per raw file.
+
+    Returns:
+    List of the results of process_clams_subject for each chamber, in chamber order. The time and bytes of reading
+    the export are counted in the "Cleaned" stage of the first chamber.
+    """
+    # Only read the columns used by trimming and binning unless the cleaned and trimmed files are saved, as in
+    # process_clams_subject
+    columns = BINNING_INPUT_COLUMNS if intermediate_directories is None else None
+    start_time = time.perf_counter()
+    subjects = split_clams_export(file_path, columns, parse_timestamps=columns is not None or output_format != "csv",
+                                  chunk_rows=trim_chunk_rows or SPLIT_CHUNK_ROWS)
+    split_seconds = time.perf_counter() - start_time
+
+    subject_results = [process_clams_subject(file_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                             intermediate_directories, None, output_format, profile_directory,
+                                             trim_chunk_rows, resample, cleaned_data)
+                       for cleaned_data in subjects]
+    if subject_results:
+        first_metrics = subject_results[0][3]["Cleaned"]
+        first_metrics["seconds"] += split_seconds
+        first_metrics["bytes_read"] += file_size(file_path)
+    return subject_results
+
+
+def process_clams_file_from_arguments(arguments):
+    """Process a raw CLAMS data file from an argument tuple of clams_subject_arguments.
+
+    Returns:
+    List of the results of process_clams_subject for each subject of the file: one for a single-subject file, or one
+    per chamber for a combined export.
+    """
+    if is_clams_export(arguments[0]):
+        return process_clams_export(*arguments)
+    return [process_clams_subject_from_arguments(arguments)]
+
+
+def combine_clams_subject_results(output_directory, bin_hours, experiment_config_file, subject_arguments,
+                                  subject_results, output_format, profile_directory, start_time,
+                                  results_store_metadata=None):
+    """Combine and reformat the processed subjects of a run and collect its timings and measurements.
+
+    Parameters:
+    output_directory (string): directory to save the "Combined_CLAMS_data" directory to
+    bin_hours (int or list): bin size, or sorted list of bin sizes
+    experiment_config_file (string): path to the experiment configuration file
+    subject_arguments (list): arguments of the raw file of each subject, as returned by clams_subject_arguments
+    subject_results (list): results of process_clams_subject for the subjects, in the same order
+    output_format (string): table format of the combined files, one of TABLE_FORMATS
+    profile_directory (string): directory to save a cProfile dump of each stage to, or None to skip profiling
+    start_time (float): time.perf_counter() at the start of the run
+    results_store_metadata (dict): settings of the run to also save a results store with, or None to not save one
+
+    Returns:
+    Dictionary as returned by process_clams_data_in_memory.
+    """
+    timings = dict.fromkeys(("Cleaned", "Trimmed", "Binned", "Combined", "Reformatted"), 0.0)
+    run_metrics = {"Combined": new_stage_metrics(), "Reformatted": new_stage_metrics()}
+
+    binned_data = []
+    file_metrics = []
+    for arguments, (binned_file_name, binned_df, _, subject_metrics) in zip(subject_arguments, subject_results):
+        file_metrics.append({"file": os.path.basename(arguments[0]), "stages": subject_metrics})
+        binned_data.append((binned_file_name, binned_df))
+        for stage, metrics in subject_metrics.items():
+            timings[stage] += metrics["seconds"]
+
+    # Combine and reformat all subjects
+    combined_data = write_combined_outputs_by_bin_size(binned_data, bin_hours, pd.read_csv(experiment_config_file),
+                                                       os.path.join(output_directory, "Combined_CLAMS_data"),
+                                                       output_format, run_metrics, StageProfiler(profile_directory),
+                                                       results_store_metadata)
+    for stage, metrics in run_metrics.items():
+        timings[stage] = metrics["seconds"] + metrics["write_seconds"]
+
+    timings["Total"] = time.perf_counter() - start_time
+    stage_summaries = {stage: summarize_stage_metrics([metrics["stages"][stage] for metrics in file_metrics])
+                       for stage in ("Cleaned", "Trimmed", "Binned")}
+    stage_summaries.update(run_metrics)
+    return {"combined_data": combined_data,
+            "subjects": [binned_file_name for binned_file_name, _ in binned_data],
+            "timings": timings,
+            "metrics": {"stages": stage_summaries, "files": file_metrics, "total_seconds": timings["Total"],
+                        "peak_rss_bytes": peak_memory_usage()}}
+
+
+def write_combined_outputs_by_bin_size(binned_data, bin_hours, config_df, combined_directory, output_format,
+                                      run_metrics, profiler=None, results_store_metadata=None):
+    """Combine and reformat the binned data of all subjects, in a directory per bin size when binning at several sizes.
+
+    Parameters:
+    binned_data (list): pairs of (binned file name, binned DataFrame), or with a list of bin sizes, pairs of
+    dictionaries of the binned file names and DataFrames by bin size
+    bin_hours (int or list): bin size, or sorted list of bin sizes
+    config_df (DataFrame): experiment configuration with ID and GROUP LABEL columns
+    combined_directory (string): the "Combined_CLAMS_data" directory
+    output_format (string): table format of the combined files, one of TABLE_FORMATS
+    run_metrics (dict): the measurements of the "Combined" and "Reformatted" stages are added to its entries
+    profiler (StageProfiler): profiles each stage
+    results_store_metadata (dict): settings of the run to also save a results store of each bin size with, or None
+
+    Returns:
+    Combined DataFrame of all subjects, or with a list of bin sizes, a dictionary of combined DataFrames by bin size.
+    """
+    if not isinstance(bin_hours, list):
+        return write_combined_outputs(binned_data, config_df, combined_directory, output_format, run_metrics, profiler,
+                                      results_store_metadata=results_store_metadata)
+
+    combined_data = {}
+    for size in bin_hours:
+        size_binned_data = [(file_names[size], dfs[size]) for file_names, dfs in binned_data]
+        combined_data[size] = write_combined_outputs(size_binned_data, config_df,
+                                                     os.path.join(combined_directory, f"{size}hour_bins"),
+                                                     output_format, run_metrics, profiler,
+                                                     profile_suffix=f"_{size}hour_bins",
+                                                     results_store_metadata=None if results_store_metadata is None
+                                                     else dict(results_store_metadata, bin_hours=size))
+    return combined_data
+
+
+def write_combined_outputs(binned_data, config_df, combined_directory, output_format, run_metrics, profiler=None,
+                           profile_suffix="", results_store_metadata=None):
+    """Combine the binned data of all subjects and save the combined and reformatted files of each output variable.
+
+    Parameters:
+    binned_data (list): pairs of (binned file name, binned DataFrame)
+    config_df (DataFrame): experiment configuration with ID and GROUP LABEL columns
+    combined_directory (string): directory to save the combined files to; reformatted files go to its
+    "Reformatted_CSVs" directory
+    output_format (string): table format of the combined files, one of TABLE_FORMATS
+    run_metrics (dict): the measurements of the "Combined" and "Reformatted" stages are added to its entries
+    profiler (StageProfiler): profiles each stage, saving it under the stage name followed by profile_suffix
+    results_store_metadata (dict): settings of the run to also save the binned and combined data to a results store
+    (see write_combined_results_store) with, or None to not save a results store
+
+    Returns:
+    Combined DataFrame of all subjects.
+    """
+    profiler = profiler or StageProfiler()
+
+    # Combine all subjects and save the combined data
+    metrics = run_metrics["Combined"]
+    with profiler.profile(f"Combined{profile_suffix}"):
+        stage_start_time = time.perf_counter()
+        os.makedirs(combined_directory, exist_ok=True)
+        combined_data = combine_binned_dataframes(binned_data, config_df)
+        write_start_time = time.perf_counter()
+        write_combined_data(combined_data, combined_directory, output_format)
+        metrics["seconds"] += write_start_time - stage_start_time
+        metrics["write_seconds"] += time.perf_counter() - write_start_time
+    add_metric(metrics, "rows_in", sum(len(df) for _, df in binned_data))
+    add_metric(metrics, "rows_out", len(combined_data))
+    metrics["bytes_written"] += sum(file_size(os.path.join(combined_directory, variable + TABLE_FORMATS[output_format]))
+                                    for variable in OUTPUT_VARIABLES)
+    metrics["peak_rss_bytes"] = peak_memory_usage()
+
+    # Reformat the combined data of all variables at once
+    metrics = run_metrics["Reformatted"]
+    with profiler.profile(f"Reformatted{profile_suffix}"):
+        stage_start_time = time.perf_counter()
+        pivot_tables = reformat_combined_data(combined_data)
+        write_start_time = time.perf_counter()
+        reformatted_directory = os.path.join(combined_directory, "Reformatted_CSVs")
+        os.makedirs(reformatted_directory, exist_ok=True)
+        for variable, pivot_table in pivot_tables.items():
+            output_path = os.path.join(reformatted_directory, f"reformatted_{variable}.csv")
+            write_table(pivot_table, output_path)
+            metrics["bytes_written"] += file_size(output_path)
+            print(f"Reformatting '{variable}.csv' to reformatted_'{variable}.csv'")
+        metrics["seconds"] += write_start_time - stage_start_time
+        metrics["write_seconds"] += time.perf_counter() - write_start_time
+    add_metric(metrics, "rows_in", len(combined_data))
+    add_metric(metrics, "rows_out", sum(len(pivot_table) for pivot_table in pivot_tables.values()))
+    metrics["peak_rss_bytes"] = peak_memory_usage()
+
+    # Save the binned and combined data to a single indexed database for cohort-wide queries
+    if results_store_metadata is not None:
+        metrics = run_metrics["Combined"]
+        write_start_time = time.perf_counter()
+        database_path = write_combined_results_store(binned_data, combined_data, config_df, combined_directory,
+                                                     results_store_metadata)
+        metrics["write_seconds"] += time.perf_counter() - write_start_time
+        metrics["bytes_written"] += file_size(database_path)
+
+    return combined_data
+
+
+def initialize_experiment_config_file(directory_path):
+    # Create a folder for the config file
+    config_file_path = os.path.join(directory_path, 'config')
+    os.makedirs(config_file_path, exist_ok=True)
+
+    # Path to the experiment configuration file
+    config_file = os.path.join(config_file_path, 'experiment_config.csv')
+
+    with open(config_file, 'w') as file:
+        file.write("ID,GROUP LABEL\n")
+
+
+def prepare_experiment_config(directory_path, config_file=None):
+    """Make sure the experiment configuration file exists in the "config" directory of the provided directory.
+
+    Parameters:
+    directory_path (string): directory containing the CLAMS data files
+    config_file (string): optional configuration file with ID and GROUP LABEL columns to copy when the experiment
+    configuration file does not exist yet
+
+    Returns:
+    Path to the experiment configuration file.
+    """
+    experiment_config_file = os.path.join(directory_path, 'config', 'experiment_config.csv')
+    if not os.path.exists(experiment_config_file):
+        # Initialize a new experiment configuration file
+        initialize_experiment_config_file(directory_path)
+
+        # Copy the provided config file while preserving the format
+        if config_file and os.path.exists(config_file):
+            config_df = pd.read_csv(config_file)
+            expected_columns = ["ID", "GROUP LABEL"]
+            if not all(col in config_df.columns for col in expected_columns):
+                raise ValueError(
+                    "The experiment configuration file does not have the expected columns: ID, GROUP LABEL")
+            config_df.to_csv(experiment_config_file, index=False, columns=expected_columns)
+
+    return experiment_config_file
+
+
+def validate_processing_parameters(directory_path, trim_hours, keep_hours, bin_hours):
+    """Raise a ValueError describing the first invalid processing parameter."""
+    if not os.path.isdir(directory_path):
+        raise ValueError("Provided path is not a valid directory!")
+    bin_sizes = bin_sizes_of(bin_hours)
+    if not bin_sizes:
+        raise ValueError("At least one bin size is required!")
+    for name, value in (("Trim hours", trim_hours), ("Keep hours", keep_hours),
+                        *(("Bin hours", size) for size in bin_sizes)):
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"{name} value must be a whole integer!")
+    if any(size == 0 or 12 % size != 0 for size in bin_sizes):
+        raise ValueError("Bin hours must be a factor of 12!")
+
+
+def run_pipeline(directory_path, trim_hours, keep_hours, bin_hours, start_dark=False, config_file=None,
+                 save_intermediates=True, workers=1, use_cache=False, progress_callback=None, cancel_event=None,
+                 output_format="csv", profile_directory=None, trim_chunk_rows=None, output_directory=None,
+                 results_store=False, resample=False):
+    """Process all CLAMS data files in the provided directory without the GUI.
+
+    Parameters:
+    directory_path (string): directory containing raw .csv files to process
+    trim_hours (int): number of hours to trim from the beginning of the cleaned data
+    keep_hours (int): number of hours to keep in the trimmed data
+    bin_hours (int or list): number of hours to bin the data, or a list of bin sizes binned in a single pass; each
+    must be a factor of 12
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    config_file (string): optional configuration file with ID and GROUP LABEL columns
+    save_intermediates (bool): also save the cleaned, trimmed and binned files
+    workers (int): number of worker processes used to process subjects
+    use_cache (bool): reuse cleaned, trimmed and binned results cached from previous runs
+    progress_callback (function): called after each subject, see process_clams_data_in_memory
+    cancel_event (threading.Event): set to stop processing between files
+    output_format (string): table format of the intermediate and combined files, one of TABLE_FORMATS
+    profile_directory (string): directory to save a cProfile dump of each stage to, or None to skip profiling
+    trim_chunk_rows (int): read the raw files in chunks of this many rows when intermediates are not saved
+    output_directory (string): run directory to save the outputs to, or None to save them to directory_path
+    results_store (bool): also save the binned and combined data to an indexed SQLite database
+    resample (bool): resample the trimmed data onto a regular grid of sample times and bin it on the grid
+
+    Returns:
+    Dictionary with the "combined_data", processed "subjects", per-stage "timings" and "metrics", as returned by
+    process_clams_data_in_memory.
+    """
+    validate_processing_parameters(directory_path, trim_hours, keep_hours, bin_hours)
+    if output_format not in TABLE_FORMATS:
+        raise ValueError(f"Output format must be one of: {', '.join(TABLE_FORMATS)}")
+    experiment_config_file = prepare_experiment_config(directory_path, config_file)
+    return process_clams_data_in_memory(directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                        experiment_config_file, save_intermediates=save_intermediates,
+                                        workers=workers, use_cache=use_cache, progress_callback=progress_callback,
+                                        cancel_event=cancel_event, output_format=output_format,
+                                        profile_directory=profile_directory, trim_chunk_rows=trim_chunk_rows,
+                                        output_directory=output_directory, results_store=results_store,
+                                        resample=resample)
+
+
+def format_run_summary(results):
+    """Return the summary of a run printed and logged by the command line tools.
+
+    Parameters:
+    results (dict): results of the run, as returned by process_clams_data_in_memory
+    """
+    summary = [f"Processed {len(results['subjects'])} CLAMS data files", "", "Stage timings (seconds):"]
+    summary += [f"{stage}: {seconds:.3f}" for stage, seconds in results["timings"].items()]
+    return "\n".join(summary)
+
+
+def write_run_log(directory_path, version, input_values, output_text_content, metrics=None):
+    """Log input values and output text to a log file in the "config" directory.
+
+    Parameters:
+    directory_path (string): directory containing the CLAMS data files
+    version (string): CLAMS Wrangler version
+    input_values (dict): Dictionary containing user input values.
+    output_text_content (str): Progress output of the run.
+    metrics (dict): optional "metrics" of the run, as returned by process_clams_data_in_memory, saved as a JSON
+    summary with the same name as the log file
+    """
+    # Create a timestamp for the log file
+    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
+    log_file_path = os.path.join(directory_path, 'config', f'log_{timestamp}.txt')
+
+    with open(log_file_path, 'w') as log_file:
+        # Write software version to the log file
+        log_file.write(f"Data processed using CLAMS Wrangler {version} on {timestamp}\n\n")
+        # Write user input values to the log file
+        log_file.write("User Input Values:\n")
+        for key, value in input_values.items():
+            log_file.write(f"{key}: {value}\n")
+
+        # Write output_text content to the log file
+        log_file.write("\nOutput Text:\n")
+        log_file.write(output_text_content)
+
+    if metrics is not None:
+        summary = {"version": version, "timestamp": timestamp, "input_values": input_values, **metrics}
+        write_metrics_summary(os.path.splitext(log_file_path)[0] + ".json", summary)
+
+
+def create_run_directory(directory_path):
+    """Create a new "timestamp_<date>_<time>" run directory in the provided directory to save the outputs of a run to.
+
+    Returns:
+    Path to the run directory, with a "_<N>" suffix if a run directory was already created in the same second.
+    """
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    run_directory = os.path.join(directory_path, f'timestamp_{timestamp}')
+    suffix = 1
+    while True:
+        try:
+            # Never share a run directory with another run, whose outputs and manifest would be overwritten
+            os.makedirs(run_directory)
+            return run_directory
+        except FileExistsError:
+            suffix += 1
+            run_directory = os.path.join(directory_path, f'timestamp_{timestamp}_{suffix}')
+
+
+def run_directory_order(run_directory):
+    """Sort key of run directories in the order they were created, placing "timestamp_<date>_<time>_<N>" after
+    "timestamp_<date>_<time>" in the order of N."""
+    parts = os.path.basename(run_directory).split("_")
+    suffix = int(parts[3]) if len(parts) > 3 and parts[3].isdigit() else 1
+    return parts[1:3], suffix
+
+
+def find_unfinished_run_directory(directory_path, parameters):
+    """Return the latest run directory in the provided directory that was interrupted before it was finalized and was
+    started with the given parameters (see run_manifest_parameters), or None if there is none."""
+    for run_directory in sorted(glob.glob(os.path.join(directory_path, "timestamp_*")), key=run_directory_order,
+                                reverse=True):
+        manifest = read_run_manifest(run_directory)
+        if manifest is not None and not manifest.get("finalized") and manifest.get("parameters") == parameters:
+            return run_directory
+    return None
+
+
+def resolve_run_directory(directory_path, trim_hours, keep_hours, bin_hours, start_dark, output_format="csv",
+                          resample=False):
+    """Return the run directory to save the outputs of a run to: the latest interrupted run directory with the same
+    parameters, so the run resumes it, or else a new run directory.
+
+    Returns:
+    Tuple of the path to the run directory and whether it resumes an interrupted run.
+    """
+    parameters = run_manifest_parameters(trim_hours, keep_hours, bin_hours, start_dark, output_format, resample)
+    run_directory = find_unfinished_run_directory(directory_path, parameters)
+    if run_directory is not None:
+        return run_directory, True
+    return create_run_directory(directory_path), False
+
+
+def finalize_run_directory(directory_path, run_directory):
+    """Move the experiment configuration and run logs into the run directory and mark the run as finished.
+
+    The stages already saved their outputs to the run directory, so only the small "config" directory is moved.
+
+    Returns:
+    Path to the run directory.
+    """
+    source_directory = os.path.join(directory_path, 'config')
+    target_directory = os.path.join(run_directory, 'config')
+    if os.path.normcase(os.path.abspath(source_directory)) != os.path.normcase(os.path.abspath(target_directory)) \
+            and os.path.isdir(source_directory):
+        os.makedirs(target_directory, exist_ok=True)
+        for file_name in os.listdir(source_directory):
+            shutil.move(os.path.join(source_directory, file_name), os.path.join(target_directory, file_name))
+        os.rmdir(source_directory)
+
+    manifest = read_run_manifest(run_directory)
+    if manifest is not None:
+        manifest["finalized"] = True
+        write_run_manifest(run_directory, manifest)
+    return run_directory
+
+
+def move_outputs_to_timestamp_directory(directory_path):
+    """Move the output folders of a run into a new "timestamp_<date>_<time>" directory.
+
+    Returns:
+    Path to the timestamped directory.
+    """
+    # Create a timestamped directory within the working directory
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    timestamped_dir = os.path.join(directory_path, f'timestamp_{timestamp}')
+    os.makedirs(timestamped_dir, exist_ok=True)
+
+    # Move the relevant folders to the timestamped directory
+    folders_to_move = ['Binned_CLAMS_data', 'Cleaned_CLAMS_data', 'Combined_CLAMS_data', 'config', 'Trimmed_CLAMS_data']
+    for folder in folders_to_move:
+        source_folder = os.path.join(directory_path, folder)
+        destination_folder = os.path.join(timestamped_dir, folder)
+        # Intermediate folders only exist if they were saved
+        if os.path.exists(source_folder):
+            shutil.move(source_folder, destination_folder)
+
+    return timestamped_dir
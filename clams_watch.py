@@ -0,0 +1,320 @@
+"""Keep the combined CLAMS outputs up to date while an experiment is still recording.
+
+The watched directory is polled for raw CLAMS data files. Only files that are new or have changed since the last poll
+are read again; when a file only grew, just its appended bytes are read and parsed. Once the start of the trimmed data
+is known, appended rows are trimmed and binned on their own, only aggregating again the bins they fall in, and the
+combined and reformatted files are rewritten from the binned data of all subjects. Intermediate files are not saved
+and the outputs stay in the watched directory.
+
+Example:
+    python cli.py path/to/data --trim-hours 2 --keep-hours 48 --bin-hours 3 --watch --poll-seconds 60
+"""
+import hashlib
+import io
+import math
+import os
+import time
+from datetime import timedelta
+
+import pandas as pd
+
+from clams_processing import (ACCUMULATIVE_COLUMNS, BINNING_INPUT_COLUMNS, aggregate_bins, assign_bin_labels,
+                              bin_sizes_of, cleaned_file_name, file_signature, finalize_bin_sizes, find_trim_start,
+                              list_raw_clams_files, parse_clams_timestamps, prepare_for_binning, read_clams_csv,
+                              read_raw_clams_metadata, write_combined_outputs_by_bin_size, zero_accumulative_columns)
+from instrumentation import new_stage_metrics
+
+# Bytes at the start of a raw file and before the end of the previous read that must be unchanged for the file to
+# count as only appended to
+APPEND_CHECK_BYTES = 64 * 1024
+
+
+def parse_data_rows(data, header):
+    """Parse data rows of a raw CLAMS data file that follow the header and formatting rows.
+
+    Parameters:
+    data (bytes): complete data rows
+    header (list): column names of the data header
+
+    Returns:
+    DataFrame of the BINNING_INPUT_COLUMNS with "DATE/TIME" converted to datetime.
+    """
+    df = read_clams_csv(io.BytesIO(data), columns=BINNING_INPUT_COLUMNS, header=None, names=header)
+    df['DATE/TIME'] = parse_clams_timestamps(df['DATE/TIME'], errors='coerce')
+    return df
+
+
+def block_hash(f, start, end):
+    """Return the SHA-256 digest of the bytes from start to end of an open binary file."""
+    f.seek(start)
+    return hashlib.sha256(f.read(end - start)).digest()
+
+
+def read_position_hashes(f, offset):
+    """Return the hashes of the first APPEND_CHECK_BYTES of a file and of the APPEND_CHECK_BYTES before offset."""
+    return block_hash(f, 0, min(offset, APPEND_CHECK_BYTES)), block_hash(f, max(offset - APPEND_CHECK_BYTES, 0), offset)
+
+
+def only_appended(f, state):
+    """Return True if an open raw file still holds the bytes read before, judged by the blocks hashed in its state."""
+    offset = state["offset"]
+    f.seek(0, os.SEEK_END)
+    return f.tell() >= offset and read_position_hashes(f, offset) == state["hashes"]
+
+
+class IncrementalClamsBinner:
+    """Bin the trimmed data of a subject as it grows, aggregating again only the bins that appended samples fall in.
+
+    A bin label only depends on the samples before it (see assign_bin_labels), so every bin before the last bin of each
+    "LED LIGHTNESS" value is final. The binner keeps the aggregated bins and the samples of those last bins; appended
+    samples are labelled from there and aggregated together with them, and the larger bin sizes and the DAY and HOUR
+    columns are built again from the aggregated bins. The result is the same as binning all the samples at once.
+
+    Parameters:
+    bin_hours (int or list): number of hours to bin the data, or a list of bin sizes
+    """
+
+    def __init__(self, bin_hours):
+        self.bin_sizes = bin_sizes_of(bin_hours)
+        self.base_hours = math.gcd(*self.bin_sizes)
+        self.open_bins = {}
+        self.open_samples = None
+        self.aggregated = None
+
+    def add(self, trimmed_df):
+        """Bin samples appended to the trimmed data.
+
+        Returns:
+        Dictionary of the binned DataFrames of all samples added so far by bin size.
+        """
+        samples = prepare_for_binning(trimmed_df)
+        samples['BIN'] = assign_bin_labels(samples['DATE/TIME'], samples['LED LIGHTNESS'], self.base_hours,
+                                           self.open_bins)
+        if self.open_samples is not None:
+            # AMB ACC is a running total over all samples
+            samples['AMB ACC'] += self.open_samples['AMB ACC'].iloc[-1]
+            samples = pd.concat([self.open_samples, samples], ignore_index=True)
+            samples['CHAN'] = samples['CHAN'].astype('category')
+
+        # Aggregate the open bins again with their new samples, replacing their previous rows
+        aggregated = aggregate_bins(samples, sample_counts=True)
+        if self.aggregated is not None:
+            bin_keys = ['LED LIGHTNESS', 'BIN']
+            replaced = pd.MultiIndex.from_frame(self.aggregated[bin_keys]).isin(
+                pd.MultiIndex.from_frame(aggregated[bin_keys]))
+            aggregated = pd.concat([self.aggregated[~replaced], aggregated], ignore_index=True)
+        self.aggregated = aggregated
+
+        # Keep the samples of the last bin of each "LED LIGHTNESS" value, which include the last sample
+        open_labels = samples['LED LIGHTNESS'].map({led: label for led, (label, _) in self.open_bins.items()})
+        self.open_samples = samples[samples['BIN'] == open_labels].reset_index(drop=True)
+
+        return finalize_bin_sizes(self.aggregated, self.base_hours, self.bin_sizes)
+
+
+class ClamsDirectoryWatcher:
+    """Incrementally process the raw CLAMS data files of a directory each time it is polled.
+
+    For every raw file the watcher keeps the number of bytes read so far and hashes of the APPEND_CHECK_BYTES at the
+    start of the file and before the end of the read bytes. A file that grew while those blocks stayed the same is
+    updated by reading and parsing only the appended rows; any other change reads the file again from the start. The
+    rows of a file are kept until the start of its trimmed data is found; after that, appended rows are trimmed and
+    binned on their own by an IncrementalClamsBinner and not kept. Files still being written to, i.e. modified less
+    than settle_seconds ago, are left for a later poll.
+
+    Parameters:
+    directory_path (string): directory containing the raw .csv files and the experiment configuration file
+    trim_hours (int): number of hours to trim from the beginning of the data
+    keep_hours (int): number of hours to keep in the trimmed data
+    bin_hours (int or list): number of hours to bin the data, or a list of bin sizes
+    start_dark (bool): start the kept data at a dark cycle instead of a light cycle
+    experiment_config_file (string): configuration file with ID and GROUP LABEL columns, read again on every update
+    output_format (string): table format of the combined files
+    settle_seconds (float): minimum time since a file was last modified before it is read
+    """
+
+    def __init__(self, directory_path, trim_hours, keep_hours, bin_hours, start_dark, experiment_config_file,
+                 output_format="csv", settle_seconds=5):
+        self.directory_path = directory_path
+        self.trim_hours = trim_hours
+        self.keep_hours = keep_hours
+        self.bin_hours = bin_sizes_of(bin_hours) if isinstance(bin_hours, list) else bin_hours
+        self.start_dark = start_dark
+        self.experiment_config_file = experiment_config_file
+        self.output_format = output_format
+        self.settle_seconds = settle_seconds
+        self.combined_directory = os.path.join(directory_path, "Combined_CLAMS_data")
+        # State of each raw file by path
+        self.files = {}
+
+    def poll(self):
+        """Process the raw files that changed since the last poll and rewrite the combined outputs if any did.
+
+        Returns:
+        List of the paths of the raw files that were read.
+        """
+        raw_files = list_raw_clams_files(self.directory_path)
+        removed_files = set(self.files) - set(raw_files)
+        for file_path in removed_files:
+            print(f"Removed {os.path.basename(file_path)}")
+            del self.files[file_path]
+
+        updated_files = []
+        outputs_changed = bool(removed_files)
+        for file_path in raw_files:
+            try:
+                signature = file_signature(file_path)
+                state = self.files.get(file_path)
+                if state is not None and state["signature"] == signature:
+                    continue
+                # Leave files that are still being written to for the next poll
+                if time.time() - signature[1] / 1e9 < self.settle_seconds:
+                    continue
+
+                had_binned_data = state is not None and state["binned"] is not None
+                state = self.read_file(file_path, state)
+                state["signature"] = signature
+            except (OSError, ValueError) as e:
+                print(f"Skipping {os.path.basename(file_path)}: {e}")
+                continue
+
+            self.files[file_path] = state
+            updated_files.append(file_path)
+            # A file read again from the start drops its binned data until it can be trimmed again
+            outputs_changed |= self.bin_file(file_path, state) or (had_binned_data and state["binned"] is None)
+
+        if outputs_changed:
+            self.write_outputs()
+        return updated_files
+
+    def read_file(self, file_path, state):
+        """Read the rows appended to a raw file since the last read, or the whole file when it was not only appended to.
+
+        Returns:
+        The updated state of the file.
+        """
+        with open(file_path, 'rb') as f:
+            if state is not None and only_appended(f, state):
+                # Only read and parse the complete rows written since the last read
+                f.seek(state["offset"])
+                appended = f.read()
+                end = appended.rfind(b"\n") + 1
+                if end > 0 and not state["complete"]:
+                    new_rows = parse_data_rows(appended[:end], state["header"])
+                    state["rows"] = pd.concat([state["rows"], new_rows], ignore_index=True)
+                    if 'CHAN' in state["rows"].columns:
+                        state["rows"]['CHAN'] = state["rows"]['CHAN'].astype('category')
+                    state["changed"] = True
+                state["offset"] += end
+                state["hashes"] = read_position_hashes(f, state["offset"])
+                return state
+
+            f.seek(0)
+            content = f.read()
+
+        # Find the data header below the metadata block
+        f = io.BytesIO(content)
+        # Combined exports of several chambers are only split into subjects by a full run
+        if len(read_raw_clams_metadata(f, all_values=True).get('Subject ID', [])) > 1:
+            raise ValueError("combined exports of several chambers can't be watched, process them without --watch")
+        f.seek(0)
+        metadata = read_raw_clams_metadata(f)
+        header = list(pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns)
+        # Skip the 2 formatting rows below the header
+        f.readline()
+        f.readline()
+        data_start = f.tell()
+
+        end = max(content.rfind(b"\n") + 1, data_start)
+        return {"name": cleaned_file_name(file_path, metadata), "header": header,
+                "rows": parse_data_rows(content[data_start:end], header), "offset": end,
+                "hashes": read_position_hashes(f, end), "changed": True, "complete": False, "trim": None,
+                "binner": IncrementalClamsBinner(self.bin_hours), "binned": None}
+
+    def bin_file(self, file_path, state):
+        """Trim and bin the rows of a raw file read since it was last binned.
+
+        The rows are kept until the start of the trimmed data can be found. From then on, rows are trimmed against the
+        fixed start and end of the kept data and their bins are updated incrementally. Once the kept hours are
+        complete, rows appended later fall outside the trimmed data and are not binned.
+
+        Returns:
+        True if the binned data of the file changed.
+        """
+        if not state.pop("changed", False) or state["complete"]:
+            return False
+
+        rows = state["rows"]
+        if state["trim"] is None:
+            try:
+                start_index = find_trim_start(rows['DATE/TIME'], rows['LED LIGHTNESS'], self.trim_hours,
+                                              self.start_dark)
+            except (IndexError, ValueError) as e:
+                # Not enough data recorded yet to trim
+                print(f"Waiting for more data in {os.path.basename(file_path)}: {e}")
+                return False
+            # The start of the trimmed data and the values the accumulative columns are re-zeroed with are fixed now,
+            # as in trim_clams_dataframe
+            state["trim"] = {"end_time": rows['DATE/TIME'].iloc[start_index] + timedelta(hours=self.keep_hours),
+                             "baseline": {col: rows[col].iloc[start_index - 1] for col in ACCUMULATIVE_COLUMNS}}
+            rows = rows.iloc[start_index:]
+
+        # Trim the new rows and drop them from the state
+        end_time = state["trim"]["end_time"]
+        state["rows"] = rows.iloc[:0]
+        if rows.empty:
+            return False
+        state["complete"] = rows['DATE/TIME'].iloc[-1] > end_time
+        trimmed_df = rows[(rows['DATE/TIME'] <= end_time).to_numpy()].reset_index(drop=True)
+        if trimmed_df.empty:
+            print(f"Waiting for more data in {os.path.basename(file_path)}")
+            return False
+        zero_accumulative_columns(trimmed_df, state["trim"]["baseline"])
+
+        binned_dfs = state["binner"].add(trimmed_df)
+        trimmed_file_name = state["name"].replace(".csv", "_trimmed.csv")
+        binned_file_names = {size: trimmed_file_name.replace(".csv", f"_{size}hour_bins.csv") for size in binned_dfs}
+        if isinstance(self.bin_hours, list):
+            state["binned"] = (binned_file_names, binned_dfs)
+        else:
+            state["binned"] = (binned_file_names[self.bin_hours], binned_dfs[self.bin_hours])
+        print(f"Binned {os.path.basename(file_path)}" + (" (complete)" if state["complete"] else ""))
+        return True
+
+    def write_outputs(self):
+        """Combine and reformat the binned data of all subjects that have enough data."""
+        binned_data = [state["binned"] for _, state in sorted(self.files.items()) if state["binned"] is not None]
+        if not binned_data:
+            return
+
+        config_df = pd.read_csv(self.experiment_config_file)
+        run_metrics = {"Combined": new_stage_metrics(), "Reformatted": new_stage_metrics()}
+        write_combined_outputs_by_bin_size(binned_data, self.bin_hours, config_df, self.combined_directory,
+                                           self.output_format, run_metrics)
+        print(f"Updated the combined data of {len(binned_data)} subjects at {time.strftime('%H:%M:%S')}")
+
+
+def watch_clams_directory(directory_path, trim_hours, keep_hours, bin_hours, start_dark, experiment_config_file,
+                          output_format="csv", poll_seconds=60, settle_seconds=5, stop_event=None, max_polls=None):
+    """Poll a directory for new and updated raw CLAMS data files until stopped.
+
+    Parameters:
+    directory_path (string): directory containing the raw .csv files
+    trim_hours, keep_hours, bin_hours, start_dark, experiment_config_file, output_format, settle_seconds: see
+    ClamsDirectoryWatcher
+    poll_seconds (float): time between polls
+    stop_event (threading.Event): set to stop watching; without it, watching stops at a KeyboardInterrupt
+    max_polls (int): stop after this many polls, or None to keep polling
+    """
+    watcher = ClamsDirectoryWatcher(directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                    experiment_config_file, output_format=output_format, settle_seconds=settle_seconds)
+    polls = 0
+    while True:
+        watcher.poll()
+        polls += 1
+        if max_polls is not None and polls >= max_polls:
+            return
+        if stop_event is None:
+            time.sleep(poll_seconds)
+        elif stop_event.wait(poll_seconds):
+            return
@@ -0,0 +1,166 @@
+"""Process CLAMS data from the command line, without the GUI.
+
+Example:
+    python cli.py path/to/data --trim-hours 2 --keep-hours 48 --bin-hours 3 --start-cycle dark --workers 4
+    python cli.py path/to/data --trim-hours 2 --keep-hours 48 --bin-hours 1 3 12
+    python cli.py path/to/data --trim-hours 2 --keep-hours 48 --bin-hours 3 --watch
+    python cli.py path/to/data --trim-hours 2 --keep-hours 48 --bin-hours 3 --sliding-window 60 10
+"""
+import argparse
+import os
+import sys
+
+from clams_processing import (clear_clams_cache, finalize_run_directory, format_run_summary, prepare_experiment_config,
+                              process_directory_sliding_windows, resolve_run_directory, run_pipeline,
+                              validate_processing_parameters, write_run_log)
+from clams_watch import watch_clams_directory
+from version import VERSION
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description=f"CLAMS Wrangler {VERSION}: clean, trim, bin and recombine all "
+                                                 f"CLAMS data files (.csv) in a directory.")
+    parser.add_argument("directory", help="directory containing the CLAMS data files")
+    parser.add_argument("--trim-hours", type=int, required=True,
+                        help="number of hours to trim from the beginning of the data")
+    parser.add_argument("--keep-hours", type=int, required=True, help="number of hours to keep after trimming")
+    parser.add_argument("--bin-hours", type=int, nargs="+", required=True,
+                        help="size of the bins in hours, a factor of 12; several sizes are binned in a single pass and "
+                             "combined in a directory per size")
+    parser.add_argument("--start-cycle", choices=["light", "dark"], default="light",
+                        help="light cycle the kept data starts in (default: light)")
+    parser.add_argument("--config", help="config file with ID and GROUP LABEL columns")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--format", choices=["csv", "parquet", "feather"], default="csv",
+                        help="file format of the intermediate and combined files; reformatted files are always .csv "
+                             "(default: csv)")
+    parser.add_argument("--cache", action="store_true", help="reuse cached results from previous runs")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="delete the cached results of previous runs (Cached_CLAMS_data) before processing")
+    parser.add_argument("--no-intermediates", action="store_true",
+                        help="don't save the cleaned, trimmed and binned files")
+    parser.add_argument("--chunk-rows", type=int,
+                        help="with --no-intermediates, read each data file in chunks of this many rows and stop at the "
+                             "end of the kept data, for very long recordings")
+    parser.add_argument("--profile", metavar="DIRECTORY",
+                        help="save a cProfile dump of each stage of each file to this directory")
+    parser.add_argument("--sliding-window", type=int, nargs=2, metavar=("WINDOW_MINUTES", "STEP_MINUTES"),
+                        help="also bin the trimmed files into overlapping windows, e.g. 60 10 for 1 hour windows "
+                             "every 10 minutes, saved to Windowed_CLAMS_data; needs the intermediate files. Windows "
+                             "are placed by their end: DAY is the day a window ends in and 24 HOUR is at most 24")
+    parser.add_argument("--resample", action="store_true",
+                        help="snap the trimmed data onto a regular grid of sample times, report missing samples and "
+                             "bin on the grid, keeping empty bins where samples are missing")
+    parser.add_argument("--results-store", action="store_true",
+                        help="also save the binned and combined data to an indexed SQLite database "
+                             "(clams_results.sqlite) in the combined directory for cohort-wide queries")
+    parser.add_argument("--no-timestamp", action="store_true",
+                        help="save the outputs to the directory itself instead of a new timestamp_* folder")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep polling the directory and update the combined outputs as the data files grow, "
+                             "until stopped with Ctrl+C; outputs stay in the directory")
+    parser.add_argument("--poll-seconds", type=float, default=60,
+                        help="with --watch, time between checks of the directory (default: 60)")
+    args = parser.parse_args(argv)
+
+    # Watching only trims and bins the appended rows in memory, so options of full runs would be ignored
+    if args.watch:
+        unsupported = [option for option, value in (("--resample", args.resample),
+                                                    ("--results-store", args.results_store),
+                                                    ("--chunk-rows", args.chunk_rows),
+                                                    ("--sliding-window", args.sliding_window),
+                                                    ("--profile", args.profile)) if value]
+        if unsupported:
+            parser.error(f"--watch can't be combined with {', '.join(unsupported)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    bin_hours = args.bin_hours[0] if len(args.bin_hours) == 1 else args.bin_hours
+
+    # The cache is never pruned, so stale results of earlier settings are only removed on request
+    if args.clear_cache:
+        print(f"Deleted {clear_clams_cache(args.directory)} cached results")
+
+    if args.watch:
+        return watch(args, bin_hours)
+    if args.sliding_window and args.no_intermediates:
+        print("Error: --sliding-window needs the trimmed files, so it can't be used with --no-intermediates",
+              file=sys.stderr)
+        return 1
+    if args.sliding_window and min(args.sliding_window) <= 0:
+        print("Error: Window and step minutes must be positive!", file=sys.stderr)
+        return 1
+
+    try:
+        # Save the outputs straight to the run directory, resuming a run with the same settings that was interrupted
+        validate_processing_parameters(args.directory, args.trim_hours, args.keep_hours, bin_hours)
+        run_directory = args.directory
+        if not args.no_timestamp:
+            run_directory, resumed = resolve_run_directory(args.directory, args.trim_hours, args.keep_hours, bin_hours,
+                                                           args.start_cycle == "dark", args.format, args.resample)
+            print(f"{'Resuming the interrupted run in' if resumed else 'Saving outputs to'} {run_directory}")
+
+        results = run_pipeline(args.directory, args.trim_hours, args.keep_hours, bin_hours,
+                               start_dark=args.start_cycle == "dark", config_file=args.config,
+                               save_intermediates=not args.no_intermediates, workers=args.workers,
+                               use_cache=args.cache, output_format=args.format, profile_directory=args.profile,
+                               trim_chunk_rows=args.chunk_rows, output_directory=run_directory,
+                               results_store=args.results_store, resample=args.resample)
+        if args.sliding_window:
+            process_directory_sliding_windows(run_directory, *args.sliding_window, output_format=args.format)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    # Summarize where the time went
+    summary = format_run_summary(results)
+    print("\n" + summary)
+
+    # Log the arguments and summary next to the experiment configuration file
+    input_values = {
+        "Directory Path": args.directory,
+        "Trim Hours": args.trim_hours,
+        "Start Cycle": f"Start {args.start_cycle.capitalize()}",
+        "Keep Hours": args.keep_hours,
+        "Bin Hours": bin_hours,
+        "Config File": args.config or "",
+        "Save Intermediate Files": not args.no_intermediates,
+        "Reuse Cached Results": args.cache,
+        "Clear Cache": args.clear_cache,
+        "Output Format": args.format,
+        "Workers": args.workers,
+        "Chunk Rows": args.chunk_rows or "",
+        "Resample": args.resample,
+        "Results Store": args.results_store,
+        "Sliding Window": " ".join(map(str, args.sliding_window or [])),
+    }
+    write_run_log(args.directory, VERSION, input_values, summary + "\n", metrics=results["metrics"])
+    finalize_run_directory(args.directory, run_directory)
+    if not args.no_timestamp:
+        print(f"Outputs saved to {run_directory}")
+
+    return 0
+
+
+def watch(args, bin_hours):
+    """Update the combined outputs of a directory whose data files are still being recorded, until interrupted."""
+    try:
+        validate_processing_parameters(args.directory, args.trim_hours, args.keep_hours, bin_hours)
+        experiment_config_file = prepare_experiment_config(args.directory, args.config)
+        print(f"Watching {args.directory} every {args.poll_seconds:g} seconds, press Ctrl+C to stop")
+        watch_clams_directory(args.directory, args.trim_hours, args.keep_hours, bin_hours,
+                              args.start_cycle == "dark", experiment_config_file, output_format=args.format,
+                              poll_seconds=args.poll_seconds)
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
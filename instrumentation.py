@@ -0,0 +1,130 @@
+"""Measure where the time and memory of a processing run go.
+
+Every stage of every file records its wall time, the rows going in and out, the bytes read and written and the peak
+resident memory of the process. The measurements of a run are summarized per stage and saved as JSON next to the run
+log, and each stage can optionally be profiled with cProfile.
+"""
+import contextlib
+import cProfile
+import json
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where the peak memory is read with ctypes instead
+    resource = None
+
+
+def new_stage_metrics():
+    """Return the measurements of a stage that has not run yet.
+
+    "seconds" is the time spent computing the stage and "write_seconds" the time spent saving its files. Rows are
+    None until measured; "cached" is set when the stage result was loaded from the cache.
+    """
+    return {"seconds": 0.0, "write_seconds": 0.0, "rows_in": None, "rows_out": None, "bytes_read": 0,
+            "bytes_written": 0, "peak_rss_bytes": None, "cached": False}
+
+
+def add_metric(metrics, name, value):
+    """Add a value to a measurement that may not have been recorded yet."""
+    metrics[name] = (metrics[name] or 0) + value
+
+
+def peak_memory_usage():
+    """Return the peak resident memory of this process in bytes, or None when it cannot be measured."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS reports bytes, other systems kilobytes
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+        get_current_process.restype = wintypes.HANDLE
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        if get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize
+
+    return None
+
+
+def file_size(file_path):
+    """Return the size of a file in bytes, or 0 if it does not exist."""
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+
+class StageProfiler:
+    """Profile stages with cProfile and save one .prof file per stage to the profile directory.
+
+    Stages may run inside other stages; the time of a nested stage is only counted in its own profile.
+    Without a profile directory, stages run without profiling.
+    """
+
+    def __init__(self, profile_directory=None):
+        self.profile_directory = profile_directory
+        self.active_profilers = []
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        if self.profile_directory is None:
+            yield
+            return
+
+        # Pause the profiler of the stage this stage runs in
+        if self.active_profilers:
+            self.active_profilers[-1].disable()
+        profiler = cProfile.Profile()
+        self.active_profilers.append(profiler)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            self.active_profilers.pop()
+            os.makedirs(self.profile_directory, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_directory, f"{name}.prof"))
+            if self.active_profilers:
+                self.active_profilers[-1].enable()
+
+
+def summarize_stage_metrics(stage_metrics_list):
+    """Add up the measurements of a stage over files.
+
+    Times, rows and bytes are summed, the peak memory is the highest peak and "cached" counts the cached files.
+    Rows that were not measured for some files, e.g. because their stage input came from the cache, are left out.
+    """
+    summary = new_stage_metrics()
+    summary["cached"] = 0
+    for metrics in stage_metrics_list:
+        for name in ("seconds", "write_seconds", "bytes_read", "bytes_written"):
+            summary[name] += metrics[name]
+        for name in ("rows_in", "rows_out"):
+            if metrics[name] is not None:
+                add_metric(summary, name, metrics[name])
+        if metrics["peak_rss_bytes"] is not None:
+            summary["peak_rss_bytes"] = max(summary["peak_rss_bytes"] or 0, metrics["peak_rss_bytes"])
+        summary["cached"] += bool(metrics["cached"])
+    return summary
+
+
+def write_metrics_summary(file_path, summary):
+    """Save a run summary as indented JSON."""
+    with open(file_path, 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
@@ -1,68 +1,99 @@
+import multiprocessing
 import os
 import platform
+import queue
 import sys
+import threading
 import time
 import tkinter as tk
 import webbrowser
-from datetime import datetime
-from shutil import move
 from tkinter import filedialog, font, messagebox
 
-import pandas as pd
-import requests
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
 
-from clams_processing import clean_all_clams_data, trim_all_clams_data, process_directory, recombine_columns, \
-    reformat_csvs_in_directory
+from update_check import check_for_update_in_background, is_newer_release, startup_update_check_enabled
+from version import VERSION
 
-VERSION = "v1.0.4"
+# pandas and the processing modules take seconds to import in the frozen executable, so they are imported in the
+# background once the window is shown (see warm_up_processing_modules) and by the functions that use them
 
 
 class StdoutRedirect:
-    def __init__(self, text_widget):
-        self.text_widget = text_widget
+    """Queue printed output for the GUI, which inserts it into the output_text widget in batches."""
+
+    def __init__(self, event_queue):
+        self.event_queue = event_queue
         self._stdout = sys.stdout
 
     def write(self, message):
-        original_stdout = sys.stdout
-        sys.stdout = self._stdout
-        try:
-            self.text_widget.insert(tk.END, message)
-            self.text_widget.see(tk.END)  # Scroll to the end
+        self.event_queue.put(("output", message))
+        if self._stdout is not None:
             self._stdout.write(message)
-            self.text_widget.see(tk.END)  # Scroll to the end
-            self._stdout.flush()  # Flush the buffer
-        except Exception as e:
-            print(f"An exception occurred: {e}")
-        finally:
-            sys.stdout = original_stdout
 
     def flush(self):
-        self._stdout.flush()
-
-
-def check_for_update():
-    current_version = VERSION
-    repo_owner = 'PistilliLab'
-    repo_name = 'CLAMSwrangler'  # Replace with your actual repo name
-    url = f'https://api.github.com/repos/{repo_owner}/{repo_name}/releases/latest'
-
-    response = requests.get(url)
-    if response.status_code == 200:
-        latest_release = response.json()
-        latest_version = latest_release['tag_name']
-
-        if latest_version != current_version:
-            new_version = messagebox.askyesno('Update Available',
-                                              f"CLAMS Wrangler {latest_version} is available. Update?")
-            if new_version is True:
-                webbrowser.open(latest_release['html_url'])
-        else:
-            messagebox.showinfo('No Update Available',
-                                f"You are using the latest version of CLAMS Wrangler! ({VERSION})")
+        if self._stdout is not None:
+            self._stdout.flush()
+
+
+def check_for_update(interactive=True):
+    """Look up the latest release in the background; the result arrives as an "update" event on the event queue.
+
+    Parameters:
+    interactive (bool): the user asked for the check, so always contact GitHub and show the result; otherwise a
+    result cached within the last day is used and only a newer release is shown, on the update button
+    """
+    if interactive:
+        update_button.config(state=DISABLED, text="Checking for Updates...")
+    check_for_update_in_background(lambda release, error: event_queue.put(("update", release, error, interactive)),
+                                   use_cache=not interactive)
+
+
+def show_update_result(release, error, interactive):
+    """Show the result of an update check on the Tk thread."""
+    if interactive:
+        update_button.config(state=NORMAL, text="Check for Updates")
+    if release is not None and is_newer_release(release):
+        update_button.config(text=f"Update to {release['tag_name']}")
+    if not interactive:
+        return
+
+    if error is not None:
+        output_text.insert(tk.END, f"Could not check for updates: {error}\n")
+    elif is_newer_release(release):
+        new_version = messagebox.askyesno('Update Available',
+                                          f"CLAMS Wrangler {release['tag_name']} is available. Update?")
+        if new_version is True:
+            webbrowser.open(release['html_url'])
     else:
-        print("Could not check for updates.")
+        messagebox.showinfo('No Update Available',
+                            f"You are using the latest version of CLAMS Wrangler! ({VERSION})")
+
+
+def warm_up_processing_modules():
+    """Import pandas and the processing modules on a background thread, so they are ready before they are needed."""
+    def warm_up():
+        import clams_processing  # noqa: F401
+        event_queue.put(("ready",))
+
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+
+def report_startup(milestone):
+    """With --measure-startup, print each startup milestone as it is reached, and close the window once the update
+    check and the processing modules are done. startup_benchmark.py times the printed lines.
+
+    Returns:
+    True if the window was closed, after which no Tk callback may be scheduled or run.
+    """
+    if not startup_milestones["measure"]:
+        return False
+    print(f"STARTUP {milestone}", flush=True)
+    startup_milestones[milestone] = True
+    if all(name in startup_milestones for name in ("window_shown", "update_checked", "processing_ready")):
+        root.destroy()
+        return True
+    return False
 
 
 def browse_working_directory():
@@ -91,19 +122,9 @@ def resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def initialize_experiment_config_file(directory_path):
-    # Create a folder for the config file
-    config_file_path = os.path.join(directory_path, 'config')
-    os.makedirs(config_file_path, exist_ok=True)
-
-    # Path to the experiment configuration file
-    config_file = os.path.join(config_file_path, 'experiment_config.csv')
-
-    with open(config_file, 'w') as file:
-        file.write("ID,GROUP LABEL\n")
-
-
 def save_configuration(id_value, group_label_value, directory_path):
+    from clams_processing import initialize_experiment_config_file
+
     # Check if the experiment configuration file exists
     experiment_config_file = os.path.join(directory_path, 'config/experiment_config.csv')
     if not os.path.exists(experiment_config_file):
@@ -127,9 +148,25 @@ def save_configuration(id_value, group_label_value, directory_path):
     entry_group_label.delete(0, tk.END)
 
 
+def clear_cached_results(directory_path):
+    """Delete the cached results of previous runs in the provided directory."""
+    from clams_processing import clear_clams_cache
+
+    if not directory_path:
+        output_text.insert(tk.END, "Directory path is not provided!\n")
+        return
+
+    cleared_count = clear_clams_cache(directory_path)
+    output_text.insert(tk.END, f"Deleted {cleared_count} cached results from {directory_path}\n")
+    output_text.see(tk.END)  # Scroll to the end
+
+
 def browse_config_file():
     """Opens dialog window to select a prebuilt config file and copy it to the config directory.
     """
+    import pandas as pd
+    from clams_processing import initialize_experiment_config_file
+
     directory_path = directory_path_entry.get()
     # Check if the experiment configuration file exists
     experiment_config_file = os.path.join(directory_path, 'config/experiment_config.csv')
@@ -166,30 +203,6 @@ def browse_config_file():
             output_text.insert(tk.END, f"Error: Invalid format in experiment configuration file: {str(e)}\n")
 
 
-def log_user_input_and_output(input_values, output_text_content):
-    """Log user input values and output text to a log file.
-
-    Parameters:
-    input_values (dict): Dictionary containing user input values.
-    output_text_content (str): Content of the output_text widget.
-    """
-    # Create a timestamp for the log file
-    timestamp = time.strftime("%Y-%m-%d_%H-%M-%S")
-    log_file_path = os.path.join(directory_path_entry.get(), 'config', f'log_{timestamp}.txt')
-
-    with open(log_file_path, 'w') as log_file:
-        # Write software version to the log file
-        log_file.write(f"Data processed using CLAMS Wrangler {VERSION} on {timestamp}\n\n")
-        # Write user input values to the log file
-        log_file.write("User Input Values:\n")
-        for key, value in input_values.items():
-            log_file.write(f"{key}: {value}\n")
-
-        # Write output_text content to the log file
-        log_file.write("\nOutput Text:\n")
-        log_file.write(output_text_content)
-
-
 def main_process_clams_data():
     """Main function to process all CLAMS data files in the provided directory.
 
@@ -228,6 +241,7 @@ def main_process_clams_data():
 
     except ValueError as e:
         output_text.insert(tk.END, f"Error: {str(e)} Value must be a whole integer!\n")
+        return
 
     # this has a default value and can not be modified, so no need for error handling
     start_dark = start_cycle_var.get() == "Start Dark"
@@ -244,6 +258,7 @@ def main_process_clams_data():
 
     except ValueError as e:
         output_text.insert(tk.END, f"Error: {str(e)} Value must be a whole integer!\n")
+        return
 
     # handle bin hours errors
     try:
@@ -253,252 +268,372 @@ def main_process_clams_data():
             output_text.insert(tk.END, "Bin hours value is not provided!\n")
             return
 
-        bin_hours = int(bin_hours_str)
+        # Several bin sizes can be given separated by commas, e.g. "1, 3, 12"
+        bin_sizes = [int(size) for size in bin_hours_str.split(",")]
+        bin_hours = bin_sizes[0] if len(bin_sizes) == 1 else bin_sizes
 
         # check if factor of 12
-        if 12 % bin_hours != 0:
+        if any(size == 0 or 12 % size != 0 for size in bin_sizes):
             output_text.insert(tk.END, f"Bin hours must be a factor of 12!\n")
             return
 
     except ValueError as e:
         output_text.insert(tk.END, f"Error: {str(e)} Value must be a whole integer!\n")
+        return
+
+    # Collect the inputs now; the worker thread must not touch the widgets
+    processing_state["metrics"] = None
+    processing_state["run_directory"] = None
+    processing_state["input_values"] = {
+        "Directory Path": directory_path,
+        "Trim Hours": trim_hours,
+        "Start Cycle": start_cycle_var.get(),
+        "Keep Hours": keep_hours,
+        "Bin Hours": bin_hours,
+        "Config File": config_file_entry.get(),
+        "Save Intermediate Files": save_intermediates_var.get(),
+        "Reuse Cached Results": use_cache_var.get(),
+    }
 
     # Redirect stdout to the output_text widget
-    original_stdout = sys.stdout
-    sys.stdout = StdoutRedirect(output_text)
+    processing_state["original_stdout"] = sys.stdout
+    sys.stdout = StdoutRedirect(event_queue)
 
-    # Check if the experiment configuration file exists
-    experiment_config_file = os.path.join(directory_path, 'config/experiment_config.csv')
-    if not os.path.exists(experiment_config_file):
-        # Initialize a new experiment configuration file
-        initialize_experiment_config_file(directory_path)
+    cancel_event.clear()
+    start_button.config(state=DISABLED)
+    cancel_button.config(state=NORMAL)
+    progress_bar.config(value=0)
+    progress_label.config(text="Starting...")
+
+    worker = threading.Thread(target=process_clams_data_worker,
+                              args=(directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                    config_file_entry.get(), save_intermediates_var.get(), use_cache_var.get()),
+                              daemon=True)
+    worker.start()
 
-        # Check if the user provided a config file to be copied
-        selected_config_file = config_file_entry.get()
-        if selected_config_file and os.path.exists(selected_config_file):
-            try:
-                # Read the selected config file
-                config_df = pd.read_csv(selected_config_file)
-                expected_columns = ["ID", "GROUP LABEL"]
-                if all(col in config_df.columns for col in expected_columns):
-                    # Copy the selected config file to the new experiment configuration file
-                    config_directory = os.path.join(directory_path, 'config')
-                    config_file_dest = os.path.join(config_directory, 'experiment_config.csv')
-                    config_df.to_csv(config_file_dest, index=False, columns=expected_columns)
-            except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError) as e:
-                # Handle errors while reading/copying the selected config file
-                output_text.insert(tk.END, f"Error copying config file: {str(e)}\n")
-
-    output_text.insert("end", "\nCleaning all CLAMS data...\n")
-    clean_all_clams_data(directory_path)
-
-    output_text.insert("end", "\nTrimming all cleaned CLAMS data...\n")
-    trim_all_clams_data(directory_path, trim_hours, keep_hours, start_dark)
-
-    output_text.insert("end", "\nBinning all trimmed CLAMS data...\n")
-    process_directory(directory_path, bin_hours)
-
-    # Path to experiment config file
-    experiment_config_file = os.path.join(directory_path, 'config/experiment_config.csv')
 
-    output_text.insert("end", "\nCombining all binned CLAMS data...\n")
-    recombine_columns(directory_path, experiment_config_file)
+def process_clams_data_worker(directory_path, trim_hours, keep_hours, bin_hours, start_dark, config_file,
+                              save_intermediates, use_cache):
+    """Process all CLAMS data on a worker thread, reporting progress and the result through the event queue."""
+    import pandas as pd
+    from clams_processing import ProcessingCancelled, prepare_experiment_config, process_clams_data_in_memory, \
+        resolve_run_directory
 
-    output_text.insert("end", "\nReformatting all combined CLAMS data...\n")
-    reformat_csvs_in_directory(os.path.join(directory_path, 'Combined_CLAMS_data'))
+    start_time = time.perf_counter()
 
-    output_text.insert("end", "\nAll CLAMS files processed successfully!")
+    def report_progress(completed, total, file_name):
+        event_queue.put(("progress", completed, total, time.perf_counter() - start_time))
+
+    try:
+        # Make sure the experiment configuration file exists, copying the selected config file if provided
+        try:
+            experiment_config_file = prepare_experiment_config(directory_path, config_file)
+        except (pd.errors.EmptyDataError, pd.errors.ParserError, ValueError) as e:
+            # Handle errors while reading/copying the selected config file
+            experiment_config_file = os.path.join(directory_path, 'config', 'experiment_config.csv')
+            print(f"Error copying config file: {str(e)}")
+
+        # Save the outputs straight to the run directory, resuming a run with the same settings that was interrupted
+        run_directory, resumed = resolve_run_directory(directory_path, trim_hours, keep_hours, bin_hours, start_dark)
+        processing_state["run_directory"] = run_directory
+        if resumed:
+            print(f"\nResuming the interrupted run in {run_directory}")
+
+        print("\nProcessing all CLAMS data...")
+        results = process_clams_data_in_memory(directory_path, trim_hours, keep_hours, bin_hours, start_dark,
+                                               experiment_config_file, save_intermediates=save_intermediates,
+                                               workers=os.cpu_count() or 1, use_cache=use_cache,
+                                               progress_callback=report_progress, cancel_event=cancel_event,
+                                               output_directory=run_directory)
+        processing_state["metrics"] = results["metrics"]
+        print("\nAll CLAMS files processed successfully!")
+        event_queue.put(("finished", "done"))
+    except ProcessingCancelled:
+        print("\nProcessing cancelled. Start again with the same settings to resume.")
+        event_queue.put(("finished", "cancelled"))
+    except Exception as e:
+        print(f"\nError: {str(e)}")
+        event_queue.put(("finished", "failed"))
+
+
+def cancel_processing():
+    """Ask the worker thread to stop after the files that are currently being processed."""
+    cancel_event.set()
+    cancel_button.config(state=DISABLED)
+    progress_label.config(text="Cancelling after the current files...")
+
+
+def process_event_queue():
+    """Apply all queued output and progress events to the widgets, then check again shortly."""
+    output_chunks = []
+    finished_status = None
+    while True:
+        try:
+            event = event_queue.get_nowait()
+        except queue.Empty:
+            break
+
+        if event[0] == "output":
+            output_chunks.append(event[1])
+        elif event[0] == "progress":
+            completed, total, elapsed = event[1:]
+            remaining = elapsed / completed * (total - completed)
+            progress_bar.config(maximum=total, value=completed)
+            progress_label.config(text=f"{completed}/{total} files processed, "
+                                       f"about {int(remaining // 60)} min {int(remaining % 60)} s remaining")
+        elif event[0] == "finished":
+            finished_status = event[1]
+        elif event[0] == "update":
+            show_update_result(*event[1:])
+            if report_startup("update_checked"):
+                return
+        elif event[0] == "ready":
+            if report_startup("processing_ready"):
+                return
+
+    # Insert all new output at once
+    if output_chunks:
+        output_text.insert(tk.END, "".join(output_chunks))
+        output_text.see(tk.END)  # Scroll to the end
+
+    if finished_status is not None:
+        finish_processing(finished_status)
+
+    root.after(100, process_event_queue)
+
+
+def finish_processing(status):
+    """Restore the GUI after the worker thread finished, and log and finalize a successful run."""
+    from clams_processing import finalize_run_directory, write_run_log
 
     # Restore the original stdout
-    sys.stdout = original_stdout
+    sys.stdout = processing_state["original_stdout"]
+
+    start_button.config(state=NORMAL)
+    cancel_button.config(state=DISABLED)
+    progress_label.config(text={"done": "Done", "cancelled": "Cancelled", "failed": "Failed"}[status])
+    if status != "done":
+        return
 
     # Log user input values and output text
-    input_values = {
-        "Directory Path": directory_path_entry.get(),
-        "Trim Hours": trim_hours_entry.get(),
-        "Start Cycle": start_cycle_var,
-        "Keep Hours": keep_hours_entry.get(),
-        "Bin Hours": bin_hours_entry.get(),
-        "Config File": config_file_entry.get(),
-    }
+    directory_path = processing_state["input_values"]["Directory Path"]
     output_text_content = output_text.get("1.0", tk.END)
-    log_user_input_and_output(input_values, output_text_content)
-
-    # Create a timestamped directory within the working directory
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    timestamped_dir = os.path.join(directory_path, f'timestamp_{timestamp}')
-    os.makedirs(timestamped_dir, exist_ok=True)
-
-    # Move the relevant folders to the timestamped directory
-    folders_to_move = ['Binned_CLAMS_data', 'Cleaned_CLAMS_data', 'Combined_CLAMS_data', 'config', 'Trimmed_CLAMS_data']
-    for folder in folders_to_move:
-        source_folder = os.path.join(directory_path, folder)
-        destination_folder = os.path.join(timestamped_dir, folder)
-        move(source_folder, destination_folder)
-
-
-# Create the main window
-root = ttk.Window(themename="superhero")
-root.title(f"CLAMS Wrangler {VERSION}")
-root.minsize(width=1400, height=1000)
-
-# error handling for not finding ico file on Windows
-if os.path.exists(resource_path('CLAMS_icon.ico')) and platform.system() == "Windows":
-    root.iconbitmap(resource_path('CLAMS_icon.ico'))
-else:
-    print("ICO file not found")
-
-# for macOS
-if os.path.exists(resource_path('CLAMS_icon.png')) and platform.system() == "Darwin":
-    mac_icon = tk.PhotoImage(file=resource_path('CLAMS_icon.png'))
-    root.iconphoto(True, mac_icon)
-else:
-    print("PNG file not found")
-
-# for linux
-if os.path.exists(resource_path('CLAMS_icon.png')):
-    icon_image = tk.PhotoImage(file=resource_path('CLAMS_icon.png'))
-    root.iconphoto(True, icon_image)
-else:
-    print("PNG file not found")
-
-# Get the default font
-default_font = font.nametofont("TkDefaultFont")
-
-# Configure the default font
-default_font.configure(size=12, family="Arial")
-
-# Create a header frame for the logo
-header_frame = ttk.Frame(root)
-header_frame.pack(fill=tk.X)
-
-# Add a logo (replace 'logo.png' with the path to your logo image)
-logo_image = tk.PhotoImage(file=resource_path('logo.png'))
-logo_label = ttk.Label(header_frame, image=logo_image)
-logo_label.pack(side=tk.TOP, pady=10)
-
-# Set the column weights for the header frame
-header_frame.grid_columnconfigure(0, weight=4)
-header_frame.grid_columnconfigure(1, weight=1)
-
-main_frame = ttk.Frame(root)
-main_frame.pack(fill=tk.BOTH, expand=True)
-
-instructions_frame = ttk.Frame(main_frame)
-instructions_frame.grid(row=0, column=0, padx=10, pady=10)
-
-instructions_label = ttk.Label(instructions_frame, text="Instructions")
-instructions_label.grid(row=0, column=0, pady=10)
-instructions_text = tk.Text(instructions_frame, wrap=tk.WORD, width=60, height=30)
-# instructions_text.pack()
-instructions_text.grid(row=1, column=0)
-instructions = read_instructions(resource_path('instructions.txt'))  # read in using read_instructions function at top
-instructions_text.insert(tk.END, instructions)
-instructions_text.config(state=tk.DISABLED)  # prevent editing
-
-# Add citation label and text
-citation_label = ttk.Label(instructions_frame, text="Please cite this software")
-citation_label.grid(row=2, column=0, pady=10)
-citation_text = tk.Text(instructions_frame, wrap=tk.WORD, width=60, height=5)
-citation_text.grid(row=3, column=0, pady=10)
-citation_text.insert(tk.END, f"Clayton, S. A., Mizener, A. D., & Rentz, L. E. (2023). CLAMS Wrangler ({VERSION}) "
-                             "[Computer software]. https://github.com/PistilliLab/CLAMSwrangler")
-citation_text.config(state=tk.DISABLED)
-
-# Defines frame for user input
-input_frame = ttk.Frame(main_frame)
-input_frame.grid(row=0, column=1, padx=10, pady=10)
-input_frame.grid_columnconfigure(1, weight=5)  # fill available space
-
-directory_path_label = ttk.Label(input_frame, text="Directory Path:")
-directory_path_label.grid(row=0, column=0, sticky=W, padx=2, pady=2)
-browse_button = ttk.Button(input_frame, text="Browse", width=10, command=browse_working_directory)
-browse_button.grid(row=0, column=2, sticky=E, padx=2, pady=2)
-directory_path_entry = ttk.Entry(input_frame, width=75)
-directory_path_entry.grid(row=0, column=1, sticky=EW, padx=2, pady=2)
-
-trim_hours_label = ttk.Label(input_frame, text="Trim Hours:")
-trim_hours_label.grid(row=1, column=0, sticky=EW, padx=2, pady=2)
-start_cycle_var = tk.StringVar()
-start_cycle_dropdown = ttk.Combobox(input_frame, textvariable=start_cycle_var, values=["Start Light", "Start Dark"],
-                                    width=8, state="readonly")
-start_cycle_var.set("Start Light")
-start_cycle_dropdown.grid(row=1, column=2, sticky=EW, padx=1, pady=2)
-trim_hours_entry = ttk.Entry(input_frame, width=75)
-trim_hours_entry.grid(row=1, column=1, sticky=EW, padx=2, pady=2)
-
-keep_hours_label = ttk.Label(input_frame, text="Keep Hours:")
-keep_hours_label.grid(row=2, column=0, sticky=EW, padx=2, pady=2)
-keep_hours_entry = ttk.Entry(input_frame, width=75)
-keep_hours_entry.grid(row=2, column=1, sticky=EW, padx=2, pady=2)
-
-bin_hours_label = ttk.Label(input_frame, text="Bin Hours:")
-bin_hours_label.grid(row=3, column=0, sticky=EW, padx=2, pady=2)
-bin_hours_entry = ttk.Entry(input_frame, width=75)
-bin_hours_entry.grid(row=3, column=1, sticky=EW, padx=2, pady=2)
-
-config_file_label = ttk.Label(input_frame, text="Config File:")
-config_file_label.grid(row=4, column=0, sticky=EW, padx=2, pady=2)
-btn_browse_config = ttk.Button(input_frame, text="Browse", width=10, command=browse_config_file)
-btn_browse_config.grid(row=4, column=2, sticky=EW, padx=2, pady= 2)
-config_file_entry = ttk.Entry(input_frame, width=75)
-config_file_entry.grid(row=4, column=1, sticky=EW, padx=2, pady=2)
-
-label_id = ttk.Label(input_frame, text="ID:")
-label_id.grid(row=5, column=0, sticky=EW, padx=2, pady=2)
-entry_id = ttk.Entry(input_frame, width=75)
-entry_id.grid(row=5, column=1, sticky=EW, padx=2, pady=2)
-
-label_group_label = ttk.Label(input_frame, text="Group Label:")
-label_group_label.grid(row=6, column=0, sticky=EW, padx=2, pady=2)
-entry_group_label = ttk.Entry(input_frame, width=75)
-entry_group_label.grid(row=6, column=1, sticky=EW, padx=2, pady=2)
-
-# Add "Add Label" button
-btn_add_config = ttk.Button(input_frame, text="Add Label",
-                            command=lambda: save_configuration(entry_id.get(), entry_group_label.get(),
-                                                               directory_path_entry.get()))
-btn_add_config.grid(row=7, column=1, padx=2, pady=2)
-
-output_text = ttk.Text(input_frame, wrap=tk.WORD, width=100, height=20)
-output_text.grid(row=8, column=0, columnspan=3, padx=10, pady=10)
-
-start_button = ttk.Button(input_frame, text="Start Processing", command=main_process_clams_data)
-start_button.grid(row=9, column=0, columnspan=3, padx=10, pady=10)
-
-# Set weights for rescaling window
-main_frame.grid_rowconfigure(0, weight=1)
-main_frame.grid_columnconfigure(0, weight=1)
-main_frame.grid_columnconfigure(1, weight=3)
-
-instructions_frame.grid_rowconfigure(0, weight=1)
-instructions_frame.grid_columnconfigure(0, weight=1)
-
-input_frame.grid_rowconfigure(0, weight=1)
-input_frame.grid_rowconfigure(1, weight=1)
-input_frame.grid_rowconfigure(2, weight=1)
-input_frame.grid_rowconfigure(3, weight=1)
-input_frame.grid_rowconfigure(4, weight=1)
-input_frame.grid_rowconfigure(5, weight=3)
-input_frame.grid_columnconfigure(0, weight=1)
-
-# Create a footer frame for the credits
-footer_frame = ttk.Frame(root)
-footer_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
-
-# Add credits text
-credits_text = (f"{VERSION} Developed by the Pistilli Lab. Credits: Alan Mizener, Stuart Clayton, Lauren Rentz. "
-                f"Visit github.com/PistilliLab")
-credits_label = ttk.Label(footer_frame, text=credits_text, state="readonly")
-credits_label.pack(side=tk.LEFT, padx=10)
-
-# Add Exit button
-exit_button = ttk.Button(footer_frame, text="Exit", command=root.quit, bootstyle=DANGER)
-exit_button.pack(side=tk.RIGHT, padx=10)
-
-# Add "Check for Updates" button
-update_button = ttk.Button(footer_frame, text="Check for Updates", command=check_for_update)
-update_button.pack(side=tk.RIGHT, padx=10)
-
-
-root.mainloop()
+    write_run_log(directory_path, VERSION, processing_state["input_values"], output_text_content,
+                  metrics=processing_state.get("metrics"))
+
+    # Move the config folder to the run directory, which already holds all other outputs
+    finalize_run_directory(directory_path, processing_state["run_directory"])
+
+
+# Progress and output of the worker thread, shared with the GUI
+event_queue = queue.Queue()
+cancel_event = threading.Event()
+processing_state = {}
+
+# Startup milestones reached, printed with --measure-startup
+startup_milestones = {"measure": "--measure-startup" in sys.argv}
+
+
+if __name__ == "__main__":
+    # Needed so worker processes of the frozen executable don't start another instance of the program
+    multiprocessing.freeze_support()
+
+    # Create the main window
+    root = ttk.Window(themename="superhero")
+    root.title(f"CLAMS Wrangler {VERSION}")
+    root.minsize(width=1400, height=1000)
+
+    # error handling for not finding ico file on Windows
+    if os.path.exists(resource_path('CLAMS_icon.ico')) and platform.system() == "Windows":
+        root.iconbitmap(resource_path('CLAMS_icon.ico'))
+    else:
+        print("ICO file not found")
+
+    # for macOS
+    if os.path.exists(resource_path('CLAMS_icon.png')) and platform.system() == "Darwin":
+        mac_icon = tk.PhotoImage(file=resource_path('CLAMS_icon.png'))
+        root.iconphoto(True, mac_icon)
+    else:
+        print("PNG file not found")
+
+    # for linux
+    if os.path.exists(resource_path('CLAMS_icon.png')):
+        icon_image = tk.PhotoImage(file=resource_path('CLAMS_icon.png'))
+        root.iconphoto(True, icon_image)
+    else:
+        print("PNG file not found")
+
+    # Get the default font
+    default_font = font.nametofont("TkDefaultFont")
+
+    # Configure the default font
+    default_font.configure(size=12, family="Arial")
+
+    # Create a header frame for the logo
+    header_frame = ttk.Frame(root)
+    header_frame.pack(fill=tk.X)
+
+    # Add a logo (replace 'logo.png' with the path to your logo image)
+    logo_image = tk.PhotoImage(file=resource_path('logo.png'))
+    logo_label = ttk.Label(header_frame, image=logo_image)
+    logo_label.pack(side=tk.TOP, pady=10)
+
+    # Set the column weights for the header frame
+    header_frame.grid_columnconfigure(0, weight=4)
+    header_frame.grid_columnconfigure(1, weight=1)
+
+    main_frame = ttk.Frame(root)
+    main_frame.pack(fill=tk.BOTH, expand=True)
+
+    instructions_frame = ttk.Frame(main_frame)
+    instructions_frame.grid(row=0, column=0, padx=10, pady=10)
+
+    instructions_label = ttk.Label(instructions_frame, text="Instructions")
+    instructions_label.grid(row=0, column=0, pady=10)
+    instructions_text = tk.Text(instructions_frame, wrap=tk.WORD, width=60, height=30)
+    # instructions_text.pack()
+    instructions_text.grid(row=1, column=0)
+    instructions = read_instructions(resource_path('instructions.txt'))  # read in using read_instructions function at top
+    instructions_text.insert(tk.END, instructions)
+    instructions_text.config(state=tk.DISABLED)  # prevent editing
+
+    # Add citation label and text
+    citation_label = ttk.Label(instructions_frame, text="Please cite this software")
+    citation_label.grid(row=2, column=0, pady=10)
+    citation_text = tk.Text(instructions_frame, wrap=tk.WORD, width=60, height=5)
+    citation_text.grid(row=3, column=0, pady=10)
+    citation_text.insert(tk.END, f"Clayton, S. A., Mizener, A. D., & Rentz, L. E. (2023). CLAMS Wrangler ({VERSION}) "
+                                 "[Computer software]. https://github.com/PistilliLab/CLAMSwrangler")
+    citation_text.config(state=tk.DISABLED)
+
+    # Defines frame for user input
+    input_frame = ttk.Frame(main_frame)
+    input_frame.grid(row=0, column=1, padx=10, pady=10)
+    input_frame.grid_columnconfigure(1, weight=5)  # fill available space
+
+    directory_path_label = ttk.Label(input_frame, text="Directory Path:")
+    directory_path_label.grid(row=0, column=0, sticky=W, padx=2, pady=2)
+    browse_button = ttk.Button(input_frame, text="Browse", width=10, command=browse_working_directory)
+    browse_button.grid(row=0, column=2, sticky=E, padx=2, pady=2)
+    directory_path_entry = ttk.Entry(input_frame, width=75)
+    directory_path_entry.grid(row=0, column=1, sticky=EW, padx=2, pady=2)
+
+    trim_hours_label = ttk.Label(input_frame, text="Trim Hours:")
+    trim_hours_label.grid(row=1, column=0, sticky=EW, padx=2, pady=2)
+    start_cycle_var = tk.StringVar()
+    start_cycle_dropdown = ttk.Combobox(input_frame, textvariable=start_cycle_var, values=["Start Light", "Start Dark"],
+                                        width=8, state="readonly")
+    start_cycle_var.set("Start Light")
+    start_cycle_dropdown.grid(row=1, column=2, sticky=EW, padx=1, pady=2)
+    trim_hours_entry = ttk.Entry(input_frame, width=75)
+    trim_hours_entry.grid(row=1, column=1, sticky=EW, padx=2, pady=2)
+
+    keep_hours_label = ttk.Label(input_frame, text="Keep Hours:")
+    keep_hours_label.grid(row=2, column=0, sticky=EW, padx=2, pady=2)
+    keep_hours_entry = ttk.Entry(input_frame, width=75)
+    keep_hours_entry.grid(row=2, column=1, sticky=EW, padx=2, pady=2)
+
+    bin_hours_label = ttk.Label(input_frame, text="Bin Hours:")
+    bin_hours_label.grid(row=3, column=0, sticky=EW, padx=2, pady=2)
+    bin_hours_entry = ttk.Entry(input_frame, width=75)
+    bin_hours_entry.grid(row=3, column=1, sticky=EW, padx=2, pady=2)
+
+    config_file_label = ttk.Label(input_frame, text="Config File:")
+    config_file_label.grid(row=4, column=0, sticky=EW, padx=2, pady=2)
+    btn_browse_config = ttk.Button(input_frame, text="Browse", width=10, command=browse_config_file)
+    btn_browse_config.grid(row=4, column=2, sticky=EW, padx=2, pady= 2)
+    config_file_entry = ttk.Entry(input_frame, width=75)
+    config_file_entry.grid(row=4, column=1, sticky=EW, padx=2, pady=2)
+
+    label_id = ttk.Label(input_frame, text="ID:")
+    label_id.grid(row=5, column=0, sticky=EW, padx=2, pady=2)
+    entry_id = ttk.Entry(input_frame, width=75)
+    entry_id.grid(row=5, column=1, sticky=EW, padx=2, pady=2)
+
+    label_group_label = ttk.Label(input_frame, text="Group Label:")
+    label_group_label.grid(row=6, column=0, sticky=EW, padx=2, pady=2)
+    entry_group_label = ttk.Entry(input_frame, width=75)
+    entry_group_label.grid(row=6, column=1, sticky=EW, padx=2, pady=2)
+
+    # Add "Add Label" button
+    btn_add_config = ttk.Button(input_frame, text="Add Label",
+                                command=lambda: save_configuration(entry_id.get(), entry_group_label.get(),
+                                                                   directory_path_entry.get()))
+    btn_add_config.grid(row=7, column=1, padx=2, pady=2)
+
+    output_text = ttk.Text(input_frame, wrap=tk.WORD, width=100, height=20)
+    output_text.grid(row=8, column=0, columnspan=3, padx=10, pady=10)
+
+    save_intermediates_var = tk.BooleanVar(value=True)
+    save_intermediates_check = ttk.Checkbutton(input_frame, text="Save intermediate files (cleaned, trimmed and binned)",
+                                               variable=save_intermediates_var)
+    save_intermediates_check.grid(row=9, column=0, columnspan=3, padx=10, pady=2)
+
+    use_cache_var = tk.BooleanVar(value=False)
+    use_cache_check = ttk.Checkbutton(input_frame, text="Reuse cached results from previous runs",
+                                      variable=use_cache_var)
+    use_cache_check.grid(row=10, column=0, columnspan=2, padx=10, pady=2)
+    clear_cache_button = ttk.Button(input_frame, text="Clear Cache",
+                                    command=lambda: clear_cached_results(directory_path_entry.get()))
+    clear_cache_button.grid(row=10, column=2, padx=10, pady=2)
+
+    progress_bar = ttk.Progressbar(input_frame, mode="determinate")
+    progress_bar.grid(row=11, column=0, columnspan=3, sticky=EW, padx=10, pady=2)
+    progress_label = ttk.Label(input_frame, text="")
+    progress_label.grid(row=12, column=0, columnspan=3, padx=10, pady=2)
+
+    start_button = ttk.Button(input_frame, text="Start Processing", command=main_process_clams_data)
+    start_button.grid(row=13, column=0, columnspan=2, padx=10, pady=10)
+    cancel_button = ttk.Button(input_frame, text="Cancel", command=cancel_processing, state=DISABLED,
+                               bootstyle=DANGER)
+    cancel_button.grid(row=13, column=2, padx=10, pady=10)
+
+    # Set weights for rescaling window
+    main_frame.grid_rowconfigure(0, weight=1)
+    main_frame.grid_columnconfigure(0, weight=1)
+    main_frame.grid_columnconfigure(1, weight=3)
+
+    instructions_frame.grid_rowconfigure(0, weight=1)
+    instructions_frame.grid_columnconfigure(0, weight=1)
+
+    input_frame.grid_rowconfigure(0, weight=1)
+    input_frame.grid_rowconfigure(1, weight=1)
+    input_frame.grid_rowconfigure(2, weight=1)
+    input_frame.grid_rowconfigure(3, weight=1)
+    input_frame.grid_rowconfigure(4, weight=1)
+    input_frame.grid_rowconfigure(5, weight=3)
+    input_frame.grid_columnconfigure(0, weight=1)
+
+    # Create a footer frame for the credits
+    footer_frame = ttk.Frame(root)
+    footer_frame.pack(fill=tk.X, side=tk.BOTTOM, pady=5)
+
+    # Add credits text
+    credits_text = (f"{VERSION} Developed by the Pistilli Lab. Credits: Alan Mizener, Stuart Clayton, Lauren Rentz. "
+                    f"Visit github.com/PistilliLab")
+    credits_label = ttk.Label(footer_frame, text=credits_text, state="readonly")
+    credits_label.pack(side=tk.LEFT, padx=10)
+
+    # Add Exit button
+    exit_button = ttk.Button(footer_frame, text="Exit", command=root.quit, bootstyle=DANGER)
+    exit_button.pack(side=tk.RIGHT, padx=10)
+
+    # Add "Check for Updates" button
+    update_button = ttk.Button(footer_frame, text="Check for Updates", command=check_for_update)
+    update_button.pack(side=tk.RIGHT, padx=10)
+
+    # Drain the worker thread's output and progress events on a timer
+    root.after(100, process_event_queue)
+
+    # Show the window before anything slow happens, then load the processing modules and check for updates in the
+    # background
+    root.update()
+    report_startup("window_shown")
+    warm_up_processing_modules()
+    if startup_update_check_enabled():
+        check_for_update(interactive=False)
+    else:
+        # The check is turned off, so there is nothing to wait for
+        report_startup("update_checked")
+
+    root.mainloop()
@@ -0,0 +1,190 @@
+"""Save the binned and combined data of a run to a single SQLite database and query it as DataFrames.
+
+The results store holds a "binned" table with every binned column of every subject, a "combined" table with the
+combined columns and LED LIGHTNESS, and a "run_metadata" table with the settings of the run. Both data tables are
+indexed on the columns cohort-wide questions select on, so e.g. the dark phase bins of one group on days 2 to 4 are
+found without reading the .csv files of every variable. Only the standard library sqlite3 module is needed.
+
+Example:
+    query_results("Combined_CLAMS_data/clams_results.sqlite", ["VO2", "RER"], groups=["WT"], days=range(2, 5),
+                  light=False)
+"""
+import json
+import os
+import pathlib
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+# File name of the results store in the "Combined_CLAMS_data" directory
+RESULTS_STORE_FILE = "clams_results.sqlite"
+
+# Tables of binned data in the results store
+RESULTS_STORE_TABLES = ["binned", "combined"]
+
+# Columns the tables of the results store are indexed on, and returned by every query
+RESULTS_STORE_INDEX_COLUMNS = ['ID', 'GROUP LABEL', 'DAY', 'HOUR', '24 HOUR', 'LED LIGHTNESS']
+
+# Format datetimes are stored in, which sorts the same as the datetimes
+RESULTS_STORE_DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def quote_identifier(name):
+    """Quote a column or table name for SQL, as the CLAMS column names contain spaces."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def sqlite_column_type(column):
+    """Return the SQLite type a DataFrame column is stored as."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        column = column.cat.categories
+    if pd.api.types.is_bool_dtype(column.dtype) or pd.api.types.is_integer_dtype(column.dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(column.dtype):
+        return "REAL"
+    if pd.api.types.is_object_dtype(column.dtype):
+        # Columns combined from subjects with different categories hold plain Python values
+        inferred_type = pd.api.types.infer_dtype(column, skipna=True)
+        if inferred_type == "integer":
+            return "INTEGER"
+        if inferred_type in ("floating", "mixed-integer-float"):
+            return "REAL"
+    return "TEXT"
+
+
+def table_rows(df):
+    """Return the rows of a DataFrame as tuples of Python values that sqlite3 can insert.
+
+    Datetimes are stored as text in RESULTS_STORE_DATE_TIME_FORMAT, categories as their values and missing values as
+    NULL.
+    """
+    columns = {}
+    for name, column in df.items():
+        if pd.api.types.is_datetime64_any_dtype(column.dtype):
+            column = column.dt.strftime(RESULTS_STORE_DATE_TIME_FORMAT)
+        elif isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype(column.cat.categories.dtype)
+        columns[name] = column.astype(object).where(column.notna(), None)
+    return zip(*columns.values())
+
+
+def write_results_store(database_path, tables, metadata=None, index_columns=RESULTS_STORE_INDEX_COLUMNS):
+    """Save DataFrames as the indexed tables of a new results store, replacing any previous one.
+
+    The database is built in a temporary file next to database_path with all rows inserted in one transaction, and
+    only replaces the previous results store once it is complete.
+
+    Parameters:
+    database_path (string): path of the SQLite database
+    tables (dict): DataFrames by table name
+    metadata (dict): settings of the run saved to the "run_metadata" table; values must be JSON serializable
+    index_columns (list): columns each table is indexed on, where present
+    """
+    temporary_path = f"{database_path}.{os.getpid()}.partial"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+    try:
+        # The temporary file is only used once complete, so the journal and syncing to disk can be skipped
+        with closing(sqlite3.connect(temporary_path, isolation_level=None)) as connection:
+            connection.execute("PRAGMA journal_mode = OFF")
+            connection.execute("PRAGMA synchronous = OFF")
+            connection.execute("BEGIN")
+            for table, df in tables.items():
+                column_definitions = ", ".join(f"{quote_identifier(name)} {sqlite_column_type(column)}"
+                                               for name, column in df.items())
+                connection.execute(f"CREATE TABLE {quote_identifier(table)} ({column_definitions})")
+                placeholders = ", ".join("?" * len(df.columns))
+                connection.executemany(f"INSERT INTO {quote_identifier(table)} VALUES ({placeholders})",
+                                       table_rows(df))
+
+                # Index after inserting, which is faster than updating the indexes row by row
+                for column in index_columns:
+                    if column in df.columns:
+                        connection.execute(f"CREATE INDEX {quote_identifier(f'{table}_{column}')} "
+                                           f"ON {quote_identifier(table)} ({quote_identifier(column)})")
+
+            connection.execute("CREATE TABLE run_metadata (key TEXT PRIMARY KEY, value TEXT)")
+            connection.executemany("INSERT INTO run_metadata VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in (metadata or {}).items()])
+            connection.execute("COMMIT")
+        os.replace(temporary_path, database_path)
+    finally:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+
+
+def connect_results_store(database_path):
+    """Open a results store read-only.
+
+    Raises:
+    FileNotFoundError if there is no results store at database_path.
+    """
+    if not os.path.isfile(database_path):
+        raise FileNotFoundError(f"No results store at {database_path}")
+    return sqlite3.connect(f"{pathlib.Path(os.path.abspath(database_path)).as_uri()}?mode=ro", uri=True)
+
+
+def query_results(database_path, variables=None, table="combined", ids=None, groups=None, days=None, hours=None,
+                  hours_24=None, light=None):
+    """Return the rows of a results store table that match all given filters.
+
+    Each filter is a single value or a list of values to keep; filters left as None select everything.
+
+    Parameters:
+    database_path (string): path of the results store
+    variables (list): columns to return besides the index columns, or None for all columns
+    table (string): "combined" for the combined columns, or "binned" for every binned column
+    ids (int or list): subject IDs
+    groups (string or list): GROUP LABEL values
+    days (int, list or range): DAY values, e.g. range(2, 5) for days 2 to 4
+    hours (int, list or range): HOUR values, counted from the start of the kept data
+    hours_24 (int, list or range): 24 HOUR values, the hour of the day
+    light (bool): True for the light phase bins (LED LIGHTNESS above 0), False for the dark phase bins
+
+    Returns:
+    DataFrame of the index columns and variables, sorted by ID and HOUR.
+
+    Raises:
+    ValueError if the table or a variable is not in the results store.
+    """
+    if table not in RESULTS_STORE_TABLES:
+        raise ValueError(f"Table must be one of: {', '.join(RESULTS_STORE_TABLES)}")
+
+    with closing(connect_results_store(database_path)) as connection:
+        table_columns = [row[1] for row in connection.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+        # Select the index columns followed by the requested variables
+        index_columns = [column for column in RESULTS_STORE_INDEX_COLUMNS if column in table_columns]
+        if variables is None:
+            variables = [column for column in table_columns if column not in index_columns]
+        unknown_variables = [variable for variable in variables if variable not in table_columns]
+        if unknown_variables:
+            raise ValueError(f"Not in the {table} table: {', '.join(unknown_variables)}")
+        selected_columns = index_columns + [variable for variable in variables if variable not in index_columns]
+
+        # Keep the rows matching every filter
+        conditions = []
+        parameters = []
+        for column, values in (("ID", ids), ("GROUP LABEL", groups), ("DAY", days), ("HOUR", hours),
+                               ("24 HOUR", hours_24)):
+            if values is None:
+                continue
+            values = [values] if pd.api.types.is_scalar(values) else list(values)
+            # sqlite3 only binds Python numbers, not NumPy ones, e.g. IDs taken from a query result
+            values = [value.item() if hasattr(value, "item") else value for value in values]
+            conditions.append(f"{quote_identifier(column)} IN ({', '.join('?' * len(values))})")
+            parameters.extend(values)
+        if light is not None:
+            conditions.append(f'"LED LIGHTNESS" {">" if light else "="} 0')
+
+        query = (f"SELECT {', '.join(map(quote_identifier, selected_columns))} FROM {quote_identifier(table)}"
+                 + (f" WHERE {' AND '.join(conditions)}" if conditions else "") + ' ORDER BY "ID", "HOUR"')
+        return pd.read_sql_query(query, connection, params=parameters)
+
+
+def read_run_metadata(database_path):
+    """Return the settings of the run saved in a results store as a dictionary."""
+    with closing(connect_results_store(database_path)) as connection:
+        return {key: json.loads(value) for key, value in connection.execute("SELECT key, value FROM run_metadata")}
@@ -0,0 +1,152 @@
+"""Measure the cold-start time of the GUI against a local stand-in for the GitHub release API.
+
+Each run starts the GUI in a new process with --measure-startup and an empty update cache, and times the startup
+milestones it prints: the window being shown, the update check finishing and the processing modules being loaded.
+The update check is answered by a local HTTP server after a configurable delay, so a slow network can be simulated
+without contacting GitHub. A run fails the budget if the window takes longer than the budget to appear, or waits for
+the update check.
+
+Example:
+    python startup_benchmark.py --runs 5 --delay 3 --budget 3
+    python startup_benchmark.py --command dist/CLAMSwrangler.exe
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from version import VERSION
+
+# Seconds the window may take to appear after the program is started
+STARTUP_BUDGET_SECONDS = 3.0
+
+# Milestones printed by main.py --measure-startup, in the order they are expected
+STARTUP_MILESTONES = ["window_shown", "processing_ready", "update_checked"]
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    """Answer every request with a release of the running version after the delay of the server."""
+
+    def do_GET(self):
+        time.sleep(self.server.delay)
+        body = json.dumps({"tag_name": self.server.tag_name,
+                           "html_url": "https://github.com/PistilliLab/CLAMSwrangler/releases"}).encode()
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # The client gave up waiting
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_release_server(delay=0.0, tag_name=VERSION):
+    """Start a local stand-in for the GitHub release API on a free port.
+
+    Returns:
+    The running server; its URL is f"http://127.0.0.1:{server.server_port}/".
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ReleaseHandler)
+    server.daemon_threads = True
+    server.delay = delay
+    server.tag_name = tag_name
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def measure_startup(command, url, timeout=60):
+    """Start the GUI once with an empty update cache and time the startup milestones it prints.
+
+    Parameters:
+    command (list): command that starts the GUI, to which --measure-startup is added
+    url (string): release URL the update check is pointed at
+    timeout (float): seconds to wait for the GUI to close by itself
+
+    Returns:
+    Dictionary of the seconds from starting the process until each milestone; missing milestones were not reached.
+    """
+    with tempfile.TemporaryDirectory() as home_directory:
+        # A new home directory starts without a cached update check
+        environment = dict(os.environ, CLAMS_WRANGLER_UPDATE_URL=url, HOME=home_directory,
+                           USERPROFILE=home_directory)
+        start_time = time.perf_counter()
+        process = subprocess.Popen(command + ["--measure-startup"], stdout=subprocess.PIPE, text=True,
+                                   env=environment, cwd=os.path.dirname(os.path.abspath(__file__)))
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        milestones = {}
+        try:
+            for line in process.stdout:
+                if line.startswith("STARTUP "):
+                    milestones[line.split()[1]] = time.perf_counter() - start_time
+            process.wait()
+        finally:
+            timer.cancel()
+    return milestones
+
+
+def run_startup_benchmark(command, runs=3, delay=2.0, budget=STARTUP_BUDGET_SECONDS):
+    """Measure the startup of the GUI several times against a release server that answers after the delay.
+
+    Returns:
+    Tuple of the milestones of each run and a list of the reasons the budget was not met, empty if it was.
+    """
+    server = start_release_server(delay)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/"
+        results = [measure_startup(command, url) for _ in range(runs)]
+    finally:
+        server.shutdown()
+
+    failures = []
+    for run, milestones in enumerate(results, start=1):
+        missing = [milestone for milestone in STARTUP_MILESTONES if milestone not in milestones]
+        if missing:
+            failures.append(f"run {run} did not reach {', '.join(missing)}")
+            continue
+        if milestones["window_shown"] > budget:
+            failures.append(f"run {run} showed the window after {milestones['window_shown']:.2f} s")
+        if milestones["window_shown"] >= milestones["update_checked"]:
+            failures.append(f"run {run} waited for the update check before showing the window")
+    return results, failures
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the cold-start time of the CLAMS Wrangler GUI.")
+    parser.add_argument("--runs", type=int, default=3, help="number of startups to measure (default: 3)")
+    parser.add_argument("--delay", type=float, default=2.0,
+                        help="seconds the stand-in release server waits before answering (default: 2)")
+    parser.add_argument("--budget", type=float, default=STARTUP_BUDGET_SECONDS,
+                        help=f"seconds the window may take to appear (default: {STARTUP_BUDGET_SECONDS:g})")
+    parser.add_argument("--command", nargs="+", default=[sys.executable, "main.py"],
+                        help="command that starts the GUI, e.g. a frozen executable (default: python main.py)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    results, failures = run_startup_benchmark(args.command, runs=args.runs, delay=args.delay, budget=args.budget)
+
+    for milestone in STARTUP_MILESTONES:
+        seconds = [milestones[milestone] for milestones in results if milestone in milestones]
+        if seconds:
+            print(f"{milestone}: median {statistics.median(seconds):.3f} s, max {max(seconds):.3f} s")
+    for failure in failures:
+        print(f"Over budget: {failure}")
+    print("Startup within budget" if not failures else "Startup over budget")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
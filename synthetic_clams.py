@@ -0,0 +1,193 @@
+"""Generate synthetic raw CLAMS data files for testing and benchmarking without real animal data.
+
+The files follow the layout of Oxymax/CLAMS .csv exports: a 22 line metadata block with the "Subject ID", the data
+header, the 2 formatting rows and one row per sample with a light/dark schedule in "LED LIGHTNESS" and running
+accumulator columns.
+
+Example:
+    python synthetic_clams.py path/to/data --cages 16 --hours 72 --interval-minutes 1
+"""
+import argparse
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Data columns of a raw CLAMS export, in order
+RAW_DATA_COLUMNS = ["INTERVAL", "CHAN", "DATE/TIME", "VO2", "O2IN", "O2OUT", "DO2", "ACCO2", "VCO2", "CO2IN", "CO2OUT",
+                    "DCO2", "ACCCO2", "RER", "HEAT", "FLOW", "STATUS1", "PRESSURE", "FEED1", "FEED1 ACC", "XTOT",
+                    "XAMB", "YTOT", "YAMB", "WHEEL", "WHEEL ACC", "ENCLOSURE TEMP", "ENCLOSURE SETPOINT",
+                    "LED LIGHTNESS", "LED HUE", "LED SATURATION"]
+
+# Number of lines above the data header, including the ":DATA" marker
+METADATA_LINES = 22
+
+# Format of the DATE/TIME column
+DATE_TIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+
+def generate_clams_dataframe(chamber, hours, interval_minutes, start_time, jitter_seconds=20, extra_columns=0,
+                             light_on_hour=6, light_hours=12, seed=0):
+    """Generate the data section of a raw CLAMS data file for a single subject.
+
+    Parameters:
+    chamber (int): chamber number saved in the CHAN column
+    hours (float): length of the recording in hours
+    interval_minutes (float): time between samples in minutes
+    start_time (datetime): time of the first sample
+    jitter_seconds (int): up to this many seconds are added at random to each sampling interval
+    extra_columns (int): number of additional "AUX<n>" columns, to scale the column count
+    light_on_hour (int): hour of the day the lights turn on
+    light_hours (int): number of hours the lights stay on
+    seed (int): seed of the random values, so the same arguments always give the same data
+
+    Returns:
+    DataFrame with the RAW_DATA_COLUMNS followed by the extra columns, with DATE/TIME formatted as in the exports.
+    """
+    rng = np.random.default_rng(seed)
+    samples = int(hours * 60 / interval_minutes)
+
+    # Sample times, with a random delay added to each interval
+    intervals = np.full(samples, interval_minutes * 60.0)
+    intervals[0] = 0
+    if jitter_seconds:
+        intervals[1:] += rng.integers(0, jitter_seconds + 1, samples - 1)
+    timestamps = pd.Timestamp(start_time) + pd.to_timedelta(np.cumsum(intervals), unit='s')
+
+    # Lights are on from light_on_hour for light_hours every day
+    hour_of_day = (timestamps.hour + timestamps.minute / 60 - light_on_hour) % 24
+    led_lightness = np.where(hour_of_day < light_hours, 100, 0)
+    dark = led_lightness == 0
+
+    # Animals are more active and use more oxygen in the dark
+    vo2 = rng.normal(3000, 150, samples) + 400 * dark
+    vco2 = vo2 * rng.uniform(0.75, 0.95, samples)
+    feed = np.round(rng.exponential(0.02, samples) * (1 + 2 * dark), 2)
+    wheel = rng.poisson(5 + 30 * dark)
+    x_amb = rng.poisson(40 + 120 * dark)
+    y_amb = rng.poisson(30 + 90 * dark)
+
+    data = {
+        "INTERVAL": np.arange(1, samples + 1),
+        "CHAN": chamber,
+        "DATE/TIME": timestamps.strftime(DATE_TIME_FORMAT),
+        "VO2": np.round(vo2, 1),
+        "O2IN": 20.9,
+        "O2OUT": np.round(20.9 - vo2 / 7500, 3),
+        "DO2": np.round(vo2 / 7500, 3),
+        "ACCO2": np.round(np.cumsum(vo2) / 1000, 2),
+        "VCO2": np.round(vco2, 1),
+        "CO2IN": 0.05,
+        "CO2OUT": np.round(0.05 + vco2 / 7500, 3),
+        "DCO2": np.round(vco2 / 7500, 3),
+        "ACCCO2": np.round(np.cumsum(vco2) / 1000, 2),
+        "RER": np.round(vco2 / vo2, 3),
+        "HEAT": np.round((3.815 + 1.232 * vco2 / vo2) * vo2 / 20000, 3),
+        "FLOW": 0.5,
+        "STATUS1": 0,
+        "PRESSURE": np.round(rng.normal(760, 0.5, samples), 1),
+        "FEED1": feed,
+        "FEED1 ACC": np.round(np.cumsum(feed), 2),
+        "XTOT": x_amb + rng.poisson(20, samples),
+        "XAMB": x_amb,
+        "YTOT": y_amb + rng.poisson(15, samples),
+        "YAMB": y_amb,
+        "WHEEL": wheel,
+        "WHEEL ACC": np.cumsum(wheel),
+        "ENCLOSURE TEMP": np.round(rng.normal(22, 0.1, samples), 1),
+        "ENCLOSURE SETPOINT": 22.0,
+        "LED LIGHTNESS": led_lightness,
+        "LED HUE": 0,
+        "LED SATURATION": 0,
+    }
+    for column_number in range(1, extra_columns + 1):
+        data[f"AUX{column_number}"] = np.round(rng.normal(0, 1, samples), 3)
+
+    return pd.DataFrame(data)
+
+
+def write_raw_clams_file(file_path, df, subject_id, chamber, subject_mass=25.0):
+    """Save the data section of a subject with the metadata block and formatting rows of a raw CLAMS export."""
+    start_time = datetime.strptime(df["DATE/TIME"].iloc[0], DATE_TIME_FORMAT) if len(df) else datetime.now()
+    metadata = [
+        "Oxymax Windows V 5.66 Data File",
+        "Experiment File,Synthetic.cdta",
+        f"Subject ID,{subject_id}",
+        f"Subject Mass,{subject_mass:.1f}",
+        f"Chamber,{chamber}",
+        f"Start Time,{start_time.strftime(DATE_TIME_FORMAT)}",
+        f"Number of Columns,{len(df.columns)}",
+    ]
+    # Pad the metadata block to the length of a real export, ending with the ":DATA" marker
+    metadata += [f"Comment {line_number}," for line_number in range(1, METADATA_LINES - len(metadata))] + [":DATA"]
+    units_row = ",".join([""] * 3 + ["(units)"] * (len(df.columns) - 3))
+    separator_row = ",".join(["====="] * len(df.columns))
+
+    with open(file_path, 'w', newline='') as f:
+        f.write("\n".join(metadata + [",".join(df.columns), units_row, separator_row]) + "\n")
+        df.to_csv(f, header=False, index=False, lineterminator="\n")
+
+
+def generate_clams_dataset(directory_path, cages=4, hours=72, interval_minutes=13, jitter_seconds=20, extra_columns=0,
+                           start_time=datetime(2024, 1, 1, 9, 0), seed=0):
+    """Write one raw CLAMS data file per cage and an experiment configuration file to the provided directory.
+
+    Cages are numbered from 1 and subject IDs from 101; odd cages are labelled group "A" and even cages group "B" in
+    "config/experiment_config.csv".
+
+    Parameters:
+    directory_path (string): directory to save the files to, created if needed
+    cages (int): number of cages, one file each
+    hours (float): length of each recording in hours
+    interval_minutes (float): time between samples in minutes
+    jitter_seconds (int): up to this many seconds are added at random to each sampling interval
+    extra_columns (int): number of additional columns in each file
+    start_time (datetime): time of the first sample of the first cage; later cages start a minute apart
+    seed (int): seed of the random values
+
+    Returns:
+    Total number of data rows written.
+    """
+    os.makedirs(directory_path, exist_ok=True)
+    total_rows = 0
+    for chamber in range(1, cages + 1):
+        subject_id = 100 + chamber
+        df = generate_clams_dataframe(chamber, hours, interval_minutes, start_time + pd.Timedelta(minutes=chamber - 1),
+                                      jitter_seconds=jitter_seconds, extra_columns=extra_columns, seed=seed + chamber)
+        write_raw_clams_file(os.path.join(directory_path, f"Cage{chamber:03d}.csv"), df, subject_id, chamber)
+        total_rows += len(df)
+
+    config_directory = os.path.join(directory_path, "config")
+    os.makedirs(config_directory, exist_ok=True)
+    config_df = pd.DataFrame({"ID": [100 + chamber for chamber in range(1, cages + 1)],
+                              "GROUP LABEL": ["A" if chamber % 2 else "B" for chamber in range(1, cages + 1)]})
+    config_df.to_csv(os.path.join(config_directory, "experiment_config.csv"), index=False)
+
+    return total_rows
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic raw CLAMS data files.")
+    parser.add_argument("directory", help="directory to save the files to")
+    parser.add_argument("--cages", type=int, default=4, help="number of cages (default: 4)")
+    parser.add_argument("--hours", type=float, default=72, help="length of each recording in hours (default: 72)")
+    parser.add_argument("--interval-minutes", type=float, default=13,
+                        help="time between samples in minutes (default: 13)")
+    parser.add_argument("--jitter-seconds", type=int, default=20,
+                        help="maximum random delay added to each sampling interval (default: 20)")
+    parser.add_argument("--extra-columns", type=int, default=0, help="number of additional columns (default: 0)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random values (default: 0)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_arguments(argv)
+    rows = generate_clams_dataset(args.directory, cages=args.cages, hours=args.hours,
+                                  interval_minutes=args.interval_minutes, jitter_seconds=args.jitter_seconds,
+                                  extra_columns=args.extra_columns, seed=args.seed)
+    print(f"Wrote {args.cages} CLAMS data files with {rows} rows to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
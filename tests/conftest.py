@@ -0,0 +1,54 @@
+import os
+import shutil
+import sys
+from datetime import datetime
+
+import pytest
+
+# The modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clams_processing import trim_clams_dataframe  # noqa: E402
+from synthetic_clams import generate_clams_dataframe, generate_clams_dataset  # noqa: E402
+
+# Number of cages of the synthetic datasets processed by whole runs
+CAGES = 3
+
+
+def trimmed_subject(interval_minutes, jitter_seconds, hours=96, trim_hours=6, keep_hours=72):
+    """Generate the raw data of one subject and trim it, starting in the evening so the first change is to light."""
+    raw_df = generate_clams_dataframe(1, hours, interval_minutes, datetime(2024, 1, 1, 18, 4),
+                                      jitter_seconds=jitter_seconds)
+    return trim_clams_dataframe(raw_df, trim_hours, keep_hours, False)
+
+
+@pytest.fixture
+def uneven_trimmed_df():
+    """Trimmed data sampled every 13 minutes plus up to 20 seconds, so no bin size holds a whole number of samples."""
+    return trimmed_subject(13, 20)
+
+
+@pytest.fixture
+def even_trimmed_df():
+    """Trimmed data sampled exactly every 5 minutes, so every bin size holds a whole number of samples."""
+    return trimmed_subject(5, 0)
+
+
+@pytest.fixture
+def dataset_directory(tmp_path):
+    """Directory with the raw files of a few 60 hour recordings and their experiment configuration file."""
+    directory = tmp_path / "experiment"
+    generate_clams_dataset(directory, cages=CAGES, hours=60)
+    return directory
+
+
+def copy_dataset(dataset_directory, tmp_path, name):
+    """Copy the raw files and configuration of a dataset to a new directory, so each run saves its own outputs."""
+    directory = tmp_path / name
+    shutil.copytree(dataset_directory, directory)
+    return str(directory)
+
+
+def sorted_combined_data(results):
+    """Return the combined data of a run in subject and bin order, which does not depend on the order of the files."""
+    return results["combined_data"].sort_values(["ID", "DAY", "HOUR"]).reset_index(drop=True)
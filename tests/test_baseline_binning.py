@@ -0,0 +1,72 @@
+import os
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from clams_processing import bin_clams_data
+from conftest import trimmed_subject
+
+
+def bin_by_timestamp_loop(file_path, bin_hours):
+    """Bin a trimmed file with the per-timestamp loop bin_clams_data used before bin labelling was vectorized."""
+    df = pd.read_csv(file_path)
+    df['DATE/TIME'] = pd.to_datetime(df['DATE/TIME'])
+    df = df.drop(columns=["STATUS1", "O2IN", "O2OUT", "DO2", "CO2IN", "CO2OUT", "DCO2", "XTOT", "YTOT", "LED HUE",
+                          "LED SATURATION", "BIN"], errors='ignore')
+    df['AMB'] = df['XAMB'] + df['YAMB']
+    df['AMB ACC'] = df['AMB'].cumsum()
+
+    df['BIN'] = np.nan
+    for led_value in df['LED LIGHTNESS'].unique():
+        subset = df[df['LED LIGHTNESS'] == led_value].copy()
+        start_time = subset['DATE/TIME'].iloc[0]
+        bin_label = 0
+        bin_labels = []
+        for timestamp in subset['DATE/TIME']:
+            if (timestamp - start_time) >= timedelta(hours=bin_hours):
+                bin_label += 1
+                start_time = timestamp
+            bin_labels.append(bin_label)
+        df.loc[subset.index, 'BIN'] = bin_labels
+
+    last_val_columns = ["INTERVAL", "CHAN", "DATE/TIME", "ACCO2", "ACCCO2", "FEED1 ACC", "WHEEL ACC", "AMB ACC"]
+    sum_columns = ["WHEEL", "FEED1", "AMB"]
+    avg_columns = df.columns.difference(last_val_columns + sum_columns + ['BIN', 'LED LIGHTNESS'])
+    groups = df.groupby(['LED LIGHTNESS', 'BIN'])
+    df_binned = groups.agg({**{col: 'last' for col in last_val_columns}, **{col: 'mean' for col in avg_columns},
+                            **{col: 'sum' for col in sum_columns}}).reset_index()
+    for name, column, aggregation in (('DATE/TIME_start', 'DATE/TIME', 'first'), ('DATE/TIME_end', 'DATE/TIME', 'last'),
+                                      ('INTERVAL_start', 'INTERVAL', 'first'), ('INTERVAL_end', 'INTERVAL', 'last')):
+        df_binned = pd.merge(df_binned, groups[column].agg(aggregation).reset_index(name=name),
+                             on=['LED LIGHTNESS', 'BIN'])
+
+    df_binned['DURATION'] = (df_binned['DATE/TIME_end'] - df_binned['DATE/TIME_start']).dt.total_seconds() / 3600
+    df_binned = df_binned[df_binned['DURATION'] != 0]
+    df_binned = df_binned.sort_values(by='INTERVAL_start')
+    df_binned['DAY'] = (df_binned['BIN'] // (12 / bin_hours) + 1).astype(int)
+    df_binned.reset_index(drop=True, inplace=True)
+    df_binned['HOUR'] = df_binned.index
+    df_binned['24 HOUR'] = df_binned['HOUR'] % (24 // bin_hours)
+    df_binned['HOUR'] = (df_binned['HOUR'] + 1) * bin_hours
+    df_binned['24 HOUR'] = (df_binned['24 HOUR'] + 1) * bin_hours
+    df_binned = df_binned[["CHAN", "INTERVAL_start", "INTERVAL_end", "DATE/TIME_start", "DATE/TIME_end", "DURATION",
+                           "VO2", "ACCO2", "VCO2", "ACCCO2", "RER", "HEAT", "FLOW", "PRESSURE", "FEED1", "FEED1 ACC",
+                           "AMB", "AMB ACC", "WHEEL", "WHEEL ACC", "ENCLOSURE TEMP", "ENCLOSURE SETPOINT",
+                           "LED LIGHTNESS", "DAY", "HOUR", "24 HOUR"]]
+    return df_binned.round(4).to_csv(index=False)
+
+
+@pytest.mark.parametrize("interval_minutes, jitter_seconds", [(5, 0), (13, 20)])
+@pytest.mark.parametrize("bin_hours", [1, 3, 12])
+def test_binned_files_match_the_timestamp_loop(tmp_path, interval_minutes, jitter_seconds, bin_hours):
+    trimmed_directory = tmp_path / "Trimmed_CLAMS_data"
+    os.makedirs(trimmed_directory)
+    trimmed_file = str(trimmed_directory / "Cage001_ID101_trimmed.csv")
+    trimmed_subject(interval_minutes, jitter_seconds).to_csv(trimmed_file, index=False)
+
+    bin_clams_data(trimmed_file, bin_hours)
+    binned_file = tmp_path / "Binned_CLAMS_data" / f"Cage001_ID101_trimmed_{bin_hours}hour_bins.csv"
+    with open(binned_file, newline='') as f:
+        assert f.read() == bin_by_timestamp_loop(trimmed_file, bin_hours)
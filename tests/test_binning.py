@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from clams_processing import (bin_clams_dataframe, bin_clams_dataframe_multiresolution, bin_resampled_dataframe,
+                              find_sample_gaps, resample_clams_dataframe)
+
+
+@pytest.mark.parametrize("bin_sizes", [[1, 3, 12], [2, 6], [1, 12]])
+def test_multiresolution_matches_direct_binning_on_even_samples(even_trimmed_df, bin_sizes):
+    binned = bin_clams_dataframe_multiresolution(even_trimmed_df, bin_sizes)
+    for size in bin_sizes:
+        pd.testing.assert_frame_equal(binned[size], bin_clams_dataframe(even_trimmed_df, size))
+
+
+def test_multiresolution_merges_bins_within_light_phases(uneven_trimmed_df):
+    binned = bin_clams_dataframe_multiresolution(uneven_trimmed_df, [1, 3, 12])
+
+    # A 12 hour phase holds a single bin, whatever the finer bins were
+    pd.testing.assert_frame_equal(binned[12], bin_clams_dataframe(uneven_trimmed_df, 12))
+
+    direct = bin_clams_dataframe(uneven_trimmed_df, 3)
+    assert len(binned[3]) == len(direct)
+    assert binned[3]['DURATION'].max() < 3.5
+    assert (binned[3]['LED LIGHTNESS'].to_numpy() == direct['LED LIGHTNESS'].to_numpy()).all()
+    for size in (1, 3, 12):
+        assert binned[size]['WHEEL'].sum() == uneven_trimmed_df['WHEEL'].sum()
+
+
+@pytest.mark.parametrize("bin_hours", [1, 3, 12])
+def test_resampled_binning_matches_direct_binning_on_even_samples(even_trimmed_df, bin_hours):
+    resampled_df = resample_clams_dataframe(even_trimmed_df)
+    assert not resampled_df['MISSING'].any()
+    pd.testing.assert_frame_equal(bin_resampled_dataframe(resampled_df, bin_hours),
+                                  bin_clams_dataframe(even_trimmed_df, bin_hours))
+
+
+@pytest.mark.parametrize("bin_hours", [1, 3, 12])
+def test_resampled_bins_never_mix_light_levels(uneven_trimmed_df, bin_hours):
+    binned = bin_resampled_dataframe(resample_clams_dataframe(uneven_trimmed_df), bin_hours)
+    direct = bin_clams_dataframe(uneven_trimmed_df, bin_hours)
+    pd.testing.assert_series_equal(binned.groupby('LED LIGHTNESS')['WHEEL'].sum(),
+                                   direct.groupby('LED LIGHTNESS')['WHEEL'].sum())
+
+
+def test_resampling_finds_gaps_and_keeps_empty_bins(even_trimmed_df):
+    # Drop 2 hours of samples within the first light phase and a single sample in the first dark phase
+    gapped_df = even_trimmed_df.drop(index=list(range(24, 48)) + [200]).reset_index(drop=True)
+    resampled_df = resample_clams_dataframe(gapped_df)
+
+    gaps = find_sample_gaps(resampled_df)
+    assert gaps['MISSING SAMPLES'].tolist() == [24, 1]
+    assert len(resampled_df) == len(even_trimmed_df)
+
+    binned = bin_resampled_dataframe(resampled_df, 1)
+    direct = bin_clams_dataframe(even_trimmed_df, 1)
+    assert binned['VO2'].isna().sum() == 2
+    assert binned['HOUR'].tolist() == direct['HOUR'].tolist()
+    assert binned['LED LIGHTNESS'].tolist() == direct['LED LIGHTNESS'].tolist()
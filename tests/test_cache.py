@@ -0,0 +1,74 @@
+import os
+
+import pandas as pd
+import pytest
+
+from clams_processing import clams_stage_cache_keys, clear_clams_cache, run_pipeline
+from conftest import copy_dataset, sorted_combined_data
+
+
+def cached_stages(results):
+    """Return the stages each file of a run read from the cache."""
+    return {file_metrics["file"]: {stage for stage, metrics in file_metrics["stages"].items() if metrics["cached"]}
+            for file_metrics in results["metrics"]["files"]}
+
+
+@pytest.fixture
+def raw_file(dataset_directory):
+    return os.path.join(dataset_directory, "Cage001.csv")
+
+
+def test_changed_bin_hours_reuse_the_cleaned_and_trimmed_keys(raw_file):
+    keys = clams_stage_cache_keys(raw_file, 2, 48, 3, False)
+    for bin_hours in (1, [1, 3, 12]):
+        rebinned_keys = clams_stage_cache_keys(raw_file, 2, 48, bin_hours, False)
+        assert rebinned_keys["Cleaned"] == keys["Cleaned"]
+        assert rebinned_keys["Trimmed"] == keys["Trimmed"]
+        assert rebinned_keys["Binned"] != keys["Binned"]
+
+
+@pytest.mark.parametrize("changed_arguments", [{"trim_hours": 3}, {"keep_hours": 36}, {"start_dark": True},
+                                               {"resample": True}])
+def test_changed_trim_settings_invalidate_the_trimmed_key(raw_file, changed_arguments):
+    arguments = {"trim_hours": 2, "keep_hours": 48, "bin_hours": 3, "start_dark": False}
+    keys = clams_stage_cache_keys(raw_file, **arguments)
+    changed_keys = clams_stage_cache_keys(raw_file, **{**arguments, **changed_arguments})
+    assert changed_keys["Cleaned"] == keys["Cleaned"]
+    assert changed_keys["Trimmed"] != keys["Trimmed"]
+    assert changed_keys["Binned"] != keys["Binned"]
+
+
+def test_changed_columns_invalidate_every_key(raw_file):
+    keys = clams_stage_cache_keys(raw_file, 2, 48, 3, False, columns=["VO2", "VCO2"])
+    changed_keys = clams_stage_cache_keys(raw_file, 2, 48, 3, False, columns=["VO2"])
+    assert all(changed_keys[stage] != keys[stage] for stage in keys)
+    assert clams_stage_cache_keys(raw_file, 2, 48, 3, False)["Cleaned"] != keys["Cleaned"]
+
+
+def test_rebinned_run_reads_the_cleaned_and_trimmed_data_from_the_cache(dataset_directory, tmp_path):
+    directory = copy_dataset(dataset_directory, tmp_path, "cached")
+    first = run_pipeline(directory, 2, 48, 3, use_cache=True)
+    assert all(not stages for stages in cached_stages(first).values())
+
+    # Only the binning stage runs again for another bin size
+    rebinned = run_pipeline(directory, 2, 48, 1, use_cache=True)
+    assert all(stages == {"Cleaned", "Trimmed"} for stages in cached_stages(rebinned).values())
+    uncached = run_pipeline(copy_dataset(dataset_directory, tmp_path, "uncached"), 2, 48, 1)
+    pd.testing.assert_frame_equal(sorted_combined_data(rebinned), sorted_combined_data(uncached))
+
+    # Other trim settings only reuse the cleaned data
+    retrimmed = run_pipeline(directory, 3, 48, 1, use_cache=True)
+    assert all(stages == {"Cleaned"} for stages in cached_stages(retrimmed).values())
+
+
+def test_clear_clams_cache_deletes_the_cached_results(dataset_directory, tmp_path):
+    directory = copy_dataset(dataset_directory, tmp_path, "cached")
+    run_pipeline(directory, 2, 48, 3, use_cache=True)
+    cache_directory = os.path.join(directory, "Cached_CLAMS_data")
+    cached_count = len(os.listdir(cache_directory))
+
+    assert clear_clams_cache(directory) == cached_count
+    assert not os.path.exists(cache_directory)
+    assert clear_clams_cache(directory) == 0
+    rerun = run_pipeline(directory, 2, 48, 3, use_cache=True)
+    assert all(not stages for stages in cached_stages(rerun).values())
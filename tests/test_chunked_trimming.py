@@ -0,0 +1,24 @@
+import os
+
+import pandas as pd
+
+from clams_processing import clean_clams_file, run_pipeline, trim_clams_dataframe, trim_raw_clams_file
+from conftest import copy_dataset, sorted_combined_data
+
+
+def test_chunked_trimming_matches_whole_file_trimming(dataset_directory):
+    file_path = os.path.join(dataset_directory, "Cage001.csv")
+    cleaned_df, file_name = clean_clams_file(file_path, parse_timestamps=True)
+    expected = trim_clams_dataframe(cleaned_df, 2, 48, True)
+
+    # Chunks much smaller than the trimmed hours, so the trim start and end fall in different chunks
+    trimmed_df, chunked_file_name = trim_raw_clams_file(file_path, 2, 48, True, chunk_rows=25)
+    assert chunked_file_name == file_name
+    pd.testing.assert_frame_equal(trimmed_df.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_chunked_run_matches_whole_file_run(dataset_directory, tmp_path):
+    whole = run_pipeline(copy_dataset(dataset_directory, tmp_path, "whole"), 2, 48, 3, save_intermediates=False)
+    chunked = run_pipeline(copy_dataset(dataset_directory, tmp_path, "chunked"), 2, 48, 3, save_intermediates=False,
+                           trim_chunk_rows=40)
+    pd.testing.assert_frame_equal(sorted_combined_data(chunked), sorted_combined_data(whole))
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from clams_cube import clams_cube_from_binned_data, clams_cube_from_combined_data
+from clams_processing import (OUTPUT_VARIABLES, bin_clams_dataframe, combine_binned_dataframes, trim_clams_dataframe,
+                              write_combined_data, write_reformatted_data)
+from synthetic_clams import generate_clams_dataframe
+
+
+@pytest.fixture
+def binned_data():
+    """Binned data of three subjects sampled at different intervals."""
+    binned_data = []
+    for chamber, interval_minutes in ((1, 13), (2, 10), (3, 7)):
+        raw_df = generate_clams_dataframe(chamber, 60, interval_minutes, datetime(2024, 1, 1, 9, chamber), seed=chamber)
+        binned_df = bin_clams_dataframe(trim_clams_dataframe(raw_df, 2, 48, False), 3)
+        binned_data.append((f"Cage{chamber:03d}_ID{100 + chamber}_trimmed_3hour_bins.csv", binned_df))
+    return binned_data
+
+
+@pytest.fixture
+def config_df():
+    return pd.DataFrame({"ID": [101, 102, 103], "GROUP LABEL": ["A", "B", "A"]})
+
+
+def assert_same_files(expected_directory, directory):
+    assert sorted(os.listdir(directory)) == sorted(os.listdir(expected_directory))
+    for file_name in os.listdir(expected_directory):
+        with open(os.path.join(expected_directory, file_name), 'rb') as expected, \
+                open(os.path.join(directory, file_name), 'rb') as written:
+            assert written.read() == expected.read(), file_name
+
+
+@pytest.mark.parametrize("from_binned_data", [False, True])
+@pytest.mark.parametrize("complete_days", [False, True])
+def test_cube_writes_the_combined_and_reformatted_files(binned_data, config_df, tmp_path, from_binned_data,
+                                                        complete_days):
+    if complete_days:
+        # Every subject has every bin of its first day, so the reformatted integer variables stay integers
+        binned_data = [(file_name, df[df['DAY'] == 1]) for file_name, df in binned_data]
+    else:
+        # The last subject misses a bin of its first day
+        binned_data[2] = (binned_data[2][0], binned_data[2][1].drop(index=1))
+    combined_data = combine_binned_dataframes(binned_data, config_df)
+    os.makedirs(tmp_path / "combined")
+    write_combined_data(combined_data, tmp_path / "combined")
+    write_reformatted_data(combined_data, tmp_path / "reformatted")
+
+    cube = (clams_cube_from_binned_data(binned_data, config_df) if from_binned_data
+            else clams_cube_from_combined_data(combined_data))
+    cube.write_long_csvs(tmp_path / "cube_combined")
+    cube.write_wide_csvs(tmp_path / "cube_reformatted")
+
+    assert_same_files(tmp_path / "combined", tmp_path / "cube_combined")
+    assert_same_files(tmp_path / "reformatted", tmp_path / "cube_reformatted")
+    # Integer variables such as WHEEL are written as integers
+    assert pd.read_csv(tmp_path / "cube_combined" / "WHEEL.csv")["WHEEL"].dtype.kind == "i"
+    assert (pd.read_csv(tmp_path / "cube_reformatted" / "reformatted_WHEEL.csv")["WHEEL_3"].dtype.kind == "i") == \
+        complete_days
+
+
+@pytest.mark.parametrize("output_format", ["csv", "parquet"])
+def test_cube_writes_selected_variables_in_the_output_format(binned_data, config_df, tmp_path, output_format):
+    variables = ["VO2", "WHEEL"]
+    combined_data = combine_binned_dataframes(binned_data, config_df)
+    os.makedirs(tmp_path / "combined")
+    write_combined_data(combined_data, tmp_path / "combined", output_format, variables)
+
+    cube = clams_cube_from_combined_data(combined_data, OUTPUT_VARIABLES).select(variables=variables)
+    cube.write_long_csvs(tmp_path / "cube_combined", output_format)
+    assert_same_files(tmp_path / "combined", tmp_path / "cube_combined")
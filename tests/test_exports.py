@@ -0,0 +1,43 @@
+import os
+import shutil
+
+import pandas as pd
+
+from clams_processing import clean_clams_file, parse_clams_timestamps, run_pipeline, split_clams_export
+from conftest import CAGES, copy_dataset, sorted_combined_data
+from synthetic_clams import generate_clams_dataframe, write_raw_clams_file
+
+
+def write_clams_export(directory, hours=60):
+    """Write the same recordings as generate_clams_dataset to a single combined export of all chambers."""
+    os.makedirs(directory, exist_ok=True)
+    start_time = pd.Timestamp(2024, 1, 1, 9, 0)
+    chamber_dfs = [generate_clams_dataframe(chamber, hours, 13, start_time + pd.Timedelta(minutes=chamber - 1),
+                                            jitter_seconds=20, seed=chamber) for chamber in range(1, CAGES + 1)]
+    export_df = pd.concat(chamber_dfs, ignore_index=True)
+    export_df = export_df.iloc[parse_clams_timestamps(export_df['DATE/TIME']).argsort(kind='stable')]
+    chambers = list(range(1, CAGES + 1))
+    write_raw_clams_file(os.path.join(directory, "export.csv"), export_df,
+                         ",".join(str(100 + chamber) for chamber in chambers),
+                         ",".join(str(chamber) for chamber in chambers))
+
+
+def test_combined_export_is_split_into_its_subjects(dataset_directory, tmp_path):
+    write_clams_export(tmp_path / "export")
+    subjects = split_clams_export(str(tmp_path / "export" / "export.csv"))
+
+    assert [file_name for _, file_name in subjects] == [f"export_chamber{chamber}_ID{100 + chamber}.csv"
+                                                        for chamber in range(1, CAGES + 1)]
+    for chamber, (subject_df, _) in enumerate(subjects, start=1):
+        expected, _ = clean_clams_file(os.path.join(dataset_directory, f"Cage{chamber:03d}.csv"))
+        pd.testing.assert_frame_equal(subject_df.reset_index(drop=True), expected.reset_index(drop=True))
+
+
+def test_combined_export_run_matches_separate_files_run(dataset_directory, tmp_path):
+    export_directory = tmp_path / "export"
+    write_clams_export(export_directory)
+    shutil.copytree(dataset_directory / "config", export_directory / "config")
+
+    separate = run_pipeline(copy_dataset(dataset_directory, tmp_path, "separate"), 2, 48, 3, workers=2)
+    export = run_pipeline(str(export_directory), 2, 48, 3, workers=2)
+    pd.testing.assert_frame_equal(sorted_combined_data(export), sorted_combined_data(separate))
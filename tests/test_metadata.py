@@ -0,0 +1,49 @@
+import io
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from clams_processing import clean_clams_file, read_raw_clams_metadata
+from synthetic_clams import METADATA_LINES, generate_clams_dataframe, write_raw_clams_file
+
+
+def resize_metadata_block(file_path, metadata_lines):
+    """Rewrite a raw file with a metadata block of a different number of lines, keeping its Subject ID line."""
+    with open(file_path, newline='') as f:
+        lines = f.read().split("\n")
+    header_line = lines.index(next(line for line in lines if line.startswith("INTERVAL,")))
+    metadata = ["Oxymax Windows V 5.66 Data File", "Subject ID,101", "Chamber,1"]
+    metadata += [f"Comment {line_number}," for line_number in range(1, metadata_lines - len(metadata))] + [":DATA"]
+    with open(file_path, 'w', newline='') as f:
+        f.write("\n".join(metadata[:metadata_lines] + lines[header_line:]))
+
+
+@pytest.fixture
+def raw_file(tmp_path):
+    file_path = str(tmp_path / "Cage001.csv")
+    write_raw_clams_file(file_path, generate_clams_dataframe(1, 12, 13, datetime(2024, 1, 1, 9, 0)), 101, 1)
+    return file_path
+
+
+@pytest.mark.parametrize("metadata_lines", [3, 12, METADATA_LINES, 40])
+def test_data_header_is_found_after_a_metadata_block_of_any_length(raw_file, metadata_lines):
+    expected_df, expected_name = clean_clams_file(raw_file)
+    resize_metadata_block(raw_file, metadata_lines)
+
+    # The metadata is read in text and binary mode, leaving the file at the data header
+    for mode in ('r', 'rb'):
+        with open(raw_file, mode) as f:
+            metadata = read_raw_clams_metadata(f)
+            assert (metadata["Subject ID"], metadata["Chamber"]) == ("101", "1")
+            header = f.readline()
+            assert (header.decode() if isinstance(header, bytes) else header).startswith("INTERVAL,")
+
+    cleaned_df, cleaned_name = clean_clams_file(raw_file)
+    assert cleaned_name == expected_name
+    pd.testing.assert_frame_equal(cleaned_df, expected_df)
+
+
+def test_file_without_data_header_is_rejected():
+    with pytest.raises(ValueError, match="No data header"):
+        read_raw_clams_metadata(io.StringIO("Subject ID,101\nChamber,1\n"))
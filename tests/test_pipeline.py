@@ -0,0 +1,10 @@
+import pandas as pd
+
+from clams_processing import run_pipeline
+from conftest import copy_dataset, sorted_combined_data
+
+
+def test_parallel_run_matches_serial_run(dataset_directory, tmp_path):
+    serial = run_pipeline(copy_dataset(dataset_directory, tmp_path, "serial"), 2, 48, 3, workers=1)
+    parallel = run_pipeline(copy_dataset(dataset_directory, tmp_path, "parallel"), 2, 48, 3, workers=2)
+    pd.testing.assert_frame_equal(sorted_combined_data(parallel), sorted_combined_data(serial))
@@ -0,0 +1,53 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from clams_processing import (OUTPUT_VARIABLES, bin_clams_dataframe, combine_binned_dataframes, trim_clams_dataframe,
+                              write_combined_data, write_reformatted_data)
+from synthetic_clams import generate_clams_dataframe
+
+
+def reformat_csv_per_variable(input_csv_path, output_csv_path):
+    """Pivot one combined .csv file as reformat_csv did before all variables were pivoted in a single operation."""
+    df = pd.read_csv(input_csv_path)
+
+    # Replace missing values in "GROUP LABEL" with a placeholder value
+    df["GROUP LABEL"] = df["GROUP LABEL"].fillna("NO_LABEL")
+
+    # Pivot the last column using "ID", "GROUP LABEL", "DAY" and "24 HOUR" as indices
+    last_column_name = df.columns[-1]
+    pivot_table = df.pivot_table(index=["ID", "GROUP LABEL", "DAY"], columns="24 HOUR", values=last_column_name,
+                                 aggfunc="first").reset_index()
+    pivot_table.columns = ["ID", "GROUP LABEL", "DAY"] + [f"{last_column_name}_{hour}" for hour in
+                                                          pivot_table.columns[3:]]
+    pivot_table.to_csv(output_csv_path, index=False)
+
+
+@pytest.mark.parametrize("missing_bins", [False, True])
+@pytest.mark.parametrize("bin_hours", [1, 3, 12])
+def test_reformatted_files_match_the_per_variable_pivots(tmp_path, missing_bins, bin_hours):
+    binned_data = []
+    for chamber, interval_minutes in ((1, 13), (2, 10), (3, 7)):
+        raw_df = generate_clams_dataframe(chamber, 60, interval_minutes, datetime(2024, 1, 1, 9, chamber), seed=chamber)
+        binned_df = bin_clams_dataframe(trim_clams_dataframe(raw_df, 2, 48, False), bin_hours)
+        if missing_bins:
+            # Some subjects miss bins, so some days lack a 24 HOUR column of another subject
+            binned_df = binned_df.iloc[chamber:len(binned_df) - chamber]
+        binned_data.append((f"Cage{chamber:03d}_ID{100 + chamber}_trimmed_{bin_hours}hour_bins.csv", binned_df))
+    # The last subject has no group label
+    config_df = pd.DataFrame({"ID": [101, 102, 103], "GROUP LABEL": ["A", "B", None]})
+    combined_data = combine_binned_dataframes(binned_data, config_df)
+
+    combined_directory = tmp_path / "combined"
+    os.makedirs(combined_directory)
+    write_combined_data(combined_data, combined_directory)
+    write_reformatted_data(combined_data, tmp_path / "reformatted")
+
+    for variable in OUTPUT_VARIABLES:
+        expected_path = tmp_path / f"expected_{variable}.csv"
+        reformat_csv_per_variable(combined_directory / f"{variable}.csv", expected_path)
+        with open(expected_path, 'rb') as expected, \
+                open(tmp_path / "reformatted" / f"reformatted_{variable}.csv", 'rb') as reformatted:
+            assert reformatted.read() == expected.read(), variable
@@ -0,0 +1,66 @@
+import glob
+import os
+
+import pandas as pd
+import pytest
+
+from clams_processing import OUTPUT_VARIABLES, run_pipeline
+from conftest import copy_dataset
+from results_store import RESULTS_STORE_FILE, query_results, read_run_metadata
+
+
+@pytest.fixture
+def store_directory(dataset_directory, tmp_path):
+    """Directory of a run that saved its results store."""
+    directory = copy_dataset(dataset_directory, tmp_path, "store")
+    run_pipeline(directory, 2, 48, 3, results_store=True)
+    return directory
+
+
+def combined_csvs(directory):
+    """Read the combined .csv files of every variable into one table, as the combined table of the store holds it."""
+    index_columns = ['ID', 'GROUP LABEL', 'DAY', 'HOUR', '24 HOUR']
+    combined = None
+    for variable in OUTPUT_VARIABLES:
+        variable_df = pd.read_csv(os.path.join(directory, "Combined_CLAMS_data", f"{variable}.csv"))
+        combined = variable_df if combined is None else combined.merge(variable_df, on=index_columns, validate="1:1")
+    return combined
+
+
+def test_store_holds_the_rows_of_the_combined_and_binned_files(store_directory):
+    database_path = os.path.join(store_directory, "Combined_CLAMS_data", RESULTS_STORE_FILE)
+    csv_combined = combined_csvs(store_directory)
+
+    stored = query_results(database_path, OUTPUT_VARIABLES)
+    assert len(stored) == len(csv_combined)
+    pd.testing.assert_frame_equal(stored.drop(columns='LED LIGHTNESS'),
+                                  csv_combined.sort_values(['ID', 'HOUR'], kind='stable').reset_index(drop=True),
+                                  check_dtype=False)
+
+    binned_rows = sum(len(pd.read_csv(file)) for file in glob.glob(os.path.join(store_directory, "Binned_CLAMS_data",
+                                                                                "*.csv")))
+    assert len(query_results(database_path, table="binned")) == binned_rows
+    assert read_run_metadata(database_path)["bin_hours"] == 3
+
+
+@pytest.mark.parametrize("filters", [{"ids": 101}, {"ids": [101, 103]}, {"groups": "A"}, {"groups": ["B"]},
+                                     {"days": 1}, {"days": range(2, 5)}, {"light": True}, {"light": False},
+                                     {"groups": "A", "days": 2, "light": False}])
+@pytest.mark.parametrize("table", ["combined", "binned"])
+def test_query_results_filters_by_id_group_day_and_light_phase(store_directory, table, filters):
+    database_path = os.path.join(store_directory, "Combined_CLAMS_data", RESULTS_STORE_FILE)
+    stored = query_results(database_path, ["VO2"], table=table)
+
+    # Filter all rows in pandas for comparison
+    keep = pd.Series(True, index=stored.index)
+    for column, name in (("ID", "ids"), ("GROUP LABEL", "groups"), ("DAY", "days")):
+        if name in filters:
+            values = filters[name]
+            keep &= stored[column].isin([values] if pd.api.types.is_scalar(values) else list(values))
+    if "light" in filters:
+        keep &= (stored['LED LIGHTNESS'] > 0) == filters["light"]
+    expected = stored[keep].reset_index(drop=True)
+
+    queried = query_results(database_path, ["VO2"], table=table, **filters)
+    assert 0 < len(queried) < len(stored)
+    pd.testing.assert_frame_equal(queried, expected)
@@ -0,0 +1,58 @@
+import os
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import clams_processing
+from clams_processing import (ProcessingCancelled, create_run_directory, finalize_run_directory, resolve_run_directory,
+                              run_pipeline)
+from conftest import copy_dataset, sorted_combined_data
+
+
+class FrozenDatetime(datetime):
+    """Datetime whose clock never moves, so run directories are created in the same second."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2024, 1, 1, 12, 0, 0)
+
+
+def test_run_directories_created_in_the_same_second_are_not_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(clams_processing, "datetime", FrozenDatetime)
+    run_directories = [create_run_directory(str(tmp_path)) for _ in range(11)]
+    assert [os.path.basename(run_directory) for run_directory in run_directories] == \
+        ["timestamp_2024-01-01_12-00-00"] + [f"timestamp_2024-01-01_12-00-00_{suffix}" for suffix in range(2, 12)]
+
+    # The last of them is resumed first
+    for run_directory in run_directories:
+        clams_processing.start_run_manifest(run_directory, {"trim_hours": 2})
+    assert clams_processing.find_unfinished_run_directory(str(tmp_path), {"trim_hours": 2}) == run_directories[-1]
+
+
+def test_interrupted_run_resumes_without_processing_completed_subjects(dataset_directory, tmp_path):
+    directory = copy_dataset(dataset_directory, tmp_path, "interrupted")
+    run_directory, resumed = resolve_run_directory(directory, 2, 48, 3, False)
+    assert not resumed
+
+    # Interrupt the run once the first subject is completed
+    cancel_event = threading.Event()
+    with pytest.raises(ProcessingCancelled):
+        run_pipeline(directory, 2, 48, 3, output_directory=run_directory, cancel_event=cancel_event,
+                     progress_callback=lambda completed, total, file_name: cancel_event.set())
+
+    # The next run with the same settings continues in the same run directory and only processes the other subjects
+    assert resolve_run_directory(directory, 2, 48, 3, False) == (run_directory, True)
+    resumed_results = run_pipeline(directory, 2, 48, 3, output_directory=run_directory)
+    loaded_files = [file_metrics["file"] for file_metrics in resumed_results["metrics"]["files"]
+                    if all(metrics["cached"] for metrics in file_metrics["stages"].values())]
+    assert loaded_files == ["Cage001.csv"]
+
+    uninterrupted = run_pipeline(copy_dataset(dataset_directory, tmp_path, "uninterrupted"), 2, 48, 3)
+    pd.testing.assert_frame_equal(sorted_combined_data(resumed_results), sorted_combined_data(uninterrupted))
+
+    # A finished run is not resumed
+    finalize_run_directory(directory, run_directory)
+    new_run_directory, resumed = resolve_run_directory(directory, 2, 48, 3, False)
+    assert not resumed and new_run_directory != run_directory
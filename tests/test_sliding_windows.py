@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from clams_processing import (BIN_LAST_COLUMNS, BIN_SUM_COLUMNS, BINNED_COLUMNS, bin_clams_dataframe_sliding,
+                              prepare_for_binning)
+
+
+def bin_windows_by_groupby(df, window_minutes, step_minutes):
+    """Bin trimmed data into overlapping windows by selecting the samples of each window and aggregating them in one
+    groupby, without running totals."""
+    df = prepare_for_binning(df).reset_index(drop=True)
+    times = df['DATE/TIME']
+    window, step = pd.Timedelta(minutes=window_minutes), pd.Timedelta(minutes=step_minutes)
+
+    # Windows start every step and must end before the recording does, one median interval after its last sample
+    recording_end = times.iloc[-1] + times.diff().median()
+    window_starts = []
+    while times.iloc[0] + len(window_starts) * step + window <= recording_end:
+        window_starts.append(times.iloc[0] + len(window_starts) * step)
+
+    windows = pd.concat([df[(times >= start) & (times < start + window)].assign(WINDOW=number)
+                         for number, start in enumerate(window_starts)])
+    avg_columns = df.columns.difference(BIN_LAST_COLUMNS + BIN_SUM_COLUMNS + ['LED LIGHTNESS'])
+    groups = windows.groupby('WINDOW')
+    windowed = groups.agg({**{column: 'last' for column in BIN_LAST_COLUMNS + ['LED LIGHTNESS']},
+                           **{column: 'sum' for column in BIN_SUM_COLUMNS},
+                           **{column: 'mean' for column in avg_columns}})
+    windowed['DATE/TIME_start'] = groups['DATE/TIME'].first()
+    windowed['DATE/TIME_end'] = groups['DATE/TIME'].last()
+    windowed['INTERVAL_start'] = groups['INTERVAL'].first()
+    windowed['INTERVAL_end'] = groups['INTERVAL'].last()
+    windowed['DURATION'] = (windowed['DATE/TIME_end'] - windowed['DATE/TIME_start']).dt.total_seconds() / 3600
+
+    # Place each window by its end, counting a window that ends at midnight to the day before
+    window_ends = pd.Series(window_starts, index=range(len(window_starts)))[windowed.index] + window - times.iloc[0]
+    windowed['HOUR'] = window_ends / pd.Timedelta(hours=1)
+    windowed['DAY'] = np.ceil(windowed['HOUR'] / 24).astype(int)
+    windowed['24 HOUR'] = windowed['HOUR'] - 24 * (windowed['DAY'] - 1)
+
+    windowed = windowed[windowed['DURATION'] != 0].reset_index(drop=True)
+    return windowed[BINNED_COLUMNS].round(4)
+
+
+@pytest.mark.parametrize("trimmed_fixture", ["even_trimmed_df", "uneven_trimmed_df"])
+@pytest.mark.parametrize("window_minutes, step_minutes", [(60, 10), (90, 7), (180, 180)])
+def test_windows_match_a_groupby_per_window(request, trimmed_fixture, window_minutes, step_minutes):
+    trimmed_df = request.getfixturevalue(trimmed_fixture)
+    windowed = bin_clams_dataframe_sliding(trimmed_df, window_minutes, step_minutes)
+
+    # Differences of running totals can differ from direct sums in the last bits, which can change the last rounded
+    # decimal
+    pd.testing.assert_frame_equal(windowed, bin_windows_by_groupby(trimmed_df, window_minutes, step_minutes),
+                                  check_dtype=False, rtol=0, atol=1.5e-4)
+
+    # Windows that cross midnight count to the day they end in
+    assert windowed['24 HOUR'].between(0, 24, inclusive='right').all()
+    assert (windowed['DAY'] == np.ceil(windowed['HOUR'] / 24)).all()
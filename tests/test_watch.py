@@ -0,0 +1,70 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from clams_processing import BINNING_INPUT_COLUMNS, bin_trimmed_dataframe, clean_clams_file, trim_clams_dataframe
+from clams_watch import ClamsDirectoryWatcher
+from synthetic_clams import generate_clams_dataframe, write_raw_clams_file
+
+
+def binned_whole_file(file_path, bin_hours):
+    """Bin a raw file in one go, as a run without --watch does."""
+    cleaned_df, file_name = clean_clams_file(file_path, columns=BINNING_INPUT_COLUMNS, parse_timestamps=True)
+    return bin_trimmed_dataframe(trim_clams_dataframe(cleaned_df, 2, 30, False),
+                                 file_name.replace(".csv", "_trimmed.csv"), bin_hours)
+
+
+@pytest.fixture
+def watched_directory(tmp_path):
+    os.makedirs(tmp_path / "config")
+    pd.DataFrame({"ID": [101], "GROUP LABEL": ["A"]}).to_csv(tmp_path / "config" / "experiment_config.csv",
+                                                            index=False)
+    return tmp_path
+
+
+@pytest.mark.parametrize("bin_hours", [3, [1, 3, 12]])
+def test_appended_rows_are_binned_as_the_whole_file(watched_directory, bin_hours):
+    raw_df = generate_clams_dataframe(1, 40, 13, datetime(2024, 1, 1, 9, 0))
+    file_path = os.path.join(watched_directory, "Cage001.csv")
+    watcher = ClamsDirectoryWatcher(str(watched_directory), 2, 30, bin_hours, False,
+                                    str(watched_directory / "config" / "experiment_config.csv"), settle_seconds=0)
+
+    # Record the first rows, then append the rest in uneven steps, some before the trim start is known
+    steps = [20, 40, 41, 70, 120, 150, len(raw_df)]
+    write_raw_clams_file(file_path, raw_df.iloc[:steps[0]], 101, 1)
+    watcher.poll()
+    for start, end in zip(steps[:-1], steps[1:]):
+        with open(file_path, 'a', newline='') as f:
+            raw_df.iloc[start:end].to_csv(f, header=False, index=False, lineterminator="\n")
+        watcher.poll()
+
+    # Appended reads only parse the new rows, and the rows are not kept once trimming has started
+    state = watcher.files[file_path]
+    assert state["offset"] == os.path.getsize(file_path)
+    assert state["rows"].empty
+
+    binned, binned_file_name = binned_whole_file(file_path, bin_hours)
+    watched_file_name, watched = state["binned"]
+    assert watched_file_name == binned_file_name
+    if isinstance(bin_hours, list):
+        for size in bin_hours:
+            pd.testing.assert_frame_equal(watched[size], binned[size])
+        binned, combined_directory = binned[3], watched_directory / "Combined_CLAMS_data" / "3hour_bins"
+    else:
+        pd.testing.assert_frame_equal(watched, binned)
+        combined_directory = watched_directory / "Combined_CLAMS_data"
+    assert pd.read_csv(combined_directory / "VO2.csv")["VO2"].tolist() == binned["VO2"].tolist()
+
+def test_rewritten_file_is_read_again(watched_directory):
+    file_path = os.path.join(watched_directory, "Cage001.csv")
+    watcher = ClamsDirectoryWatcher(str(watched_directory), 2, 30, 3, False,
+                                    str(watched_directory / "config" / "experiment_config.csv"), settle_seconds=0)
+    write_raw_clams_file(file_path, generate_clams_dataframe(1, 40, 13, datetime(2024, 1, 1, 9, 0), seed=1), 101, 1)
+    watcher.poll()
+
+    # A new recording in place of the old one is longer, but does not start with the bytes read before
+    write_raw_clams_file(file_path, generate_clams_dataframe(1, 44, 10, datetime(2024, 1, 1, 9, 0), seed=2), 101, 1)
+    watcher.poll()
+    pd.testing.assert_frame_equal(watcher.files[file_path]["binned"][1], binned_whole_file(file_path, 3)[0])
@@ -0,0 +1,126 @@
+"""Check GitHub for a newer release of CLAMS Wrangler without blocking the GUI.
+
+The check runs on a background thread with a timeout, and its result is cached for a day so that starting the
+program does not contact GitHub every time. Only the standard library is used, so importing this module does not slow
+down startup. The release URL can be pointed at a local stand-in server with the CLAMS_WRANGLER_UPDATE_URL
+environment variable, e.g. by startup_benchmark.py, and the check at startup is turned off by setting
+CLAMS_WRANGLER_NO_UPDATE_CHECK to 1.
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+
+from version import VERSION
+
+# Latest release of the repository on GitHub
+LATEST_RELEASE_URL = "https://api.github.com/repos/PistilliLab/CLAMSwrangler/releases/latest"
+
+# Seconds to wait for GitHub before giving up
+UPDATE_CHECK_TIMEOUT = 5
+
+# Seconds a cached result stays valid
+UPDATE_CACHE_MAX_AGE = 24 * 60 * 60
+
+# File the last result is cached in
+UPDATE_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".clams_wrangler", "update_check.json")
+
+
+def release_url():
+    """Return the URL of the latest release, which the CLAMS_WRANGLER_UPDATE_URL environment variable overrides."""
+    return os.environ.get("CLAMS_WRANGLER_UPDATE_URL", LATEST_RELEASE_URL)
+
+
+def startup_update_check_enabled():
+    """Return False if the CLAMS_WRANGLER_NO_UPDATE_CHECK environment variable turns off the check at startup."""
+    return os.environ.get("CLAMS_WRANGLER_NO_UPDATE_CHECK", "").strip().lower() in ("", "0", "false", "no")
+
+
+def fetch_latest_release(url=None, timeout=UPDATE_CHECK_TIMEOUT):
+    """Request the latest release from GitHub.
+
+    Returns:
+    Dictionary with the "tag_name" and "html_url" of the release.
+
+    Raises:
+    OSError if the release could not be retrieved in time, ValueError if the response is not a release.
+    """
+    request = urllib.request.Request(url or release_url(), headers={"Accept": "application/vnd.github+json",
+                                                                    "User-Agent": f"CLAMSwrangler/{VERSION}"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        release = json.load(response)
+    if not isinstance(release, dict) or "tag_name" not in release:
+        raise ValueError("The response is not a release")
+    return {"tag_name": release["tag_name"], "html_url": release.get("html_url", "")}
+
+
+def read_cached_release(cache_file=UPDATE_CACHE_FILE, max_age=UPDATE_CACHE_MAX_AGE):
+    """Return the cached latest release, or None if there is none younger than max_age seconds."""
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+        if time.time() - cached["checked_at"] <= max_age and cached.get("url") == release_url():
+            return cached["release"]
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def write_cached_release(release, cache_file=UPDATE_CACHE_FILE):
+    """Cache the latest release; failing to write the cache is not an error."""
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        temporary_path = f"{cache_file}.{os.getpid()}.partial"
+        with open(temporary_path, 'w') as f:
+            json.dump({"checked_at": time.time(), "url": release_url(), "release": release}, f)
+        os.replace(temporary_path, cache_file)
+    except OSError:
+        pass
+
+
+def get_latest_release(use_cache=True, timeout=UPDATE_CHECK_TIMEOUT, cache_file=UPDATE_CACHE_FILE):
+    """Return the latest release, from the cache if it was checked recently.
+
+    Raises:
+    OSError or ValueError if the release is not cached and could not be retrieved.
+    """
+    if use_cache:
+        release = read_cached_release(cache_file)
+        if release is not None:
+            return release
+
+    release = fetch_latest_release(timeout=timeout)
+    write_cached_release(release, cache_file)
+    return release
+
+
+def is_newer_release(release, current_version=VERSION):
+    """Return True if the release is not the running version."""
+    return release["tag_name"] != current_version
+
+
+def check_for_update_in_background(callback, use_cache=True, timeout=UPDATE_CHECK_TIMEOUT,
+                                   cache_file=UPDATE_CACHE_FILE):
+    """Look up the latest release on a daemon thread.
+
+    Parameters:
+    callback (function): called on the background thread as callback(release, error), with the release dictionary
+    or None and the error or None; a GUI must hand the result over to its own thread
+    use_cache (bool): use a result cached within the last day instead of contacting GitHub
+    timeout (float): seconds to wait for GitHub
+
+    Returns:
+    The started thread.
+    """
+    def check():
+        try:
+            release = get_latest_release(use_cache=use_cache, timeout=timeout, cache_file=cache_file)
+        except (OSError, ValueError) as e:
+            callback(None, e)
+            return
+        callback(release, None)
+
+    thread = threading.Thread(target=check, name="update-check", daemon=True)
+    thread.start()
+    return thread